@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Active Learning Labeling Queue
+==============================
+Ranks a pool of unlabeled images so labelers work on the most useful
+ones first. The current model scores the pool in parallel batches; each
+image gets an uncertainty score (normalised entropy and margin) and a
+novelty score (distance in embedding space to the labeled dataset and to
+images already picked for the queue). A greedy selection mixes the two
+so the queue is both uncertain and diverse.
+
+Scores and embeddings are cached per model version (keyed by the model
+file hash, the preprocessing version and image content hashes), so
+re-ranking after new labels arrive only runs inference on images the
+cache has not seen.
+
+Usage:
+    python active_learning.py unlabeled/ [--labeled dataset] [--budget 500] [--output labeling_queue.csv]
+
+Use the embedding export (`python convert_to_tflite.py --embedding`) for
+the novelty term; with the plain classifier the queue is ranked by
+uncertainty alone.
+"""
+
+import csv
+import time
+import queue
+import argparse
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_LABELS_PATH,
+    PREPROCESSING_VERSION,
+    TFLiteClassifier,
+    list_images,
+    load_labels,
+    preprocess_image
+)
+from prediction_cache import hash_bytes, hash_file
+from ann_index import BruteForceIndex, normalize
+from embeddings import DEFAULT_EMBEDDING_MODEL
+
+DEFAULT_STORE_DIR = 'models/active_learning'
+
+class ScoreStore:
+    """Per-model cache of (scores, embedding) rows keyed by image hash.
+
+    The file is named after the model hash and the preprocessing version,
+    so rows computed with older preprocessing are never served.
+    """
+
+    def __init__(self, store_dir, model_hash, preprocessing_version=PREPROCESSING_VERSION):
+        self.path = Path(store_dir) / f'scores_{model_hash[:16]}_p{preprocessing_version}.npz'
+        self.rows = {}
+        if self.path.exists():
+            with np.load(self.path) as data:
+                embeddings = data['embeddings'] if data['embeddings'].size else None
+                for i, image_hash in enumerate(data['hashes']):
+                    embedding = embeddings[i] if embeddings is not None else None
+                    self.rows[str(image_hash)] = (data['scores'][i], embedding)
+
+    def __contains__(self, image_hash):
+        return image_hash in self.rows
+
+    def get(self, image_hash):
+        return self.rows[image_hash]
+
+    def add(self, image_hash, scores, embedding):
+        self.rows[image_hash] = (
+            np.asarray(scores, dtype=np.float32),
+            None if embedding is None else np.asarray(embedding, dtype=np.float16)
+        )
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        hashes = list(self.rows)
+        scores = np.stack([self.rows[h][0] for h in hashes]) if hashes else np.zeros((0, 0))
+        has_embeddings = hashes and self.rows[hashes[0]][1] is not None
+        embeddings = np.stack([self.rows[h][1] for h in hashes]) if has_embeddings else np.zeros((0, 0))
+        np.savez(self.path, hashes=np.array(hashes), scores=scores, embeddings=embeddings)
+
+def score_images(paths, model_path, store, batch_size=64, workers=2):
+    """Return (scores, embeddings or None) for paths, running only cache misses."""
+    with ThreadPoolExecutor(max_workers=8) as io_pool:
+        hashes = list(io_pool.map(lambda p: hash_bytes(p.read_bytes()), paths))
+    misses = [(path, h) for path, h in zip(paths, hashes) if h not in store]
+
+    if misses:
+        print(f"   Scoring {len(misses)} new images ({len(paths) - len(misses)} cached)...")
+        classifiers = queue.Queue()
+        for _ in range(workers):
+            classifiers.put(TFLiteClassifier(model_path))
+
+        def run_batch(chunk):
+            classifier = classifiers.get()
+            try:
+                batch = np.stack([preprocess_image(path, classifier.input_size) for path, _ in chunk])
+                if classifier.embedding_details is not None:
+                    scores, embeddings = classifier.predict_batch_with_embeddings(batch)
+                else:
+                    scores, embeddings = classifier.predict_batch(batch), [None] * len(chunk)
+            finally:
+                classifiers.put(classifier)
+            return chunk, scores, embeddings
+
+        chunks = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk, scores, embeddings in executor.map(run_batch, chunks):
+                for (_, image_hash), row, embedding in zip(chunk, scores, embeddings):
+                    store.add(image_hash, row, embedding)
+        store.save()
+    else:
+        print(f"   All {len(paths)} images found in score cache")
+
+    rows = [store.get(h) for h in hashes]
+    scores = np.stack([r[0] for r in rows])
+    embeddings = np.stack([r[1] for r in rows]) if rows[0][1] is not None else None
+    return scores, embeddings
+
+def uncertainty_scores(scores):
+    """Return (normalised entropy, margin uncertainty) per row, both in [0, 1]."""
+    probabilities = np.clip(scores, 1e-12, 1.0)
+    entropy = -np.sum(probabilities * np.log(probabilities), axis=1) / np.log(scores.shape[1])
+    top_two = -np.partition(-scores, 1, axis=1)[:, :2]
+    margin = 1.0 - (top_two[:, 0] - top_two[:, 1])
+    return entropy, margin
+
+def select_queue(uncertainty, embeddings, labeled_embeddings, budget, alpha=0.5, candidates=10000):
+    """Greedily pick `budget` images trading off uncertainty against novelty.
+
+    Novelty is 1 - cosine similarity to the closest labeled or already
+    selected image and is updated after each pick. Returns (order, novelty
+    at selection time).
+    """
+    budget = min(budget, len(uncertainty))
+    if embeddings is None:
+        order = np.argsort(-uncertainty)[:budget]
+        return order, np.full(len(order), np.nan)
+
+    # Restrict the greedy pass to the most uncertain candidates
+    pool = np.argsort(-uncertainty)[:max(candidates, budget)]
+    vectors = normalize(embeddings[pool])
+
+    if labeled_embeddings is not None and len(labeled_embeddings):
+        best_similarity, _ = BruteForceIndex(labeled_embeddings).search(vectors, k=1)
+        novelty = 1.0 - best_similarity[:, 0]
+    else:
+        novelty = np.ones(len(pool), dtype=np.float32)
+
+    selected, selected_novelty = [], []
+    available = np.ones(len(pool), dtype=bool)
+    for _ in range(budget):
+        combined = np.where(available, alpha * uncertainty[pool] + (1 - alpha) * novelty, -np.inf)
+        pick = int(np.argmax(combined))
+        selected.append(pool[pick])
+        selected_novelty.append(novelty[pick])
+        available[pick] = False
+        novelty = np.minimum(novelty, 1.0 - vectors @ vectors[pick])
+
+    return np.array(selected), np.array(selected_novelty)
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank unlabeled images for labeling')
+    parser.add_argument('pool', nargs='+', help='Unlabeled image files or directories')
+    parser.add_argument('--labeled', type=str, default='dataset',
+                       help='Labeled dataset (used for novelty and to skip known images)')
+    parser.add_argument('--model', type=str, default=DEFAULT_EMBEDDING_MODEL,
+                       help='TFLite model (embedding export recommended)')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH,
+                       help='Path to labels file')
+    parser.add_argument('--budget', type=int, default=500, help='Number of images to queue')
+    parser.add_argument('--alpha', type=float, default=0.5,
+                       help='Weight of uncertainty vs. novelty (1.0 = uncertainty only)')
+    parser.add_argument('--uncertainty', type=str, default='entropy', choices=['entropy', 'margin'],
+                       help='Uncertainty measure used for ranking')
+    parser.add_argument('--batch-size', type=int, default=64, help='Images per invoke')
+    parser.add_argument('--workers', type=int, default=2, help='Parallel interpreters')
+    parser.add_argument('--store', type=str, default=DEFAULT_STORE_DIR,
+                       help='Directory for the per-model score cache')
+    parser.add_argument('--output', type=str, default='labeling_queue.csv',
+                       help='Output CSV path')
+
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"❌ Model not found: {args.model}")
+        if args.model == DEFAULT_EMBEDDING_MODEL:
+            print("Export it first: python convert_to_tflite.py --embedding")
+        return
+
+    labels = load_labels(args.labels)
+    store = ScoreStore(args.store, hash_file(args.model))
+    start = time.perf_counter()
+
+    labeled_paths = list_images([args.labeled]) if Path(args.labeled).exists() else []
+    labeled_embeddings = None
+    if labeled_paths:
+        print(f"\n📚 Labeled set: {len(labeled_paths)} images")
+        _, labeled_embeddings = score_images(labeled_paths, args.model, store,
+                                             args.batch_size, args.workers)
+
+    labeled_resolved = {p.resolve() for p in labeled_paths}
+    pool_paths = [p for p in list_images(args.pool) if p.resolve() not in labeled_resolved]
+    if not pool_paths:
+        print("❌ No unlabeled images found.")
+        return
+
+    print(f"\n🔍 Unlabeled pool: {len(pool_paths)} images")
+    scores, embeddings = score_images(pool_paths, args.model, store, args.batch_size, args.workers)
+
+    entropy, margin = uncertainty_scores(scores)
+    uncertainty = entropy if args.uncertainty == 'entropy' else margin
+    if embeddings is None:
+        print("   ⚠️  Model has no embedding output; ranking by uncertainty only")
+
+    order, novelty = select_queue(uncertainty, embeddings, labeled_embeddings, args.budget, args.alpha)
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank', 'path', 'predicted', 'confidence', 'entropy', 'margin', 'novelty'])
+        for rank, (i, n) in enumerate(zip(order, novelty), 1):
+            best = int(np.argmax(scores[i]))
+            writer.writerow([
+                rank, str(pool_paths[i]), labels[best], f"{scores[i][best]:.4f}",
+                f"{entropy[i]:.4f}", f"{margin[i]:.4f}", '' if np.isnan(n) else f"{n:.4f}"
+            ])
+
+    print(f"\n✅ Labeling queue of {len(order)} images saved to: {args.output}")
+    print(f"   Time: {time.perf_counter() - start:.1f}s")
+    predicted = np.argmax(scores[order], axis=1)
+    for class_id, count in zip(*np.unique(predicted, return_counts=True)):
+        print(f"   {labels[class_id]:15} : {count:5} queued (by prediction)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Nearest-Neighbour Indexes for Image Embeddings
+==============================================
+Pure NumPy vector indexes over L2-normalised embeddings:
+
+- BruteForceIndex: exact cosine search, scanning the (memory-mapped)
+  vectors in chunks with one matrix product per chunk.
+- IVFPQIndex: approximate search. A k-means coarse quantizer splits the
+  vectors into inverted lists and each residual is product-quantized to
+  one byte per sub-vector, so only the probed lists are scanned, using
+  per-query lookup tables instead of the full vectors. Candidates can
+  be re-ranked exactly against the original vectors.
+
+Both return (similarities, ids) with cosine similarity, highest first.
+"""
+
+import numpy as np
+
+def normalize(vectors):
+    """L2-normalise rows as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def squared_distances(x, centroids):
+    """Squared L2 distances between rows of x and the centroids."""
+    return (
+        np.sum(x * x, axis=1, keepdims=True)
+        - 2.0 * x @ centroids.T
+        + np.sum(centroids * centroids, axis=1)[np.newaxis]
+    )
+
+def assign(x, centroids, chunk_size=65536):
+    """Index of the nearest centroid for every row of x."""
+    labels = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), chunk_size):
+        block = np.asarray(x[start:start + chunk_size], dtype=np.float32)
+        labels[start:start + chunk_size] = np.argmin(squared_distances(block, centroids), axis=1)
+    return labels
+
+def kmeans(x, k, iterations=20, seed=0):
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, np.newaxis]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+
+    return centroids
+
+def merge_top_k(best_scores, best_ids, scores, ids, k):
+    """Merge a block of candidate scores into the running per-query top-k."""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    keep = min(k, all_scores.shape[1])
+    top = np.argpartition(-all_scores, keep - 1, axis=1)[:, :keep]
+    return (
+        np.take_along_axis(all_scores, top, axis=1),
+        np.take_along_axis(all_ids, top, axis=1)
+    )
+
+def sort_results(scores, ids):
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+class BruteForceIndex:
+    """Exact cosine search over (possibly memory-mapped) vectors."""
+
+    def __init__(self, vectors, chunk_size=65536):
+        self.vectors = vectors
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k=10):
+        queries = normalize(queries)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, len(self.vectors), self.chunk_size):
+            block = normalize(self.vectors[start:start + self.chunk_size])
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            best_scores, best_ids = merge_top_k(best_scores, best_ids, scores, ids, k)
+
+        return sort_results(best_scores, best_ids)
+
+class IVFPQIndex:
+    """Inverted-file index with product-quantized residuals."""
+
+    def __init__(self, nlist=256, m=16, ksub=256):
+        self.nlist = nlist
+        self.m = m
+        self.ksub = ksub
+        self.coarse = None
+        self.codebooks = None
+        self.codes = None
+        self.ids = None
+        self.offsets = None
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+    def train(self, vectors, sample_size=100000, seed=0):
+        """Learn the coarse centroids and PQ codebooks from a sample."""
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            sample = np.sort(rng.choice(len(vectors), sample_size, replace=False))
+            vectors = vectors[sample]
+        x = normalize(vectors)
+
+        dim = x.shape[1]
+        if dim % self.m:
+            raise ValueError(f"Embedding dim {dim} is not divisible by m={self.m}")
+
+        self.nlist = min(self.nlist, len(x))
+        self.coarse = kmeans(x, self.nlist, seed=seed)
+        residuals = x - self.coarse[assign(x, self.coarse)]
+
+        sub_dim = dim // self.m
+        self.codebooks = np.zeros((self.m, min(self.ksub, len(x)), sub_dim), dtype=np.float32)
+        for j in range(self.m):
+            part = residuals[:, j * sub_dim:(j + 1) * sub_dim]
+            self.codebooks[j] = kmeans(part, self.codebooks.shape[1], seed=seed + j + 1)
+
+    def encode(self, x):
+        """PQ codes (N, m) for the residuals of normalised vectors x."""
+        lists = assign(x, self.coarse)
+        residuals = x - self.coarse[lists]
+        sub_dim = x.shape[1] // self.m
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            part = residuals[:, j * sub_dim:(j + 1) * sub_dim]
+            codes[:, j] = assign(part, self.codebooks[j])
+        return lists, codes
+
+    def add(self, vectors, chunk_size=65536):
+        """Encode and add vectors; ids continue from the current size."""
+        base = len(self)
+        all_lists, all_codes = [], []
+        for start in range(0, len(vectors), chunk_size):
+            lists, codes = self.encode(normalize(vectors[start:start + chunk_size]))
+            all_lists.append(lists)
+            all_codes.append(codes)
+
+        lists = np.concatenate(all_lists)
+        codes = np.concatenate(all_codes)
+        ids = np.arange(base, base + len(lists), dtype=np.int64)
+
+        if self.ids is not None:
+            old_lists = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+            lists = np.concatenate([old_lists, lists])
+            codes = np.concatenate([self.codes, codes])
+            ids = np.concatenate([self.ids, ids])
+
+        # Store each inverted list contiguously
+        order = np.argsort(lists, kind='stable')
+        self.codes = codes[order]
+        self.ids = ids[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.nlist))])
+
+    def search(self, queries, k=10, nprobe=8, refine_vectors=None, refine_factor=4):
+        """Approximate top-k search.
+
+        With refine_vectors (the original, e.g. memory-mapped, embeddings)
+        the best k * refine_factor PQ candidates are re-ranked exactly.
+        """
+        queries = normalize(queries)
+        nprobe = min(nprobe, self.nlist)
+        shortlist = k * refine_factor if refine_vectors is not None else k
+        sub_dim = queries.shape[1] // self.m
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        probes = np.argsort(squared_distances(queries, self.coarse), axis=1)[:, :nprobe]
+        subspaces = np.arange(self.m)
+
+        for qi, query in enumerate(queries):
+            distances, candidates = [], []
+            for list_id in probes[qi]:
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                if start == end:
+                    continue
+                residual = (query - self.coarse[list_id]).reshape(self.m, 1, sub_dim)
+                table = np.sum((self.codebooks - residual) ** 2, axis=2)
+                distances.append(table[subspaces, self.codes[start:end]].sum(axis=1))
+                candidates.append(self.ids[start:end])
+
+            if not candidates:
+                continue
+            distances = np.concatenate(distances)
+            candidates = np.concatenate(candidates)
+
+            keep = min(shortlist, len(candidates))
+            top = np.argpartition(distances, keep - 1)[:keep]
+            candidates = candidates[top]
+
+            if refine_vectors is not None:
+                order = np.argsort(candidates)
+                candidates = candidates[order]
+                scores = normalize(refine_vectors[candidates]) @ query
+            else:
+                # ||q - x||^2 = 2 - 2 cos for unit vectors
+                scores = 1.0 - distances[top] / 2.0
+
+            best = np.argsort(-scores)[:k]
+            all_scores[qi, :len(best)] = scores[best]
+            all_ids[qi, :len(best)] = candidates[best]
+
+        return all_scores, all_ids
+
+    def save(self, path):
+        np.savez(
+            path,
+            nlist=self.nlist, m=self.m, ksub=self.ksub,
+            coarse=self.coarse, codebooks=self.codebooks,
+            codes=self.codes, ids=self.ids, offsets=self.offsets
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(int(data['nlist']), int(data['m']), int(data['ksub']))
+            index.coarse = data['coarse']
+            index.codebooks = data['codebooks']
+            index.codes = data['codes']
+            index.ids = data['ids']
+            index.offsets = data['offsets']
+        return index
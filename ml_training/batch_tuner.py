@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Micro-Batch Auto-Tuner
+======================
+Finds the largest training micro-batch that stays within a memory (RSS)
+budget, and the number of gradient accumulation steps needed to reach a
+requested global batch size with it.
+
+Each candidate micro-batch is probed in a fresh subprocess (TensorFlow
+does not hand memory back to the OS, so probes cannot share a process):
+the probe builds the training model, runs a few optimizer steps on random
+data and reports its peak RSS and throughput.
+
+Usage:
+    python batch_tuner.py --global-batch 128 --memory-budget-mb 6000
+    python train_model.py --batch_size 128 --memory-budget-mb 6000
+"""
+
+import sys
+import json
+import math
+import time
+import resource
+import argparse
+import subprocess
+from pathlib import Path
+
+PROBE_STEPS = 5
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def probe(micro_batch, img_size):
+    """Run a few training steps in this process; return peak RSS and throughput."""
+    import numpy as np
+    from train_model import NUM_CLASSES, create_model, make_optimizer
+
+    model = create_model(NUM_CLASSES, img_size=img_size, weights=None)
+    model.compile(
+        optimizer=make_optimizer(1e-4, accumulation_steps=2),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    images = np.random.rand(micro_batch, img_size, img_size, 3).astype(np.float32)
+    labels = np.eye(NUM_CLASSES, dtype=np.float32)[np.random.randint(NUM_CLASSES, size=micro_batch)]
+
+    for _ in range(2):
+        model.train_on_batch(images, labels)
+    start = time.perf_counter()
+    for _ in range(PROBE_STEPS):
+        model.train_on_batch(images, labels)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'micro_batch': micro_batch,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'images_per_sec': round(micro_batch * PROBE_STEPS / elapsed, 2)
+    }
+
+def run_probe(micro_batch, img_size):
+    """Probe one micro-batch size in a subprocess; None if it crashed (e.g. OOM-killed)."""
+    command = [sys.executable, str(Path(__file__).resolve()),
+               '--probe', str(micro_batch), '--img-size', str(img_size)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return None
+
+def autotune(global_batch, memory_budget_mb, img_size=224, min_batch=1):
+    """Return (micro_batch, accumulation_steps) for a global batch within the RSS budget.
+
+    Micro-batches are probed in doubling steps up to the global batch. The
+    largest one under budget sets the number of accumulation steps, and
+    the micro-batch is then rebalanced so steps x micro-batch covers the
+    global batch as evenly as possible.
+    """
+    print(f"\n🧮 Tuning micro-batch for global batch {global_batch} "
+          f"within {memory_budget_mb:.0f} MB RSS ({img_size}px)")
+    print(f"   {'Micro-batch':>11} {'Peak RSS MB':>12} {'Images/s':>9}")
+
+    best = None
+    candidate = min_batch
+    while candidate <= global_batch:
+        result = run_probe(candidate, img_size)
+        if result is None:
+            print(f"   {candidate:>11} {'failed':>12}")
+            break
+        fits = result['peak_rss_mb'] <= memory_budget_mb
+        print(f"   {candidate:>11} {result['peak_rss_mb']:>12.0f} {result['images_per_sec']:>9.1f}"
+              f"  {'✅' if fits else '❌ over budget'}")
+        if not fits:
+            break
+        best = result
+        if candidate == global_batch:
+            break
+        candidate = min(candidate * 2, global_batch)
+
+    if best is None:
+        raise SystemExit(f"❌ Even a micro-batch of {min_batch} exceeds {memory_budget_mb:.0f} MB")
+
+    steps = math.ceil(global_batch / best['micro_batch'])
+    micro_batch = math.ceil(global_batch / steps)
+    print(f"\n✅ Micro-batch {micro_batch} x {steps} accumulation steps "
+          f"= effective batch {micro_batch * steps}")
+    return micro_batch, steps
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the largest micro-batch within a memory budget')
+    parser.add_argument('--global-batch', type=int, default=32, help='Effective batch size wanted')
+    parser.add_argument('--memory-budget-mb', type=float, default=None, help='Peak RSS budget in MB')
+    parser.add_argument('--img-size', type=int, default=224, help='Training input size')
+    parser.add_argument('--probe', type=int, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.img_size)))
+        return
+    if args.memory_budget_mb is None:
+        parser.error('--memory-budget-mb is required')
+
+    autotune(args.global_batch, args.memory_budget_mb, args.img_size)
+
+if __name__ == '__main__':
+    main()
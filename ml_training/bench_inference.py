@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Lightweight Inference Benchmark
+===============================
+Measures what a fresh inference worker costs with each installed TFLite
+interpreter package (ai-edge-litert, tflite-runtime, full TensorFlow):
+import time, model load time, first and steady-state prediction latency
+and peak RSS. Each backend runs in its own subprocess, as a new serving
+worker would.
+
+It also checks parity: the same preprocessed images are classified by
+every backend, and the top-1 predictions must agree and the scores match
+within --tolerance. Exits non-zero if they do not.
+
+--preprocessing checks the other half of the pipeline: it compares
+inference.preprocess_image with the arrays the Keras validation generator
+(the one training is validated on) produces for the validation split, and
+reports which images differ and why (EXIF orientation, reduced-scale JPEG
+decode). With a model, it also reports how often the top-1 prediction
+changes between the two.
+
+Usage:
+    python bench_inference.py [--model models/waste_classifier.tflite] [--images dataset/ --num-images 100]
+    python bench_inference.py --preprocessing dataset/
+    pip install -r requirements-inference.txt   # lightweight backend
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+from pathlib import Path
+
+from batch_tuner import peak_rss_mb
+
+# Backend name -> module that provides it
+BACKEND_MODULES = {
+    'litert': 'ai_edge_litert',
+    'tflite_runtime': 'tflite_runtime',
+    'tensorflow': 'tensorflow'
+}
+LATENCY_RUNS = 20
+
+def worker(backend, model_path, image_list, scores_path):
+    """Cold-start one backend in this process and classify the listed images."""
+    start = time.perf_counter()
+    import numpy as np
+    from inference import TFLiteClassifier, preprocess_image
+    classifier = TFLiteClassifier(model_path, backend=backend)
+    imported = time.perf_counter()
+
+    paths = Path(image_list).read_text().split('\n') if Path(image_list).stat().st_size else []
+    size = classifier.input_size
+    if paths:
+        images = np.stack([preprocess_image(p, size) for p in paths])
+    else:
+        images = np.random.default_rng(0).random((8, size, size, 3), dtype=np.float32)
+    loaded = time.perf_counter()
+
+    classifier.predict(images[0])
+    first = time.perf_counter()
+    for _ in range(LATENCY_RUNS):
+        classifier.predict(images[0])
+    latency = (time.perf_counter() - first) / LATENCY_RUNS
+
+    scores = np.concatenate([classifier.predict_batch(images[i:i + 32]) for i in range(0, len(images), 32)])
+    np.save(scores_path, scores)
+    return {
+        'backend': backend,
+        'import_and_load_s': round(imported - start, 3),
+        'first_predict_ms': round((first - loaded) * 1000, 2),
+        'latency_ms': round(latency * 1000, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'tensorflow_imported': 'tensorflow' in sys.modules
+    }
+
+def run_worker(backend, model_path, image_list, scores_path):
+    command = [sys.executable, str(Path(__file__).resolve()), '--worker', backend,
+               '--model', model_path, '--image-list', image_list, '--scores', scores_path]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {'backend': backend, 'error': (result.stderr.strip().splitlines() or ['failed'])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def installed_backends():
+    return [name for name, module in BACKEND_MODULES.items() if importlib.util.find_spec(module)]
+
+def check_parity(reference, other):
+    """Return (top-1 agreement, max abs score difference) between two score arrays."""
+    import numpy as np
+    agreement = float(np.mean(np.argmax(reference, axis=1) == np.argmax(other, axis=1)))
+    return agreement, float(np.max(np.abs(reference - other)))
+
+def divergence_reason(path, size):
+    """Which known preprocessing difference applies to an image, if any."""
+    from PIL import Image
+    with Image.open(path) as image:
+        reasons = []
+        if image.getexif().get(0x0112, 1) != 1:
+            reasons.append('EXIF orientation')
+        if image.format == 'JPEG' and min(image.size) >= 2 * size:
+            reasons.append('reduced-scale JPEG decode')
+    return ', '.join(reasons) or 'unknown'
+
+def check_preprocessing(dataset_dir, model_path, tolerance, max_listed=10):
+    """Compare preprocess_image with the Keras validation generator; True if they match."""
+    import numpy as np
+    from inference import IMG_SIZE, TFLiteClassifier, preprocess_image
+    from dataset_manifest import build_manifest, load_manifest
+    from train_model import CLASSES, create_data_generators
+
+    classifier = TFLiteClassifier(model_path) if Path(model_path).exists() else None
+    size = classifier.input_size if classifier else IMG_SIZE
+    manifest = build_manifest(dataset_dir, CLASSES, previous=load_manifest())
+    _, val_gen = create_data_generators(dataset_dir, 32, manifest=manifest, img_size=size)
+    if not val_gen.samples:
+        print("❌ The validation split is empty.")
+        return False
+
+    keras_images = np.concatenate([val_gen[i][0] for i in range(len(val_gen))])
+    paths = val_gen.filepaths
+    images = np.stack([preprocess_image(p, size) for p in paths])
+    difference = np.abs(images - keras_images).reshape(len(paths), -1)
+    max_difference = difference.max(axis=1)
+    mismatched = np.flatnonzero(max_difference > tolerance)
+
+    print(f"\n🔍 Preprocessing parity: inference.preprocess_image vs Keras generator ({size}px)")
+    print(f"   {len(paths)} validation images, {len(mismatched)} differ by more than {tolerance:g}")
+    if classifier:
+        agreement = np.mean(
+            np.argmax(classifier.predict_batch(images), axis=1) ==
+            np.argmax(classifier.predict_batch(keras_images.astype(np.float32)), axis=1)
+        )
+        print(f"   Top-1 agreement on {model_path}: {agreement:.1%}")
+
+    worst = mismatched[np.argsort(-difference[mismatched].mean(axis=1))][:max_listed]
+    for i in worst:
+        print(f"   ❌ {paths[i]}: mean diff {difference[i].mean():.4f}, "
+              f"max {max_difference[i]:.4f} ({divergence_reason(paths[i], size)})")
+    if len(mismatched) > len(worst):
+        print(f"   ... and {len(mismatched) - len(worst)} more")
+    return not len(mismatched)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cold start, RSS and predictions of TFLite backends')
+    parser.add_argument('--model', type=str, default='models/waste_classifier.tflite', help='Path to TFLite model')
+    parser.add_argument('--images', nargs='*', default=[], help='Images or directories for the parity check')
+    parser.add_argument('--num-images', type=int, default=100, help='Maximum images to classify')
+    parser.add_argument('--backends', nargs='+', default=None, choices=list(BACKEND_MODULES),
+                       help='Backends to compare (default: all installed)')
+    parser.add_argument('--tolerance', type=float, default=1e-4,
+                       help='Maximum allowed score (or, with --preprocessing, pixel) difference')
+    parser.add_argument('--preprocessing', type=str, default=None, metavar='DATASET',
+                       help='Compare preprocess_image with the Keras generator on this dataset\'s validation split')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--image-list', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--scores', type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.model, args.image_list, args.scores)))
+        return
+
+    if args.preprocessing:
+        if not check_preprocessing(args.preprocessing, args.model, args.tolerance):
+            sys.exit(1)
+        print("\n✅ preprocess_image matches the Keras generator")
+        return
+
+    from inference import list_images
+    import numpy as np
+
+    backends = args.backends or installed_backends()
+    missing = [name for name in BACKEND_MODULES if name not in backends]
+    images = [str(p) for p in list_images(args.images)[:args.num_images]]
+
+    print(f"\n🪶 Inference cold start: {args.model}")
+    print(f"   {len(images) or 'random'} images, backends: {', '.join(backends)}")
+    if missing and not args.backends:
+        print(f"   Not installed: {', '.join(missing)} (pip install -r requirements-inference.txt)")
+
+    results, scores = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        image_list = Path(tmp) / 'images.txt'
+        image_list.write_text('\n'.join(images))
+        for backend in backends:
+            scores_path = str(Path(tmp) / f'{backend}.npy')
+            result = run_worker(backend, args.model, str(image_list), scores_path)
+            results.append(result)
+            if 'error' not in result:
+                scores[backend] = np.load(scores_path)
+
+    print(f"\n   {'Backend':15} {'Import+load s':>13} {'First ms':>9} {'Latency ms':>11} {'Peak RSS MB':>12}  TF imported")
+    for result in results:
+        if 'error' in result:
+            print(f"   {result['backend']:15} ❌ {result['error']}")
+            continue
+        print(f"   {result['backend']:15} {result['import_and_load_s']:>13.2f} {result['first_predict_ms']:>9.2f} "
+              f"{result['latency_ms']:>11.2f} {result['peak_rss_mb']:>12.0f}  "
+              f"{'yes' if result['tensorflow_imported'] else 'no'}")
+
+    if len(scores) < 2:
+        print("\nℹ️  Parity check needs at least two working backends.")
+        return
+
+    reference = 'tensorflow' if 'tensorflow' in scores else next(iter(scores))
+    print(f"\n🔍 Parity against {reference}:")
+    passed = True
+    for backend, other in scores.items():
+        if backend == reference:
+            continue
+        agreement, difference = check_parity(scores[reference], other)
+        ok = agreement == 1.0 and difference <= args.tolerance
+        passed &= ok
+        print(f"   {backend:15} top-1 agreement {agreement:.1%}, max score diff {difference:.2e}  "
+              f"{'✅' if ok else '❌'}")
+
+    if not passed:
+        sys.exit(1)
+    print("\n✅ All backends give the same predictions")
+
+if __name__ == '__main__':
+    main()
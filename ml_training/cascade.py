@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Cascaded Inference
+==================
+Runs a small, fast model first and only escalates to the full model when
+the small model is not confident enough. Each class has its own
+confidence threshold, chosen on the validation split so that images the
+small model answers are still classified at a target accuracy.
+
+The small model is the 128px variant from multi_resolution.py by default.
+It reads its input by nearest-neighbour downsampling of the full-size
+batch, so each image is decoded once for both models.
+
+CascadeClassifier has the same predict_batch() interface as
+TFLiteClassifier and can be used by classify.py and serve.py (--cascade).
+
+Usage:
+    python cascade.py [--tiny models/variants/waste_classifier_128.tflite] [--target-accuracy 0.95]
+    python classify.py dataset/ --cascade models/cascade_thresholds.json
+    python serve.py --cascade models/cascade_thresholds.json
+"""
+
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_MODEL_PATH,
+    DEFAULT_LABELS_PATH,
+    TFLiteClassifier,
+    load_labels,
+    preprocess_image
+)
+from dataset_manifest import build_manifest, load_manifest, split_manifest
+from prediction_cache import hash_file
+
+DEFAULT_TINY_MODEL = 'models/variants/waste_classifier_128.tflite'
+DEFAULT_THRESHOLDS_PATH = 'models/cascade_thresholds.json'
+
+def resize_batch(batch, size):
+    """Nearest-neighbour resize of a (N, H, W, 3) batch to (N, size, size, 3)."""
+    height, width = batch.shape[1:3]
+    rows = ((np.arange(size) + 0.5) * height / size).astype(int)
+    cols = ((np.arange(size) + 0.5) * width / size).astype(int)
+    return batch[:, rows][:, :, cols]
+
+def accept_mask(scores, thresholds):
+    """True where the top score clears the threshold of the predicted class."""
+    predicted = np.argmax(scores, axis=1)
+    return np.max(scores, axis=1) >= thresholds[predicted]
+
+class CascadeClassifier:
+    """Small model first, full model for the inputs it is unsure about.
+
+    `thresholds` holds one confidence threshold per class (np.inf means
+    always escalate). Not thread-safe; create one per worker.
+    """
+
+    def __init__(self, tiny_path, full_path, thresholds, num_threads=None):
+        self.tiny = TFLiteClassifier(tiny_path, num_threads=num_threads)
+        self.full = TFLiteClassifier(full_path, num_threads=num_threads)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.input_size = self.full.input_size
+        self.embedding_details = None
+        self.model_path = str(full_path)
+        self.total = 0
+        self.escalated = 0
+
+        digest = hashlib.sha256()
+        for part in (hash_file(tiny_path), hash_file(full_path), self.thresholds.tobytes()):
+            digest.update(part if isinstance(part, bytes) else part.encode())
+        self.model_hash = digest.hexdigest()
+
+    @classmethod
+    def from_file(cls, thresholds_path=DEFAULT_THRESHOLDS_PATH, num_threads=None):
+        """Load the models and thresholds written by the calibration tool."""
+        with open(thresholds_path) as f:
+            config = json.load(f)
+        for key in ('tiny', 'full'):
+            if hash_file(config[f'{key}_model']) != config[f'{key}_sha256']:
+                print(f"⚠️  {config[f'{key}_model']} changed since calibration; re-run cascade.py")
+        thresholds = [np.inf if t is None else t for t in config['thresholds'].values()]
+        return cls(config['tiny_model'], config['full_model'], thresholds, num_threads)
+
+    def predict_batch(self, batch):
+        """Return (N, classes) scores; rows the tiny model is unsure about come from the full model."""
+        batch = np.asarray(batch, dtype=np.float32)
+        scores = self.tiny.predict_batch(resize_batch(batch, self.tiny.input_size))
+        escalate = ~accept_mask(scores, self.thresholds)
+        if escalate.any():
+            scores[escalate] = self.full.predict_batch(batch[escalate])
+
+        self.total += len(batch)
+        self.escalated += int(escalate.sum())
+        return scores
+
+    def predict(self, image):
+        return self.predict_batch(image[np.newaxis])[0]
+
+    def stats(self):
+        return {
+            'images': self.total,
+            'escalated': self.escalated,
+            'escalation_rate': self.escalated / self.total if self.total else 0.0
+        }
+
+def calibrate_thresholds(tiny_scores, labels, num_classes, target_accuracy=0.95, min_samples=20):
+    """Lowest per-class threshold whose accepted images meet the target accuracy.
+
+    For each class, the tiny model's predictions of that class are sorted by
+    confidence; the threshold is the lowest confidence at which the
+    accepted set (everything at or above it) is still at least
+    `target_accuracy` correct and has at least `min_samples` images.
+    Classes that never qualify always escalate (np.inf).
+    """
+    predicted = np.argmax(tiny_scores, axis=1)
+    confidence = np.max(tiny_scores, axis=1)
+    thresholds = np.full(num_classes, np.inf, dtype=np.float32)
+
+    for class_id in range(num_classes):
+        members = np.where(predicted == class_id)[0]
+        if len(members) < min_samples:
+            continue
+        order = members[np.argsort(-confidence[members], kind='stable')]
+        sorted_confidence = confidence[order]
+        accuracy = np.cumsum(labels[order] == class_id) / np.arange(1, len(order) + 1)
+
+        # Only cut between distinct confidences, since ties are accepted together
+        cut = np.append(sorted_confidence[1:] != sorted_confidence[:-1], True)
+        valid = np.where(cut & (accuracy >= target_accuracy) & (np.arange(1, len(order) + 1) >= min_samples))[0]
+        if len(valid):
+            thresholds[class_id] = sorted_confidence[valid[-1]]
+    return thresholds
+
+def evaluate_cascade(tiny_scores, full_scores, labels, thresholds):
+    accepted = accept_mask(tiny_scores, thresholds)
+    cascade_scores = np.where(accepted[:, None], tiny_scores, full_scores)
+    return {
+        'images': int(len(labels)),
+        'tiny_accuracy': float(np.mean(np.argmax(tiny_scores, axis=1) == labels)),
+        'full_accuracy': float(np.mean(np.argmax(full_scores, axis=1) == labels)),
+        'cascade_accuracy': float(np.mean(np.argmax(cascade_scores, axis=1) == labels)),
+        'escalation_rate': float(1.0 - np.mean(accepted))
+    }
+
+def measure_latency(classifier, images, num_images=200):
+    """Average single-image latency in ms over up to num_images images."""
+    images = images[:num_images]
+    classifier.predict(images[0])
+    start = time.perf_counter()
+    for image in images:
+        classifier.predict(image)
+    return (time.perf_counter() - start) * 1000 / len(images)
+
+def load_validation_images(dataset_dir, labels_list, size, workers=8):
+    """Preprocessed validation images (manifest split) and their class ids."""
+    manifest = build_manifest(dataset_dir, labels_list, previous=load_manifest())
+    _, val_files = split_manifest(manifest)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        images = np.stack(list(executor.map(
+            lambda relative: preprocess_image(Path(dataset_dir) / relative, size), val_files
+        )))
+    labels = np.array([labels_list.index(manifest['files'][f]['class']) for f in val_files])
+    return images, labels
+
+def score_in_batches(classifier, images, batch_size=32):
+    return np.concatenate([
+        classifier.predict_batch(images[start:start + batch_size])
+        for start in range(0, len(images), batch_size)
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate per-class thresholds for cascaded inference')
+    parser.add_argument('--tiny', type=str, default=DEFAULT_TINY_MODEL, help='Small TFLite model')
+    parser.add_argument('--full', type=str, default=DEFAULT_MODEL_PATH, help='Full TFLite model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--target-accuracy', type=float, default=0.95,
+                       help='Required accuracy on images the small model answers')
+    parser.add_argument('--min-samples', type=int, default=20,
+                       help='Minimum validation images a class threshold must be based on')
+    parser.add_argument('--latency-images', type=int, default=200,
+                       help='Images used to measure single-image latency')
+    parser.add_argument('--threads', type=int, default=None, help='Interpreter threads')
+    parser.add_argument('--output', type=str, default=DEFAULT_THRESHOLDS_PATH,
+                       help='Where to write the thresholds')
+
+    args = parser.parse_args()
+
+    for path in (args.tiny, args.full):
+        if not Path(path).exists():
+            print(f"❌ Model not found: {path}")
+            print("   Export the small model with: python multi_resolution.py --sizes 128 224")
+            return
+
+    labels_list = load_labels(args.labels)
+    tiny = TFLiteClassifier(args.tiny, num_threads=args.threads)
+    full = TFLiteClassifier(args.full, num_threads=args.threads)
+
+    print(f"\n📂 Loading validation split from: {args.dataset}")
+    images, labels = load_validation_images(args.dataset, labels_list, full.input_size)
+    print(f"   {len(images)} images")
+
+    tiny_scores = score_in_batches(tiny, resize_batch(images, tiny.input_size))
+    full_scores = score_in_batches(full, images)
+
+    thresholds = calibrate_thresholds(tiny_scores, labels, len(labels_list),
+                                      args.target_accuracy, args.min_samples)
+    report = evaluate_cascade(tiny_scores, full_scores, labels, thresholds)
+
+    cascade = CascadeClassifier(args.tiny, args.full, thresholds, num_threads=args.threads)
+    report['latency_ms'] = {
+        'tiny': measure_latency(tiny, resize_batch(images, tiny.input_size), args.latency_images),
+        'full': measure_latency(full, images, args.latency_images),
+        'cascade': measure_latency(cascade, images, args.latency_images)
+    }
+
+    config = {
+        'created': datetime.now().isoformat(),
+        'tiny_model': args.tiny,
+        'tiny_sha256': hash_file(args.tiny),
+        'full_model': args.full,
+        'full_sha256': hash_file(args.full),
+        'target_accuracy': args.target_accuracy,
+        'thresholds': {
+            label: None if np.isinf(t) else round(float(t), 6)
+            for label, t in zip(labels_list, thresholds)
+        },
+        'validation': report
+    }
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(config, f, indent=2)
+
+    print("\n🎚️  Per-class thresholds:")
+    for label, t in config['thresholds'].items():
+        print(f"   {label:15} : {'always escalate' if t is None else f'{t:.4f}'}")
+    print(f"\n📊 Validation ({report['images']} images):")
+    print(f"   Small model accuracy:   {report['tiny_accuracy']:.4f}")
+    print(f"   Full model accuracy:    {report['full_accuracy']:.4f}")
+    print(f"   Cascade accuracy:       {report['cascade_accuracy']:.4f}")
+    print(f"   Escalation rate:        {report['escalation_rate']:.1%}")
+    latency = report['latency_ms']
+    print(f"   Avg latency (ms):       small {latency['tiny']:.2f} | "
+          f"full {latency['full']:.2f} | cascade {latency['cascade']:.2f}")
+    print(f"\n✅ Thresholds saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Bulk Image Classification
+=========================
+Classifies every image in the given files/directories with the TFLite
+model and writes the predictions to a CSV file. Predictions are looked up
+in the content-addressed prediction cache first, so re-scoring the same
+corpus after a run only runs inference on new or changed images.
+
+Usage:
+    python classify.py dataset/ [--output predictions.csv] [--batch-size 32] [--no-cache]
+    python classify.py dataset/ --cascade models/cascade_thresholds.json
+    python classify.py disputed/ --tta 8 [--tta-threshold 0.8]
+"""
+
+import csv
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_MODEL_PATH,
+    DEFAULT_LABELS_PATH,
+    TFLiteClassifier,
+    list_images,
+    load_labels,
+    preprocess_image
+)
+from prediction_cache import DEFAULT_CACHE_PATH, PredictionCache, hash_bytes, print_stats
+from cascade import CascadeClassifier
+from tta import MAX_VIEWS, TTAClassifier
+
+def hash_image_file(path):
+    return hash_bytes(path.read_bytes())
+
+def classify_images(paths, classifier, cache=None, batch_size=32, workers=4):
+    """Return an (N, classes) score array for the given image paths.
+
+    Cached images skip decoding and inference; misses are decoded in a
+    thread pool and run in batches.
+    """
+    scores = [None] * len(paths)
+    misses = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = executor.map(hash_image_file, paths) if cache else [None] * len(paths)
+        for index, (path, image_hash) in enumerate(zip(paths, hashes)):
+            cached = cache.get(image_hash) if cache else None
+            if cached is not None:
+                scores[index] = cached
+            else:
+                misses.append((index, path, image_hash))
+
+        for start in range(0, len(misses), batch_size):
+            chunk = misses[start:start + batch_size]
+            batch = np.stack(list(executor.map(
+                lambda item: preprocess_image(item[1], classifier.input_size), chunk
+            )))
+            batch_scores = classifier.predict_batch(batch)
+
+            for (index, _, _), row in zip(chunk, batch_scores):
+                scores[index] = row
+            if cache:
+                cache.put_many([(image_hash, row) for (_, _, image_hash), row in zip(chunk, batch_scores)])
+
+    return np.stack(scores) if scores else np.zeros((0, 0), dtype=np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify a directory of images with the TFLite model')
+    parser.add_argument('paths', nargs='+', help='Image files or directories')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH,
+                       help='Path to TFLite model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH,
+                       help='Path to labels file')
+    parser.add_argument('--output', type=str, default='predictions.csv',
+                       help='Output CSV path')
+    parser.add_argument('--batch-size', type=int, default=32, help='Images per invoke')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_PATH,
+                       help='Prediction cache database')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the prediction cache')
+    parser.add_argument('--cascade', type=str, default=None,
+                       help='Cascade thresholds file (small model first, full model on low confidence)')
+    parser.add_argument('--tta', type=int, default=1,
+                       help=f'Score each image as this many augmented views (1-{MAX_VIEWS})')
+    parser.add_argument('--tta-threshold', type=float, default=None,
+                       help='Only add TTA views when the plain prediction is less confident than this')
+
+    args = parser.parse_args()
+
+    paths = list_images(args.paths)
+    if not paths:
+        print("❌ No images found.")
+        return
+
+    labels = load_labels(args.labels)
+    if args.cascade:
+        classifier = CascadeClassifier.from_file(args.cascade)
+    else:
+        classifier = TFLiteClassifier(args.model)
+    if args.tta > 1:
+        classifier = TTAClassifier(classifier, args.tta, args.tta_threshold)
+    model_hash = getattr(classifier, 'model_hash', None)
+    cache = None if args.no_cache else PredictionCache(args.model, args.cache, model_hash=model_hash)
+
+    print(f"\n🔍 Classifying {len(paths)} images...")
+    start = time.perf_counter()
+    scores = classify_images(paths, classifier, cache, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'label', 'confidence'] + labels)
+        for path, row in zip(paths, scores):
+            best = int(np.argmax(row))
+            writer.writerow([str(path), labels[best], f"{row[best]:.4f}"] + [f"{s:.4f}" for s in row])
+
+    print(f"✅ Predictions saved to: {args.output}")
+    print(f"   Time: {elapsed:.2f}s ({len(paths) / elapsed:.1f} images/s)")
+    if args.cascade:
+        stats = classifier.stats()
+        print(f"   Escalated to full model: {stats['escalated']}/{stats['images']} "
+              f"({stats['escalation_rate']:.1%})")
+    if args.tta > 1:
+        stats = classifier.stats()
+        print(f"   Scored with {args.tta} TTA views: {stats['augmented']}/{stats['images']} "
+              f"({stats['augmented_rate']:.1%})")
+
+    if cache:
+        print("\n📦 Prediction cache:")
+        print_stats(cache.stats())
+        cache.close()
+
+if __name__ == '__main__':
+    main()
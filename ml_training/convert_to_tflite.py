@@ -4,21 +4,54 @@ Convert Keras Model to TensorFlow Lite
 ======================================
 Converts the trained waste classifier to TFLite format for mobile deployment.
 
+Conversions are cached in the model registry, keyed by the hash of the
+Keras model and the converter options; converting an unchanged model
+restores the cached TFLite file instead of converting it again.
+
+--saved-model and --onnx also export the model for the other server
+runtimes in runtimes.py (the ONNX export needs tf2onnx).
+
 Usage:
-    python convert_to_tflite.py [--quantize] [--optimize]
+    python convert_to_tflite.py [--quantize] [--optimize] [--embedding] [--force]
+    python convert_to_tflite.py --saved-model --onnx
 """
 
 import os
+import json
 import argparse
 import numpy as np
 from pathlib import Path
 import tensorflow as tf
 
+from inference import DEFAULT_LABELS_PATH, PREPROCESSING_VERSION, load_labels, metadata_path_for
+from model_registry import ModelRegistry
+from prediction_cache import hash_file
+
+def conversion_inputs(model_path, variant, quantize, optimize):
+    """Everything a conversion's output depends on."""
+    return {
+        'source_sha256': hash_file(model_path),
+        'variant': variant,
+        'options': {'quantize': quantize, 'optimize': optimize},
+        'tensorflow': tf.__version__
+    }
+
+def restore_conversion(registry, inputs, output_path, force=False, artifact='tflite'):
+    """Restore a cached conversion to output_path; return (key, hit)."""
+    key, record = registry.lookup('convert', inputs)
+    if record is None or force:
+        return key, False
+    registry.restore(record, artifact, output_path)
+    print(f"\n♻️  Model unchanged since conversion {key[:12]}; reused cached {output_path}")
+    return key, True
+
 def convert_to_tflite(
     model_path='models/waste_classifier_best.keras',
     output_path='models/waste_classifier.tflite',
     quantize=True,
-    optimize=True
+    optimize=True,
+    labels_path=DEFAULT_LABELS_PATH,
+    force=False
 ):
     """Convert Keras model to TFLite format."""
     
@@ -32,6 +65,13 @@ def convert_to_tflite(
         print("Please run train_model.py first.")
         return False
     
+    registry = ModelRegistry()
+    inputs = conversion_inputs(model_path, 'classifier', quantize, optimize)
+    key, cached = restore_conversion(registry, inputs, output_path, force)
+    if cached:
+        create_metadata(output_path, labels_path, registry)
+        return True
+    
     # Load the Keras model
     print(f"\n📂 Loading model: {model_path}")
     model = tf.keras.models.load_model(model_path)
@@ -78,9 +118,10 @@ def convert_to_tflite(
     # Verify the converted model
     print("\n🔍 Verifying converted model...")
     verify_tflite_model(output_path)
+    registry.store('convert', key, inputs, {'tflite': output_path})
     
     # Create metadata file
-    create_metadata(output_path)
+    create_metadata(output_path, labels_path, registry)
     
     print("\n" + "="*60)
     print("✅ CONVERSION COMPLETE!")
@@ -96,6 +137,108 @@ def convert_to_tflite(
     
     return True
 
+def build_embedding_model(model):
+    """Expose the penultimate Dense(128) activations next to the class scores.
+
+    Returns a Keras model with outputs [embedding, scores] that shares all
+    weights with `model`.
+    """
+    dense_layers = [layer for layer in model.layers if isinstance(layer, tf.keras.layers.Dense)]
+    if len(dense_layers) < 2:
+        raise ValueError("Model has no penultimate Dense layer to use as embedding")
+    
+    return tf.keras.Model(
+        inputs=model.inputs,
+        outputs=[dense_layers[-2].output, model.outputs[0]],
+        name='waste_classifier_embedding'
+    )
+
+def convert_embedding_model(
+    model_path='models/waste_classifier_best.keras',
+    output_path='models/waste_classifier_embedding.tflite',
+    optimize=True,
+    force=False
+):
+    """Convert a two-output (embedding, scores) TFLite model."""
+    
+    registry = ModelRegistry()
+    inputs = conversion_inputs(model_path, 'embedding', False, optimize)
+    key, cached = restore_conversion(registry, inputs, output_path, force)
+    if cached:
+        return output_path
+    
+    print(f"\n🔄 Converting embedding model: {output_path}")
+    model = tf.keras.models.load_model(model_path)
+    embedding_model = build_embedding_model(model)
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(embedding_model)
+    if optimize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    tflite_model = converter.convert()
+    
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    
+    print(f"   ✅ Embedding model saved to: {output_path}")
+    verify_tflite_model(output_path)
+    registry.store('convert', key, inputs, {'tflite': output_path})
+    return output_path
+
+def serving_function(model):
+    """Inference-mode tf.function over float32 (N, H, W, 3) batches.
+    
+    The model's augmentation layers (RandomFlip, RandomRotation, ...) stay
+    active in a plain model.export(), so exports trace this instead.
+    """
+    size = model.input_shape[1]
+    spec = [tf.TensorSpec((None, size, size, 3), tf.float32, name='input')]
+    return tf.function(lambda images: model(images, training=False), input_signature=spec), spec
+
+def export_saved_model(
+    model_path='models/waste_classifier_best.keras',
+    output_dir='models/waste_classifier_savedmodel'
+):
+    """Export a TensorFlow SavedModel with a `serve` endpoint for the keras runtime."""
+    print(f"\n📦 Exporting SavedModel: {output_dir}")
+    model = tf.keras.models.load_model(model_path)
+    serve, spec = serving_function(model)
+    archive = tf.keras.export.ExportArchive()
+    archive.track(model)
+    archive.add_endpoint('serve', serve, input_signature=spec)
+    archive.write_out(output_dir, verbose=False)
+    print(f"   ✅ SavedModel saved to: {output_dir}")
+    return output_dir
+
+def export_onnx(
+    model_path='models/waste_classifier_best.keras',
+    output_path='models/waste_classifier.onnx',
+    opset=13,
+    force=False
+):
+    """Export the model to ONNX for the onnx runtime (ONNX Runtime on CPU)."""
+    try:
+        import tf2onnx
+    except ImportError:
+        raise SystemExit("❌ ONNX export needs tf2onnx: pip install tf2onnx onnxruntime")
+    
+    registry = ModelRegistry()
+    inputs = conversion_inputs(model_path, f'onnx-opset{opset}', False, False)
+    key, cached = restore_conversion(registry, inputs, output_path, force, artifact='onnx')
+    if cached:
+        return output_path
+    
+    print(f"\n🔄 Exporting ONNX model: {output_path}")
+    model = tf.keras.models.load_model(model_path)
+    serve, spec = serving_function(model)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    tf2onnx.convert.from_function(serve, input_signature=spec, opset=opset, output_path=output_path)
+    
+    print(f"   ✅ ONNX model saved to: {output_path}")
+    registry.store('convert', key, inputs, {'onnx': output_path})
+    return output_path
+
 def verify_tflite_model(model_path):
     """Verify the TFLite model works correctly."""
     
@@ -121,28 +264,53 @@ def verify_tflite_model(model_path):
     
     output = interpreter.get_tensor(output_details[0]['index'])
     print(f"   Test output:  {output[0][:3]}... (showing first 3 classes)")
+    
+    flex_ops = sorted({op['op_name'] for op in interpreter._get_ops_details() if op['op_name'].startswith('Flex')})
+    if flex_ops:
+        print(f"   ⚠️  Flex (TF fallback) ops: {', '.join(flex_ops)}")
+        print(f"      See: python profile_tflite.py {model_path}")
     print(f"   ✅ Model verification passed!")
 
-def create_metadata(model_path):
-    """Create a metadata JSON file for the model."""
-    import json
+def create_metadata(model_path, labels_path=DEFAULT_LABELS_PATH, registry=None):
+    """Create a metadata JSON file for the model.
+
+    Classes come from the labels file, whose hash is recorded so the app
+    can check it ships the matching labels. The version is derived from
+    the model hash, and the registry lineage records the dataset, config
+    and conversion options that produced the model.
+    """
     from datetime import datetime
     
+    interpreter = tf.lite.Interpreter(model_path=model_path)
+    input_size = int(interpreter.get_input_details()[0]['shape'][1])
+    model_sha256 = hash_file(model_path)
+    registry = registry or ModelRegistry()
+    lineage = [
+        {'stage': r['stage'], 'key': r['key'], 'created': r['created'], 'inputs': r['inputs']}
+        for r in registry.lineage(model_path)
+    ]
+    
     metadata = {
         'name': 'Waste Classifier',
-        'version': '1.0.0',
+        'version': f"1.0.0+{model_sha256[:8]}",
         'created': datetime.now().isoformat(),
-        'input_size': 224,
-        'classes': ['organic', 'recyclable', 'hazardous', 'ewaste', 'general'],
+        'input_size': input_size,
+        'classes': load_labels(labels_path),
+        'model_sha256': model_sha256,
+        'labels_sha256': hash_file(labels_path),
+        'lineage': lineage,
         'description': 'MobileNetV2-based waste classification model',
         'preprocessing': {
+            'version': PREPROCESSING_VERSION,
+            'color': 'RGB',
+            'resize': 'nearest',
             'normalize': True,
             'mean': [0.0, 0.0, 0.0],
             'std': [1.0, 1.0, 1.0]
         }
     }
     
-    metadata_path = model_path.replace('.tflite', '_metadata.json')
+    metadata_path = metadata_path_for(model_path)
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
     
@@ -192,6 +360,16 @@ def main():
                        help='Disable optimization')
     parser.add_argument('--benchmark', action='store_true',
                        help='Run inference benchmark')
+    parser.add_argument('--embedding', action='store_true',
+                       help='Also export a TFLite model that outputs 128-d embeddings')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH,
+                       help='Labels file recorded in the metadata')
+    parser.add_argument('--force', action='store_true',
+                       help='Convert even if the registry has a cached conversion')
+    parser.add_argument('--saved-model', action='store_true',
+                       help='Also export a TensorFlow SavedModel (keras runtime)')
+    parser.add_argument('--onnx', action='store_true',
+                       help='Also export an ONNX model (onnx runtime, needs tf2onnx)')
     
     args = parser.parse_args()
     
@@ -199,9 +377,25 @@ def main():
         model_path=args.model,
         output_path=args.output,
         quantize=not args.no_quantize,
-        optimize=not args.no_optimize
+        optimize=not args.no_optimize,
+        labels_path=args.labels,
+        force=args.force
     )
     
+    if success and args.embedding:
+        convert_embedding_model(
+            model_path=args.model,
+            output_path=args.output.replace('.tflite', '_embedding.tflite'),
+            optimize=not args.no_optimize,
+            force=args.force
+        )
+    
+    if success and args.saved_model:
+        export_saved_model(args.model, args.output.replace('.tflite', '_savedmodel'))
+    
+    if success and args.onnx:
+        export_onnx(args.model, args.output.replace('.tflite', '.onnx'), force=args.force)
+    
     if success and args.benchmark:
         benchmark_model(args.output)
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Dataset Manifest
+================
+Records every image in the dataset with its class, size, mtime and
+SHA-256 content hash. Training saves the manifest it used, so the next
+run can tell which images were added or changed since then, and the
+train/validation split is derived from the content hash so it stays
+stable as images are added.
+
+Usage:
+    python dataset_manifest.py [--dataset dataset] [--diff models/dataset_manifest.json]
+"""
+
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from inference import DEFAULT_LABELS_PATH, IMAGE_EXTENSIONS, load_labels
+from prediction_cache import hash_file
+
+DEFAULT_MANIFEST_PATH = 'models/dataset_manifest.json'
+
+def build_manifest(dataset_dir, classes, previous=None):
+    """Scan the dataset and return a manifest dict.
+
+    Hashes from `previous` are reused for files whose size and mtime are
+    unchanged, so rebuilding the manifest only reads new or edited files.
+    """
+    dataset_dir = Path(dataset_dir)
+    known = previous['files'] if previous else {}
+    files = {}
+
+    for class_name in classes:
+        class_dir = dataset_dir / class_name
+        if not class_dir.exists():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.suffix.lower() not in IMAGE_EXTENSIONS:
+                continue
+            stat = path.stat()
+            relative = f"{class_name}/{path.name}"
+            entry = known.get(relative)
+            if not entry or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+                entry = {
+                    'class': class_name,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'sha256': hash_file(path)
+                }
+            files[relative] = entry
+
+    return {
+        'dataset_dir': str(dataset_dir),
+        'created': datetime.now().isoformat(),
+        'classes': list(classes),
+        'files': files
+    }
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH):
+    """Load a saved manifest, or return None if there is none."""
+    if not Path(path).exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+def manifest_hash(manifest):
+    """Hash of the dataset contents (paths, classes and file hashes)."""
+    digest = hashlib.sha256()
+    for relative in sorted(manifest['files']):
+        entry = manifest['files'][relative]
+        digest.update(f"{relative}\0{entry['class']}\0{entry['sha256']}\n".encode())
+    return digest.hexdigest()
+
+def diff_manifests(old, new):
+    """Return (added_or_changed, removed) relative paths between two manifests."""
+    old_files = old['files'] if old else {}
+    changed = [
+        relative for relative, entry in new['files'].items()
+        if relative not in old_files or old_files[relative]['sha256'] != entry['sha256']
+    ]
+    removed = [relative for relative in old_files if relative not in new['files']]
+    return changed, removed
+
+def is_validation(entry, validation_split=0.2):
+    """Deterministic content-hash split; unaffected by files being added."""
+    return int(entry['sha256'][:8], 16) / 0xFFFFFFFF < validation_split
+
+def split_manifest(manifest, validation_split=0.2):
+    """Return (train, validation) lists of relative paths."""
+    train, validation = [], []
+    for relative, entry in sorted(manifest['files'].items()):
+        (validation if is_validation(entry, validation_split) else train).append(relative)
+    return train, validation
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or diff the dataset manifest')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--diff', type=str, default=DEFAULT_MANIFEST_PATH,
+                       help='Manifest to compare against')
+    parser.add_argument('--save', type=str, default=None,
+                       help='Write the new manifest to this path')
+
+    args = parser.parse_args()
+
+    previous = load_manifest(args.diff)
+    manifest = build_manifest(args.dataset, load_labels(args.labels), previous=previous)
+    changed, removed = diff_manifests(previous, manifest)
+
+    print(f"\n📋 Dataset manifest: {len(manifest['files'])} images")
+    print(f"   Hash: {manifest_hash(manifest)[:16]}")
+    if previous:
+        print(f"   Since {args.diff}: {len(changed)} added/changed, {len(removed)} removed")
+
+    if args.save:
+        save_manifest(manifest, args.save)
+        print(f"✅ Manifest saved to: {args.save}")
+
+if __name__ == '__main__':
+    main()
@@ -163,6 +163,8 @@ def create_organic_hazardous_ewaste():
     print("   3. Include different angles")
     print("   4. Mix indoor and outdoor shots")
     print("   5. Search Kaggle for additional datasets")
+    print("\n🎯 Label the most useful images first:")
+    print("   python active_learning.py unlabeled/ --budget 500")
 
 def show_dataset_stats():
     """Show current dataset statistics."""
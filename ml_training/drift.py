@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Input Drift Monitoring
+======================
+Detects when production photos stop looking like the training images
+(new lighting, backgrounds or packaging) without storing any of them.
+
+Each batch the model scores is folded into a fixed-size sketch:
+
+    colour       per-channel RGB histograms of a strided pixel sample
+    brightness   histogram of per-image mean luma
+    contrast     histogram of per-image luma standard deviation
+    classes      predicted-class counts
+    confidence   histogram of top-1 confidence
+    embedding    running mean and covariance of the penultimate-layer
+                 embedding (needs the convert_to_tflite.py --embedding export)
+
+Sketch updates are vectorized over the whole batch and sketches merge
+exactly, so memory stays constant however much traffic is seen.
+train_model.py writes the reference sketch of the validation split to
+models/drift_reference.npz. Live sketches are compared against it:
+histograms by Jensen-Shannon distance (0 = identical, 1 = disjoint), the
+embedding by the Fréchet distance between the two Gaussians relative to
+the reference's total variance.
+
+Usage:
+    python drift.py reference dataset/ [--model models/waste_classifier_embedding.tflite] [--split all]
+    python drift.py check field_photos/ [--reference models/drift_reference.npz]
+    python drift.py benchmark [--dataset dataset] [--batch-sizes 1 8 32]
+    python serve.py --model models/waste_classifier_embedding.tflite --drift-reference models/drift_reference.npz
+"""
+
+import time
+import argparse
+import threading
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_MODEL_PATH,
+    DEFAULT_LABELS_PATH,
+    TFLiteClassifier,
+    list_images,
+    load_labels,
+    preprocess_image
+)
+
+DEFAULT_REFERENCE_PATH = 'models/drift_reference.npz'
+DEFAULT_EMBEDDING_MODEL = 'models/waste_classifier_embedding.tflite'
+PIXEL_BINS = 32
+STAT_BINS = 20
+PIXEL_STRIDE = 4
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# Luma standard deviation of a [0, 1] image is at most 0.5
+CONTRAST_RANGE = 0.5
+DEFAULT_WINDOW = 1000
+MIN_IMAGES = 100
+
+# Score above which a statistic counts as drifted. These are starting
+# points: sampling noise grows as windows shrink, so tune them against
+# windows of known-good traffic.
+DEFAULT_THRESHOLDS = {
+    'colour': 0.10,
+    'brightness': 0.20,
+    'contrast': 0.20,
+    'classes': 0.15,
+    'confidence': 0.20,
+    'embedding': 0.25
+}
+
+def binned(values, bins, upper=1.0):
+    """Bin indices of values in [0, upper]; out-of-range values go to the edge bins."""
+    return np.clip((values * (bins / upper)).astype(np.int64), 0, bins - 1)
+
+class DriftSketch:
+    """Fixed-size summary of a stream of preprocessed images and their predictions."""
+
+    def __init__(self, num_classes, embedding_dim=None):
+        self.count = 0
+        self.colour = np.zeros((3, PIXEL_BINS))
+        self.brightness = np.zeros(STAT_BINS)
+        self.contrast = np.zeros(STAT_BINS)
+        self.classes = np.zeros(num_classes)
+        self.confidence = np.zeros(STAT_BINS)
+        self.embedding_count = 0
+        self.embedding_mean = np.zeros(embedding_dim or 0)
+        # Sum of squared deviations from the mean (Chan et al. parallel update)
+        self.embedding_m2 = np.zeros((embedding_dim or 0, embedding_dim or 0))
+
+    def update(self, batch, scores, embeddings=None):
+        """Fold a (N, H, W, 3) batch in [0, 1] and its (N, classes) scores into the sketch."""
+        pixels = np.asarray(batch)[:, ::PIXEL_STRIDE, ::PIXEL_STRIDE]
+        n = len(pixels)
+        channels = binned(pixels, PIXEL_BINS) + np.arange(3) * PIXEL_BINS
+        self.colour += np.bincount(channels.ravel(), minlength=3 * PIXEL_BINS).reshape(3, PIXEL_BINS)
+
+        luma = (pixels @ LUMA_WEIGHTS).reshape(n, -1)
+        self.brightness += np.bincount(binned(luma.mean(axis=1), STAT_BINS), minlength=STAT_BINS)
+        self.contrast += np.bincount(binned(luma.std(axis=1), STAT_BINS, CONTRAST_RANGE), minlength=STAT_BINS)
+
+        scores = np.asarray(scores)
+        self.classes += np.bincount(np.argmax(scores, axis=1), minlength=len(self.classes))
+        self.confidence += np.bincount(binned(np.max(scores, axis=1), STAT_BINS), minlength=STAT_BINS)
+        self.count += n
+
+        if embeddings is not None and self.embedding_mean.size:
+            embeddings = np.asarray(embeddings, dtype=np.float64)
+            mean = embeddings.mean(axis=0)
+            centred = embeddings - mean
+            self._merge_moments(n, mean, centred.T @ centred)
+
+    def _merge_moments(self, n, mean, m2):
+        total = self.embedding_count + n
+        delta = mean - self.embedding_mean
+        self.embedding_m2 += m2 + np.outer(delta, delta) * self.embedding_count * n / total
+        self.embedding_mean += delta * n / total
+        self.embedding_count = total
+
+    def merge(self, other):
+        """Add another sketch's counts to this one (the result is exactly the combined stream's)."""
+        self.count += other.count
+        for name in ('colour', 'brightness', 'contrast', 'classes', 'confidence'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        if other.embedding_count and self.embedding_mean.size:
+            self._merge_moments(other.embedding_count, other.embedding_mean, other.embedding_m2)
+        return self
+
+    def embedding_covariance(self):
+        return self.embedding_m2 / max(self.embedding_count - 1, 1)
+
+    def save(self, path=DEFAULT_REFERENCE_PATH, **info):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            count=self.count,
+            colour=self.colour,
+            brightness=self.brightness,
+            contrast=self.contrast,
+            classes=self.classes,
+            confidence=self.confidence,
+            embedding_count=self.embedding_count,
+            embedding_mean=self.embedding_mean,
+            embedding_m2=self.embedding_m2,
+            created=datetime.now().isoformat(timespec='seconds'),
+            **info
+        )
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_REFERENCE_PATH):
+        with np.load(path) as data:
+            sketch = cls(len(data['classes']), len(data['embedding_mean']) or None)
+            sketch.count = int(data['count'])
+            sketch.embedding_count = int(data['embedding_count'])
+            for name in ('colour', 'brightness', 'contrast', 'classes', 'confidence',
+                         'embedding_mean', 'embedding_m2'):
+                setattr(sketch, name, data[name].astype(np.float64))
+        return sketch
+
+    def empty_like(self):
+        return DriftSketch(len(self.classes), self.embedding_mean.size or None)
+
+def js_distance(p, q):
+    """Jensen-Shannon distance (base 2, in [0, 1]) between two count histograms."""
+    p = np.asarray(p, dtype=np.float64) + 1e-9
+    q = np.asarray(q, dtype=np.float64) + 1e-9
+    p, q = p / p.sum(), q / q.sum()
+    m = (p + q) / 2
+    divergence = (np.sum(p * np.log2(p / m)) + np.sum(q * np.log2(q / m))) / 2
+    return float(np.sqrt(max(divergence, 0.0)))
+
+def psd_sqrt(matrix):
+    values, vectors = np.linalg.eigh(matrix)
+    return (vectors * np.sqrt(np.clip(values, 0, None))) @ vectors.T
+
+def frechet_distance(mean1, cov1, mean2, cov2):
+    """Squared Fréchet (2-Wasserstein) distance between two Gaussians."""
+    root1 = psd_sqrt(cov1)
+    cross = np.linalg.eigvalsh(root1 @ cov2 @ root1)
+    return float(np.sum((mean1 - mean2) ** 2) + np.trace(cov1) + np.trace(cov2)
+                 - 2 * np.sum(np.sqrt(np.clip(cross, 0, None))))
+
+def drift_scores(reference, current, thresholds=None):
+    """Compare a live sketch with the reference.
+
+    Returns {statistic: {'score', 'threshold', 'drifted'}}. The embedding
+    score is only present when both sketches have embeddings, and nothing
+    is flagged before the live sketch holds MIN_IMAGES images.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    scores = {
+        'colour': np.mean([js_distance(r, c) for r, c in zip(reference.colour, current.colour)]),
+        'brightness': js_distance(reference.brightness, current.brightness),
+        'contrast': js_distance(reference.contrast, current.contrast),
+        'classes': js_distance(reference.classes, current.classes),
+        'confidence': js_distance(reference.confidence, current.confidence)
+    }
+    if reference.embedding_count > 1 and current.embedding_count > 1:
+        reference_cov = reference.embedding_covariance()
+        distance = frechet_distance(reference.embedding_mean, reference_cov,
+                                    current.embedding_mean, current.embedding_covariance())
+        scores['embedding'] = max(distance, 0.0) / max(float(np.trace(reference_cov)), 1e-12)
+
+    enough = current.count >= MIN_IMAGES
+    return {
+        name: {
+            'score': round(float(score), 4),
+            'threshold': thresholds[name],
+            'drifted': bool(enough and score > thresholds[name])
+        }
+        for name, score in scores.items()
+    }
+
+def has_embeddings(classifier):
+    return getattr(classifier, 'embedding_details', None) is not None
+
+class DriftMonitor:
+    """Sketches live traffic in fixed-size windows and scores it against a reference.
+
+    predict_batch() runs a classifier and folds the batch into the current
+    window; once the window holds `window` images it becomes the scored
+    window and a new one starts. Thread-safe: several interpreters can
+    share one monitor. Time spent sketching is tracked against time spent
+    in the model so the overhead is visible in stats().
+    """
+
+    def __init__(self, reference, window=DEFAULT_WINDOW, thresholds=None):
+        self.reference = DriftSketch.load(reference) if isinstance(reference, (str, Path)) else reference
+        self.window = window
+        self.thresholds = thresholds
+        self.current = self.reference.empty_like()
+        self.completed = None
+        self.images = 0
+        self.windows = 0
+        self.invoke_s = 0.0
+        self.sketch_s = 0.0
+        self._lock = threading.Lock()
+
+    def predict_batch(self, classifier, batch, track=None):
+        """Return the classifier's scores for `batch`, sketching the rows where `track` is True."""
+        start = time.perf_counter()
+        if has_embeddings(classifier):
+            scores, embeddings = classifier.predict_batch_with_embeddings(batch)
+        else:
+            scores, embeddings = classifier.predict_batch(batch), None
+        invoked = time.perf_counter()
+
+        if track is not None and not np.all(track):
+            track = np.asarray(track, dtype=bool)
+            batch, scores_tracked = np.asarray(batch)[track], scores[track]
+            embeddings = embeddings[track] if embeddings is not None else None
+        else:
+            scores_tracked = scores
+        if len(scores_tracked):
+            with self._lock:
+                self.current.update(batch, scores_tracked, embeddings)
+                if self.current.count >= self.window:
+                    self.completed, self.current = self.current, self.current.empty_like()
+                    self.windows += 1
+                self.images += len(scores_tracked)
+                self.invoke_s += invoked - start
+                self.sketch_s += time.perf_counter() - invoked
+        return scores
+
+    def report(self):
+        """Drift scores of the last full window (or the partial one before the first fills)."""
+        with self._lock:
+            sketch = self.completed or self.current
+            scores = drift_scores(self.reference, sketch, self.thresholds)
+            return {
+                'window_images': sketch.count,
+                'window': self.window,
+                'windows_completed': self.windows,
+                'drifted': [name for name, result in scores.items() if result['drifted']],
+                'scores': scores,
+                'overhead': self.overhead()
+            }
+
+    def overhead(self):
+        images = max(self.images, 1)
+        return {
+            'images': self.images,
+            'invoke_ms_per_image': round(self.invoke_s * 1000 / images, 4),
+            'sketch_ms_per_image': round(self.sketch_s * 1000 / images, 4),
+            'overhead_ratio': round(self.sketch_s / self.invoke_s, 4) if self.invoke_s else 0.0
+        }
+
+def profile_keras_model(model, generator):
+    """Predict every batch of a Keras data generator and sketch it.
+
+    Returns (scores, sketch). The embedding comes from the same forward
+    pass (convert_to_tflite.build_embedding_model), so building the
+    reference costs no extra inference.
+    """
+    from convert_to_tflite import build_embedding_model
+
+    embedding_model = build_embedding_model(model)
+    sketch = DriftSketch(int(model.outputs[0].shape[-1]), int(embedding_model.outputs[0].shape[-1]))
+    generator.reset()
+    all_scores = []
+    for index in range(len(generator)):
+        images, _ = generator[index]
+        embeddings, scores = embedding_model.predict_on_batch(images)
+        scores = np.asarray(scores)
+        sketch.update(images, scores, np.asarray(embeddings))
+        all_scores.append(scores)
+    return np.concatenate(all_scores), sketch
+
+def sketch_images(paths, classifier, num_classes, batch_size=32, workers=4):
+    """Classify image files with a TFLite model and return their sketch and a monitor with timings."""
+    embedding_dim = int(classifier.embedding_details['shape'][-1]) if has_embeddings(classifier) else None
+    monitor = DriftMonitor(DriftSketch(num_classes, embedding_dim), window=len(paths) + 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start:start + batch_size]
+            batch = np.stack(list(executor.map(lambda p: preprocess_image(p, classifier.input_size), chunk)))
+            monitor.predict_batch(classifier, batch)
+    return monitor.current, monitor
+
+def load_classifier(model_path=None):
+    """The embedding export when available (enables embedding drift), else the plain model."""
+    if model_path is None:
+        model_path = DEFAULT_EMBEDDING_MODEL if Path(DEFAULT_EMBEDDING_MODEL).exists() else DEFAULT_MODEL_PATH
+    classifier = TFLiteClassifier(model_path)
+    if not has_embeddings(classifier):
+        print(f"   ({model_path} has no embedding output; embedding drift is disabled. "
+              "Export one with convert_to_tflite.py --embedding)")
+    return classifier
+
+def print_report(report):
+    print(f"\n📡 Drift scores ({report['window_images']} images):")
+    for name, result in report['scores'].items():
+        flag = '⚠️  drifted' if result['drifted'] else 'ok'
+        print(f"   {name:11} {result['score']:>7.4f}  (threshold {result['threshold']:.2f})  {flag}")
+    if report['window_images'] < MIN_IMAGES:
+        print(f"   Fewer than {MIN_IMAGES} images; no statistic is flagged yet")
+    overhead = report['overhead']
+    print(f"   Sketching: {overhead['sketch_ms_per_image']:.3f} ms/image vs "
+          f"{overhead['invoke_ms_per_image']:.2f} ms/image inference ({overhead['overhead_ratio']:.1%})")
+
+def cmd_reference(args):
+    from dataset_manifest import build_manifest, load_manifest, split_manifest
+
+    labels = load_labels(args.labels)
+    manifest = build_manifest(args.dataset, labels, previous=load_manifest())
+    train_files, val_files = split_manifest(manifest)
+    files = {'train': train_files, 'validation': val_files, 'all': train_files + val_files}[args.split]
+    classifier = load_classifier(args.model)
+
+    print(f"\n📐 Building drift reference from {len(files)} {args.split} images...")
+    sketch, _ = sketch_images([Path(args.dataset) / f for f in files], classifier, len(labels))
+    path = sketch.save(args.output, source=classifier.model_path, split=args.split)
+    print(f"✅ Reference saved to: {path}")
+
+def cmd_check(args):
+    paths = list_images(args.paths)
+    if not paths:
+        print("❌ No images found.")
+        return
+    reference = DriftSketch.load(args.reference)
+    classifier = load_classifier(args.model)
+
+    print(f"\n🔍 Sketching {len(paths)} images...")
+    _, monitor = sketch_images(paths, classifier, len(reference.classes), args.batch_size)
+    monitor.reference = reference
+    report = monitor.report()
+    print_report(report)
+    if report['drifted']:
+        print(f"\n⚠️  Drift detected in: {', '.join(report['drifted'])}")
+
+def cmd_benchmark(args):
+    from cascade import load_validation_images
+
+    labels = load_labels(args.labels)
+    classifier = load_classifier(args.model)
+    images, _ = load_validation_images(args.dataset, labels, classifier.input_size)
+    embedding_dim = int(classifier.embedding_details['shape'][-1]) if has_embeddings(classifier) else None
+
+    print(f"\n⏱️  Sketch overhead on {len(images)} validation images:")
+    print(f"   {'Batch':>5} {'Invoke ms/img':>14} {'Sketch ms/img':>14} {'Overhead':>9}")
+    for batch_size in args.batch_sizes:
+        # Repeat small splits so every batch size is timed on enough images
+        pool = np.concatenate([images] * (1 + args.min_images // len(images)))
+        batches = [pool[i:i + batch_size] for i in range(0, len(pool), batch_size)]
+        monitor = DriftMonitor(DriftSketch(len(labels), embedding_dim), window=10 ** 9)
+        monitor.predict_batch(classifier, batches[0])
+        monitor.invoke_s = monitor.sketch_s = 0.0
+        monitor.images = 0
+        for batch in batches:
+            monitor.predict_batch(classifier, batch)
+        overhead = monitor.overhead()
+        print(f"   {batch_size:>5} {overhead['invoke_ms_per_image']:>14.3f} "
+              f"{overhead['sketch_ms_per_image']:>14.3f} {overhead['overhead_ratio']:>9.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitor input drift against the training reference')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--model', type=str, default=None,
+                       help='TFLite model (default: the embedding export if present)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reference = subparsers.add_parser('reference', help='Sketch a dataset split as the reference profile')
+    reference.add_argument('dataset', nargs='?', default='dataset', help='Dataset directory')
+    reference.add_argument('--split', type=str, default='validation', choices=['train', 'validation', 'all'],
+                          help='Manifest split to sketch (validation matches train_model.py)')
+    reference.add_argument('--output', type=str, default=DEFAULT_REFERENCE_PATH, help='Reference path')
+    reference.set_defaults(func=cmd_reference)
+
+    check = subparsers.add_parser('check', help='Score a folder of images against the reference')
+    check.add_argument('paths', nargs='+', help='Image files or directories')
+    check.add_argument('--reference', type=str, default=DEFAULT_REFERENCE_PATH, help='Reference profile')
+    check.add_argument('--batch-size', type=int, default=32, help='Images per invoke')
+    check.set_defaults(func=cmd_check)
+
+    benchmark = subparsers.add_parser('benchmark', help='Measure per-image sketch cost against inference')
+    benchmark.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    benchmark.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32], help='Batch sizes')
+    benchmark.add_argument('--min-images', type=int, default=256, help='Images timed per batch size')
+    benchmark.set_defaults(func=cmd_benchmark)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Embedding Export and Similarity Search
+======================================
+Every forward pass already computes the 128-d output of the penultimate
+Dense layer. This script exports those embeddings for a whole dataset as
+a float16 memory-mapped array and builds nearest-neighbour indexes on
+top of them for duplicate detection, similar-item lookup and label-error
+hunting.
+
+Usage:
+    python embeddings.py extract dataset/ [--backend tflite|keras] [--output models/embeddings]
+    python embeddings.py build-index [--nlist 256] [--m 16]
+    python embeddings.py duplicates [--threshold 0.98]
+    python embeddings.py similar photo.jpg [-k 10]
+    python embeddings.py label-errors [-k 10] [--min-agreement 0.7]
+
+The TFLite backend needs the embedding export from
+`python convert_to_tflite.py --embedding`.
+"""
+
+import csv
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_LABELS_PATH,
+    IMG_SIZE,
+    TFLiteClassifier,
+    list_images,
+    load_labels,
+    preprocess_image
+)
+from ann_index import BruteForceIndex, IVFPQIndex
+
+DEFAULT_EMBEDDING_MODEL = 'models/waste_classifier_embedding.tflite'
+DEFAULT_KERAS_MODEL = 'models/waste_classifier_best.keras'
+DEFAULT_OUTPUT_DIR = 'models/embeddings'
+EMBEDDINGS_FILE = 'embeddings.npy'
+META_FILE = 'embeddings_meta.npz'
+INDEX_FILE = 'ivfpq_index.npz'
+
+class KerasEmbedder:
+    """Embedding extractor backed by the Keras model."""
+
+    def __init__(self, model_path=DEFAULT_KERAS_MODEL):
+        import tensorflow as tf
+        from convert_to_tflite import build_embedding_model
+
+        self.model = build_embedding_model(tf.keras.models.load_model(model_path))
+        self.input_size = int(self.model.inputs[0].shape[1])
+
+    def predict_batch_with_embeddings(self, batch):
+        embeddings, scores = self.model.predict_on_batch(np.asarray(batch, dtype=np.float32))
+        return np.asarray(scores), np.asarray(embeddings)
+
+def load_embedder(backend, model_path=None):
+    if backend == 'keras':
+        return KerasEmbedder(model_path or DEFAULT_KERAS_MODEL)
+    return TFLiteClassifier(model_path or DEFAULT_EMBEDDING_MODEL)
+
+def extract_embeddings(paths, embedder, output_dir, labels, batch_size=64, workers=4):
+    """Write float16 embeddings for all paths to a memory-mapped .npy file."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    input_size = getattr(embedder, 'input_size', IMG_SIZE)
+
+    embeddings = None
+    predictions = np.zeros(len(paths), dtype=np.int16)
+    confidences = np.zeros(len(paths), dtype=np.float16)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start:start + batch_size]
+            batch = np.stack(list(executor.map(lambda p: preprocess_image(p, input_size), chunk)))
+            scores, batch_embeddings = embedder.predict_batch_with_embeddings(batch)
+
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    output_dir / EMBEDDINGS_FILE,
+                    mode='w+',
+                    dtype=np.float16,
+                    shape=(len(paths), batch_embeddings.shape[1])
+                )
+            embeddings[start:start + len(chunk)] = batch_embeddings
+            predictions[start:start + len(chunk)] = np.argmax(scores, axis=1)
+            confidences[start:start + len(chunk)] = np.max(scores, axis=1)
+            print(f"\r   {start + len(chunk)}/{len(paths)} images", end='', flush=True)
+    print()
+
+    embeddings.flush()
+    label_ids = np.array([labels.index(p.parent.name) if p.parent.name in labels else -1 for p in paths],
+                         dtype=np.int16)
+    np.savez(
+        output_dir / META_FILE,
+        paths=np.array([str(p) for p in paths]),
+        labels=label_ids,
+        predictions=predictions,
+        confidences=confidences,
+        classes=np.array(labels)
+    )
+    return output_dir / EMBEDDINGS_FILE
+
+def load_embeddings(output_dir=DEFAULT_OUTPUT_DIR):
+    """Return (memory-mapped embeddings, metadata dict)."""
+    output_dir = Path(output_dir)
+    embeddings = np.load(output_dir / EMBEDDINGS_FILE, mmap_mode='r')
+    with np.load(output_dir / META_FILE) as data:
+        meta = {key: data[key] for key in data.files}
+    return embeddings, meta
+
+def load_index(output_dir, embeddings, exact=False):
+    index_path = Path(output_dir) / INDEX_FILE
+    if exact or not index_path.exists():
+        if not exact:
+            print("   (no IVF-PQ index found, using exact search; run build-index)")
+        return BruteForceIndex(embeddings)
+    return IVFPQIndex.load(index_path)
+
+def search(index, embeddings, queries, k, nprobe):
+    if isinstance(index, IVFPQIndex):
+        return index.search(queries, k, nprobe=nprobe, refine_vectors=embeddings)
+    return index.search(queries, k)
+
+def search_all(index, embeddings, k, nprobe, batch_size=1024):
+    """k-NN of every stored vector (including itself), batched."""
+    all_scores, all_ids = [], []
+    for start in range(0, len(embeddings), batch_size):
+        queries = np.asarray(embeddings[start:start + batch_size], dtype=np.float32)
+        scores, ids = search(index, embeddings, queries, k, nprobe)
+        all_scores.append(scores)
+        all_ids.append(ids)
+    return np.concatenate(all_scores), np.concatenate(all_ids)
+
+def cmd_extract(args):
+    paths = list_images(args.paths)
+    if not paths:
+        print("❌ No images found.")
+        return
+    labels = load_labels(args.labels)
+    embedder = load_embedder(args.backend, args.model)
+
+    print(f"\n🧬 Extracting embeddings for {len(paths)} images ({args.backend})...")
+    start = time.perf_counter()
+    path = extract_embeddings(paths, embedder, args.output, labels, batch_size=args.batch_size)
+    print(f"✅ Embeddings saved to: {path} ({time.perf_counter() - start:.1f}s)")
+
+def cmd_build_index(args):
+    embeddings, _ = load_embeddings(args.output)
+    print(f"\n🏗️  Building IVF-PQ index over {len(embeddings)} embeddings...")
+    start = time.perf_counter()
+    index = IVFPQIndex(nlist=args.nlist, m=args.m)
+    index.train(embeddings)
+    index.add(embeddings)
+    index.save(Path(args.output) / INDEX_FILE)
+    print(f"✅ Index saved to: {Path(args.output) / INDEX_FILE} ({time.perf_counter() - start:.1f}s)")
+
+def cmd_duplicates(args):
+    embeddings, meta = load_embeddings(args.output)
+    index = load_index(args.output, embeddings, args.exact)
+    scores, ids = search_all(index, embeddings, args.k, args.nprobe)
+
+    pairs = {}
+    for i in range(len(ids)):
+        for score, j in zip(scores[i], ids[i]):
+            if j >= 0 and j != i and score >= args.threshold:
+                pairs[(min(i, j), max(i, j))] = float(score)
+
+    pairs = sorted(((i, j, score) for (i, j), score in pairs.items()), key=lambda p: -p[2])
+    report_path = Path(args.output) / 'duplicates.csv'
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path_a', 'path_b', 'similarity'])
+        for i, j, score in pairs:
+            writer.writerow([meta['paths'][i], meta['paths'][j], f"{score:.4f}"])
+
+    print(f"\n🔁 Found {len(pairs)} near-duplicate pairs (similarity ≥ {args.threshold})")
+    for i, j, score in pairs[:10]:
+        print(f"   {score:.3f}  {meta['paths'][i]}  ↔  {meta['paths'][j]}")
+    print(f"✅ Report saved to: {report_path}")
+
+def cmd_similar(args):
+    embeddings, meta = load_embeddings(args.output)
+    embedder = load_embedder(args.backend, args.model)
+    input_size = getattr(embedder, 'input_size', IMG_SIZE)
+    batch = np.stack([preprocess_image(p, input_size) for p in args.images])
+    _, queries = embedder.predict_batch_with_embeddings(batch)
+
+    index = load_index(args.output, embeddings, args.exact)
+    scores, ids = search(index, embeddings, queries, args.k, args.nprobe)
+
+    classes = list(meta['classes'])
+    for image, row_scores, row_ids in zip(args.images, scores, ids):
+        print(f"\n🔍 Most similar to {image}:")
+        for score, j in zip(row_scores, row_ids):
+            if j < 0:
+                continue
+            label = classes[meta['labels'][j]] if meta['labels'][j] >= 0 else '?'
+            print(f"   {score:.3f}  {label:12} {meta['paths'][j]}")
+
+def cmd_label_errors(args):
+    embeddings, meta = load_embeddings(args.output)
+    index = load_index(args.output, embeddings, args.exact)
+    _, ids = search_all(index, embeddings, args.k + 1, args.nprobe)
+
+    labels = meta['labels']
+    classes = list(meta['classes'])
+    suspects = []
+    for i, neighbours in enumerate(ids):
+        neighbours = [j for j in neighbours if j >= 0 and j != i][:args.k]
+        if labels[i] < 0 or not neighbours:
+            continue
+        majority, votes = Counter(labels[neighbours].tolist()).most_common(1)[0]
+        agreement = votes / len(neighbours)
+        if majority != labels[i] and agreement >= args.min_agreement:
+            suspects.append((i, majority, agreement))
+
+    suspects.sort(key=lambda s: -s[2])
+    report_path = Path(args.output) / 'label_errors.csv'
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'label', 'neighbour_label', 'agreement', 'model_prediction'])
+        for i, majority, agreement in suspects:
+            writer.writerow([
+                meta['paths'][i], classes[labels[i]], classes[majority],
+                f"{agreement:.2f}", classes[meta['predictions'][i]]
+            ])
+
+    print(f"\n🏷️  {len(suspects)} images whose neighbours disagree with their label "
+          f"(≥ {args.min_agreement:.0%} of {args.k} neighbours)")
+    for i, majority, agreement in suspects[:10]:
+        print(f"   {meta['paths'][i]}: {classes[labels[i]]} → {classes[majority]} ({agreement:.0%})")
+    print(f"✅ Report saved to: {report_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Export embeddings and search for similar images')
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT_DIR,
+                       help='Directory for embeddings and index files')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_model_args(p):
+        p.add_argument('--backend', type=str, default='tflite', choices=['tflite', 'keras'],
+                      help='Model used to compute embeddings')
+        p.add_argument('--model', type=str, default=None,
+                      help='Model path (default depends on backend)')
+
+    def add_search_args(p, k=10):
+        p.add_argument('-k', type=int, default=k, help='Neighbours per image')
+        p.add_argument('--nprobe', type=int, default=8, help='Inverted lists to probe')
+        p.add_argument('--exact', action='store_true', help='Use exact brute-force search')
+
+    p = subparsers.add_parser('extract', help='Export embeddings for a dataset')
+    p.add_argument('paths', nargs='+', help='Image files or directories')
+    p.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    p.add_argument('--batch-size', type=int, default=64, help='Images per batch')
+    add_model_args(p)
+    p.set_defaults(func=cmd_extract)
+
+    p = subparsers.add_parser('build-index', help='Build an IVF-PQ index over the embeddings')
+    p.add_argument('--nlist', type=int, default=256, help='Number of inverted lists')
+    p.add_argument('--m', type=int, default=16, help='PQ sub-vectors (must divide 128)')
+    p.set_defaults(func=cmd_build_index)
+
+    p = subparsers.add_parser('duplicates', help='Find near-duplicate images')
+    p.add_argument('--threshold', type=float, default=0.98, help='Minimum cosine similarity')
+    add_search_args(p, k=5)
+    p.set_defaults(func=cmd_duplicates)
+
+    p = subparsers.add_parser('similar', help='Find images similar to a query image')
+    p.add_argument('images', nargs='+', help='Query images')
+    add_model_args(p)
+    add_search_args(p)
+    p.set_defaults(func=cmd_similar)
+
+    p = subparsers.add_parser('label-errors', help='Find images whose neighbours disagree with their label')
+    p.add_argument('--min-agreement', type=float, default=0.7,
+                  help='Fraction of neighbours that must agree on another label')
+    add_search_args(p)
+    p.set_defaults(func=cmd_label_errors)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
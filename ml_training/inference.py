@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Waste Classifier Inference Helpers
+==================================
+Shared TFLite inference code used by the serving and batch tools:
+label loading, image preprocessing (RGB, EXIF transpose, 224x224
+nearest-neighbour resize, scaled to [0, 1]), and a batched interpreter
+wrapper.
+
+Preprocessing differs from the Keras generator that training and
+validation use (keras load_img: RGB, nearest-neighbour resize, x/255) in
+two ways, so the two can score the same file differently:
+- EXIF orientation is applied here; load_img ignores it. Photos with a
+  rotation tag match only when training used the upright copies that
+  prepare_dataset.py writes.
+- Large JPEGs are decoded at a reduced scale with Image.draft() (never
+  below 224 pixels) before the resize; load_img and the app decode at
+  full resolution.
+`python bench_inference.py --preprocessing dataset/` compares the two on
+the validation split and lists the images that differ.
+
+Only NumPy and Pillow are imported here. The interpreter comes from
+ai-edge-litert or tflite-runtime when installed (see
+requirements-inference.txt), so serving workers do not pay for importing
+full TensorFlow; TensorFlow's bundled interpreter is the fallback.
+
+Usage:
+    python inference.py image.jpg [image2.jpg ...] [--model models/waste_classifier.tflite]
+    python inference.py image.jpg --backend litert
+"""
+
+import io
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+from PIL import Image, ImageOps
+
+DEFAULT_MODEL_PATH = 'models/waste_classifier.tflite'
+DEFAULT_LABELS_PATH = 'models/waste_labels.txt'
+IMG_SIZE = 224
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Bump whenever preprocess_image() changes so cached predictions are invalidated
+PREPROCESSING_VERSION = 2
+
+def load_labels(labels_path=DEFAULT_LABELS_PATH):
+    """Load class labels, one per line."""
+    with open(labels_path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+def list_images(paths):
+    """Expand files and directories into a sorted list of image paths."""
+    images = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            images.extend(p for p in path.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+        else:
+            images.append(path)
+    return sorted(images)
+
+def _import_interpreter(backend):
+    if backend == 'litert':
+        from ai_edge_litert.interpreter import Interpreter
+    elif backend == 'tflite_runtime':
+        from tflite_runtime.interpreter import Interpreter
+    else:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+# Interpreter packages, lightest first
+INTERPRETER_BACKENDS = ('litert', 'tflite_runtime', 'tensorflow')
+
+def get_interpreter_class(backend=None, with_name=False):
+    """Return the TFLite Interpreter class.
+
+    Tries the standalone ai-edge-litert and tflite-runtime packages before
+    the interpreter bundled with full TensorFlow, or only `backend` if
+    given. With with_name=True, returns (Interpreter, backend name).
+    """
+    for name in ([backend] if backend else INTERPRETER_BACKENDS):
+        try:
+            Interpreter = _import_interpreter(name)
+        except ImportError:
+            continue
+        return (Interpreter, name) if with_name else Interpreter
+    raise ImportError(
+        f"No TFLite interpreter available ({backend or ', '.join(INTERPRETER_BACKENDS)}); "
+        "install one with: pip install -r requirements-inference.txt"
+    )
+
+def metadata_path_for(model_path):
+    return str(model_path).replace('.tflite', '_metadata.json')
+
+def load_metadata(model_path=DEFAULT_MODEL_PATH):
+    """Load the metadata JSON written next to the model, or None if there is none."""
+    path = Path(metadata_path_for(model_path))
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def check_metadata(metadata, labels, input_size):
+    """Return warnings where the metadata disagrees with the labels, model or this code."""
+    warnings = []
+    if metadata.get('classes') and metadata['classes'] != labels:
+        warnings.append("labels file does not match the classes in the model metadata")
+    if metadata.get('input_size') and metadata['input_size'] != input_size:
+        warnings.append(f"metadata input size {metadata['input_size']} != model input {input_size}")
+    version = metadata.get('preprocessing', {}).get('version')
+    if version is not None and version != PREPROCESSING_VERSION:
+        warnings.append(f"model was exported for preprocessing v{version}, "
+                        f"this code implements v{PREPROCESSING_VERSION}")
+    return warnings
+
+def preprocess_image(source, size=IMG_SIZE):
+    """Decode and preprocess one image to a float32 (size, size, 3) array.
+
+    `source` may be a path, raw encoded bytes or a PIL image. Large JPEGs
+    are decoded at a reduced scale (never below `size`), and EXIF
+    orientation is applied as in prepare_dataset.py.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(source))
+    elif isinstance(source, Image.Image):
+        image = source
+    else:
+        image = Image.open(source)
+
+    if image.format == 'JPEG':
+        image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGB').resize((size, size), Image.NEAREST)
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+class TFLiteClassifier:
+    """Batched wrapper around a single TFLite interpreter.
+
+    Works with the plain classifier and with the embedding export from
+    convert_to_tflite.py --embedding, whose extra (wider) output holds the
+    penultimate-layer embedding. An interpreter is not thread-safe; create
+    one TFLiteClassifier per worker thread.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, num_threads=None, backend=None):
+        Interpreter, self.backend = get_interpreter_class(backend, with_name=True)
+        self.model_path = str(model_path)
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+
+        self.input_details = self.interpreter.get_input_details()[0]
+        # Class scores are the narrowest output; an embedding output is wider
+        outputs = sorted(self.interpreter.get_output_details(), key=lambda d: d['shape'][-1])
+        self.output_details = outputs[0]
+        self.embedding_details = outputs[-1] if len(outputs) > 1 else None
+        self.input_size = int(self.input_details['shape'][1])
+        self._batch_size = int(self.input_details['shape'][0])
+
+    def _resize_batch(self, batch_size):
+        """Resize the input tensor when the batch size changes."""
+        if batch_size == self._batch_size:
+            return
+        shape = [batch_size, self.input_size, self.input_size, 3]
+        self.interpreter.resize_tensor_input(self.input_details['index'], shape)
+        self.interpreter.allocate_tensors()
+        self._batch_size = batch_size
+
+    def _invoke(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        self._resize_batch(len(batch))
+        self.interpreter.set_tensor(self.input_details['index'], batch)
+        self.interpreter.invoke()
+
+    def predict_batch(self, batch):
+        """Run inference on a (N, H, W, 3) float32 batch and return (N, classes) scores."""
+        self._invoke(batch)
+        return self.interpreter.get_tensor(self.output_details['index']).copy()
+
+    def predict_batch_with_embeddings(self, batch):
+        """Return (scores, embeddings) for a batch; needs an embedding model."""
+        if self.embedding_details is None:
+            raise ValueError(f"{self.model_path} has no embedding output; "
+                             "export it with convert_to_tflite.py --embedding")
+        self._invoke(batch)
+        return (
+            self.interpreter.get_tensor(self.output_details['index']).copy(),
+            self.interpreter.get_tensor(self.embedding_details['index']).copy()
+        )
+
+    def predict(self, image):
+        """Classify one preprocessed image and return its class scores."""
+        return self.predict_batch(image[np.newaxis])[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify images with the TFLite model')
+    parser.add_argument('images', nargs='+', help='Image files to classify')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH,
+                       help='Path to TFLite model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH,
+                       help='Path to labels file')
+    parser.add_argument('--backend', type=str, default=None, choices=INTERPRETER_BACKENDS,
+                       help='Interpreter package (default: lightest installed)')
+
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    classifier = TFLiteClassifier(args.model, backend=args.backend)
+    metadata = load_metadata(args.model)
+    if metadata:
+        for warning in check_metadata(metadata, labels, classifier.input_size):
+            print(f"⚠️  {warning}")
+    batch = np.stack([preprocess_image(p, classifier.input_size) for p in args.images])
+    scores = classifier.predict_batch(batch)
+
+    for path, row in zip(args.images, scores):
+        best = int(np.argmax(row))
+        print(f"{Path(path).name:40} → {labels[best]:12} ({row[best] * 100:.1f}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Inference Server Load Generator
+===============================
+Closed-loop HTTP load generator for serve.py. Each of --concurrency
+clients sends images back to back over a keep-alive connection and the
+client-side latency percentiles and throughput are reported.
+
+With --sweep, a local server is started for every combination of
+--batch-sizes and --wait-ms so the effect of the batching settings on
+p99 latency can be compared on the same machine.
+
+Usage:
+    python load_test.py --url http://127.0.0.1:8080 [--concurrency 16] [--duration 10]
+    python load_test.py --sweep [--batch-sizes 1,4,8,16] [--wait-ms 0,2,5,10]
+"""
+
+import io
+import time
+import random
+import asyncio
+import argparse
+import numpy as np
+from pathlib import Path
+from urllib.parse import urlparse
+from PIL import Image
+
+def load_payloads(dataset_dir='dataset', count=64):
+    """Read encoded images from the dataset (or synthesize JPEGs if empty)."""
+    paths = [
+        p for p in Path(dataset_dir).rglob('*')
+        if p.suffix.lower() in ('.jpg', '.jpeg', '.png')
+    ]
+    if paths:
+        random.shuffle(paths)
+        return [p.read_bytes() for p in paths[:count]]
+
+    payloads = []
+    for _ in range(count):
+        pixels = np.random.randint(0, 256, (384, 512, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, 'JPEG')
+        payloads.append(buffer.getvalue())
+    return payloads
+
+async def post_image(reader, writer, host, payload):
+    """Send one POST /classify over an open connection and read the response."""
+    writer.write(
+        f"POST /classify HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"Content-Type: application/octet-stream\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        if key.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+async def client(host, port, payloads, stop_at, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_at:
+            payload = random.choice(payloads)
+            start = time.perf_counter()
+            status = await post_image(reader, writer, host, payload)
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def run_load(host, port, payloads, concurrency=16, duration=10.0):
+    """Run a closed-loop load test and return a summary dict."""
+    latencies, errors = [], []
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*[
+        client(host, port, payloads, stop_at, latencies, errors)
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed,
+    }
+    # Latency percentiles only exist when at least one request succeeded
+    for percentile in (50, 95, 99):
+        summary[f'p{percentile}'] = float(np.percentile(latencies, percentile)) if latencies else None
+    return summary
+
+def format_ms(value, width=0):
+    return f"{value:>{width}.1f}" if value is not None else f"{'n/a':>{width}}"
+
+def print_summary(summary):
+    print(f"   Requests:   {summary['requests']} ({summary['errors']} errors)")
+    print(f"   Throughput: {summary['throughput']:.1f} req/s")
+    if summary['p50'] is None:
+        print("   Latency:    n/a (no successful requests)")
+        return
+    print(f"   Latency:    p50 {summary['p50']:.1f} ms | "
+          f"p95 {summary['p95']:.1f} ms | p99 {summary['p99']:.1f} ms")
+
+async def sweep(args, payloads):
+    """Start a local server per batching setting and load test each one."""
+    from serve import start_server
+
+    results = []
+    for max_batch_size in args.batch_sizes:
+        for max_wait_ms in args.wait_ms:
+            server, batcher = await start_server(
+                model_path=args.model,
+                labels_path=args.labels,
+                port=0,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                workers=args.workers
+            )
+            port = server.sockets[0].getsockname()[1]
+
+            print(f"\n🔄 max_batch_size={max_batch_size} max_wait_ms={max_wait_ms}")
+            await run_load('127.0.0.1', port, payloads, args.concurrency, args.warmup)
+            summary = await run_load('127.0.0.1', port, payloads, args.concurrency, args.duration)
+            summary['mean_batch'] = batcher.batch_sizes.to_dict()['mean']
+            print_summary(summary)
+            results.append((max_batch_size, max_wait_ms, summary))
+
+            server.close()
+            await server.wait_closed()
+            await batcher.stop()
+
+    print("\n" + "="*72)
+    print(f"{'batch':>6} {'wait ms':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'avg batch':>10}")
+    print("-"*72)
+    for max_batch_size, max_wait_ms, s in results:
+        print(f"{max_batch_size:>6} {max_wait_ms:>8g} {s['throughput']:>9.1f} {format_ms(s['p50'], 9)} "
+              f"{format_ms(s['p95'], 9)} {format_ms(s['p99'], 9)} {s['mean_batch']:>10.2f}")
+    print("="*72)
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(',') if v]
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the inference server')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8080',
+                       help='Server URL (ignored with --sweep)')
+    parser.add_argument('--dataset', type=str, default='dataset',
+                       help='Directory of images to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per test')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Warmup seconds per sweep setting')
+    parser.add_argument('--sweep', action='store_true',
+                       help='Start local servers and sweep batching settings')
+    parser.add_argument('--batch-sizes', type=lambda v: parse_list(v, int), default=[1, 4, 8, 16],
+                       help='Comma-separated max batch sizes for --sweep')
+    parser.add_argument('--wait-ms', type=lambda v: parse_list(v, float), default=[0, 2, 5, 10],
+                       help='Comma-separated max wait times for --sweep')
+    parser.add_argument('--workers', type=int, default=2, help='Interpreters per sweep server')
+    parser.add_argument('--model', type=str, default='models/waste_classifier.tflite',
+                       help='TFLite model for --sweep')
+    parser.add_argument('--labels', type=str, default='models/waste_labels.txt',
+                       help='Labels file for --sweep')
+
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.dataset)
+    print(f"📦 Loaded {len(payloads)} request payloads")
+
+    if args.sweep:
+        asyncio.run(sweep(args, payloads))
+    else:
+        url = urlparse(args.url)
+        print(f"\n🚀 Load testing {args.url} ({args.concurrency} clients, {args.duration:g}s)")
+        summary = asyncio.run(run_load(url.hostname, url.port or 80, payloads,
+                                       args.concurrency, args.duration))
+        print_summary(summary)
+
+if __name__ == '__main__':
+    main()
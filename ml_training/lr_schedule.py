@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Learning-Rate Range Test and Schedules
+======================================
+Picks a maximum learning rate with a short range test, and provides the
+one-cycle and cosine-with-warmup schedules train_model.py can use in
+place of a fixed learning rate with ReduceLROnPlateau.
+
+The range test trains for a few hundred steps while the learning rate
+grows exponentially from min_lr to max_lr. It records the smoothed loss
+and stops once the loss diverges. The suggested maximum learning rate is
+one tenth of the rate at the lowest loss, which is safely below the point
+where training becomes unstable. The model's weights are restored
+afterwards.
+
+Schedules are applied per step by a callback, as a function of training
+progress (0 → 1 over all epochs). They also work across the differently
+sized phases of a progressive-resizing run.
+
+Usage:
+    python lr_schedule.py [--dataset dataset] [--batch-size 32] [--steps 100]
+    python train_model.py --lr-schedule onecycle [--max-lr 0.001] [--target-accuracy 0.85]
+"""
+
+import json
+import math
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from tensorflow import keras
+
+SCHEDULES = ['plateau', 'onecycle', 'cosine']
+DEFAULT_FINDER_OUTPUT = 'models/lr_finder'
+
+def one_cycle_lr(progress, max_lr, warmup=0.3, div_factor=25.0, final_div_factor=1e4):
+    """One-cycle: cosine ramp from max_lr/div_factor up to max_lr, then cosine decay."""
+    start_lr = max_lr / div_factor
+    if progress < warmup:
+        return start_lr + (max_lr - start_lr) * (1 - math.cos(math.pi * progress / warmup)) / 2
+    end_lr = start_lr / final_div_factor
+    decay = (progress - warmup) / (1 - warmup)
+    return end_lr + (max_lr - end_lr) * (1 + math.cos(math.pi * min(decay, 1.0))) / 2
+
+def warmup_cosine_lr(progress, max_lr, warmup=0.05):
+    """Linear warm-up to max_lr over the first `warmup` of training, then cosine decay to 0."""
+    if progress < warmup:
+        return max_lr * (progress + 1e-3) / warmup
+    decay = (progress - warmup) / (1 - warmup)
+    return max_lr * (1 + math.cos(math.pi * min(decay, 1.0))) / 2
+
+SCHEDULE_FUNCTIONS = {
+    'onecycle': one_cycle_lr,
+    'cosine': warmup_cosine_lr
+}
+
+class ScheduledLearningRate(keras.callbacks.Callback):
+    """Sets the optimizer's learning rate before every training step.
+
+    Progress is measured in epochs (epoch + batch / steps per epoch) over
+    `total_epochs`, so fit() calls with initial_epoch continue the same
+    schedule.
+    """
+
+    def __init__(self, schedule, max_lr, total_epochs):
+        super().__init__()
+        self.function = SCHEDULE_FUNCTIONS[schedule]
+        self.max_lr = max_lr
+        self.total_epochs = total_epochs
+        self.epoch = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+
+    def on_train_batch_begin(self, batch, logs=None):
+        steps = self.params.get('steps') or 1
+        progress = (self.epoch + batch / steps) / self.total_epochs
+        self.model.optimizer.learning_rate = self.function(progress, self.max_lr)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is not None:
+            logs['learning_rate'] = float(self.model.optimizer.learning_rate)
+
+def suggest_max_lr(lrs, losses):
+    """One tenth of the learning rate at the lowest smoothed loss."""
+    return float(lrs[int(np.argmin(losses))] / 10)
+
+def lr_range_test(model, train_gen, min_lr=1e-7, max_lr=1.0, steps=100, smoothing=0.98, diverge=4.0):
+    """Sweep the learning rate exponentially and record the smoothed training loss.
+
+    The model is compiled here with plain Adam (no gradient accumulation,
+    so every step is an update) and its weights are restored at the end;
+    recompile it before training. Returns a dict with the sweep and the
+    suggested maximum learning rate.
+    """
+    initial_weights = model.get_weights()
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=min_lr),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+
+    print(f"\n🔎 Learning-rate range test: {min_lr:g} → {max_lr:g} over {steps} steps")
+    start = time.perf_counter()
+    factor = (max_lr / min_lr) ** (1 / max(steps - 1, 1))
+    lrs, losses = [], []
+    average, best = 0.0, np.inf
+    for step in range(steps):
+        lr = min_lr * factor ** step
+        model.optimizer.learning_rate = lr
+        images, labels = train_gen[step % len(train_gen)]
+        loss = float(model.train_on_batch(images, labels)[0])
+
+        # Bias-corrected exponential moving average of the loss
+        average = smoothing * average + (1 - smoothing) * loss
+        smoothed = average / (1 - smoothing ** (step + 1))
+        if not np.isfinite(smoothed) or (step > 10 and smoothed > diverge * best):
+            break
+        best = min(best, smoothed)
+        lrs.append(lr)
+        losses.append(smoothed)
+
+    model.set_weights(initial_weights)
+    if not losses:
+        raise SystemExit("❌ Loss diverged immediately; lower --min-lr")
+
+    suggested = suggest_max_lr(np.array(lrs), np.array(losses))
+    elapsed = time.perf_counter() - start
+    print(f"   {len(lrs)} steps in {elapsed:.0f}s, lowest loss {min(losses):.4f} "
+          f"at lr {lrs[int(np.argmin(losses))]:.2e}")
+    print(f"   Suggested max learning rate: {suggested:.2e}")
+    return {
+        'lrs': lrs,
+        'losses': losses,
+        'suggested_lr': suggested,
+        'elapsed_s': elapsed
+    }
+
+def save_range_test(result, output=DEFAULT_FINDER_OUTPUT):
+    """Write the sweep as <output>.json and plot it to <output>.png."""
+    from report import get_pyplot
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output.with_suffix('.json'), 'w') as f:
+        json.dump(result, f, indent=1)
+
+    plt = get_pyplot()
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.plot(result['lrs'], result['losses'])
+    ax.axvline(result['suggested_lr'], color='red', linestyle='--',
+               label=f"suggested max lr {result['suggested_lr']:.1e}")
+    ax.set_xscale('log')
+    ax.set_title('Learning-Rate Range Test')
+    ax.set_xlabel('Learning rate')
+    ax.set_ylabel('Smoothed training loss')
+    ax.legend()
+    ax.grid(True)
+    plt.tight_layout()
+    plt.savefig(output.with_suffix('.png'), dpi=150)
+    plt.close(fig)
+    print(f"📈 Range test saved to: {output.with_suffix('.png')}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Find a maximum learning rate with a range test')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size for the sweep')
+    parser.add_argument('--steps', type=int, default=100, help='Sweep length in training steps')
+    parser.add_argument('--min-lr', type=float, default=1e-7, help='First learning rate')
+    parser.add_argument('--max-lr', type=float, default=1.0, help='Last learning rate')
+    parser.add_argument('--output', type=str, default=DEFAULT_FINDER_OUTPUT,
+                       help='Output path (without extension) for the JSON and plot')
+
+    args = parser.parse_args()
+
+    from train_model import CLASSES, NUM_CLASSES, create_data_generators, create_model
+    from dataset_manifest import build_manifest, load_manifest
+
+    manifest = build_manifest(args.dataset, CLASSES, previous=load_manifest())
+    train_gen, _ = create_data_generators(args.dataset, args.batch_size, manifest=manifest)
+    result = lr_range_test(create_model(NUM_CLASSES), train_gen, args.min_lr, args.max_lr, args.steps)
+    save_range_test(result, args.output)
+    print(f"\n✅ Train with: python train_model.py --lr-schedule onecycle --max-lr {result['suggested_lr']:.1e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Model Registry and Build Cache
+==============================
+Content-addressed store for pipeline artifacts. Every stage (training,
+each TFLite conversion variant) is keyed by the hash of its inputs: the
+dataset manifest, hyperparameters, the upstream artifact's hash and the
+converter options. If a stage has already been built with the same
+inputs, the cached artifact is restored instead of rebuilding it, and
+each record keeps the lineage needed to trace an artifact back to the
+dataset and config that produced it.
+
+Layout:
+    models/registry/<stage>/<key>/record.json
+    models/registry/<stage>/<key>/<artifact files>
+
+Usage:
+    python model_registry.py list [--stage train|convert]
+    python model_registry.py show <key-prefix>
+    python model_registry.py lineage models/waste_classifier.tflite
+"""
+
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from prediction_cache import hash_file
+
+DEFAULT_REGISTRY_DIR = 'models/registry'
+
+def hash_inputs(stage, inputs):
+    """Stable hash of a stage name and a JSON-serialisable inputs dict."""
+    payload = json.dumps({'stage': stage, 'inputs': inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ModelRegistry:
+    """Stores build records and artifacts under a registry directory."""
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def _record_path(self, stage, key):
+        return self.root / stage / key / 'record.json'
+
+    def lookup(self, stage, inputs):
+        """Return (key, record) for the inputs; record is None on a miss.
+
+        A record only counts as a hit if all its artifacts are still present
+        and unmodified: the size is checked first, then the sha256 recorded
+        when the artifact was stored.
+        """
+        key = hash_inputs(stage, inputs)
+        record_path = self._record_path(stage, key)
+        if not record_path.exists():
+            return key, None
+
+        with open(record_path) as f:
+            record = json.load(f)
+        for artifact in record['artifacts'].values():
+            stored = record_path.parent / artifact['file']
+            if not stored.exists() or stored.stat().st_size != artifact['size']:
+                return key, None
+            if hash_file(stored) != artifact['sha256']:
+                return key, None
+        return key, record
+
+    def store(self, stage, key, inputs, artifacts, extra=None):
+        """Copy artifacts ({name: path}) into the registry and write the record."""
+        entry_dir = self.root / stage / key
+        entry_dir.mkdir(parents=True, exist_ok=True)
+
+        record = {
+            'stage': stage,
+            'key': key,
+            'created': datetime.now().isoformat(),
+            'inputs': inputs,
+            'artifacts': {},
+        }
+        if extra:
+            record.update(extra)
+
+        for name, path in artifacts.items():
+            path = Path(path)
+            shutil.copy2(path, entry_dir / path.name)
+            record['artifacts'][name] = {
+                'file': path.name,
+                'sha256': hash_file(path),
+                'size': path.stat().st_size
+            }
+
+        with open(entry_dir / 'record.json', 'w') as f:
+            json.dump(record, f, indent=2)
+        return record
+
+    def restore(self, record, name, destination):
+        """Copy a stored artifact to destination unless it is already identical."""
+        artifact = record['artifacts'][name]
+        destination = Path(destination)
+        if destination.exists() and hash_file(destination) == artifact['sha256']:
+            return destination
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(self.root / record['stage'] / record['key'] / artifact['file'], destination)
+        return destination
+
+    def records(self, stage=None):
+        pattern = f'{stage}/*/record.json' if stage else '*/*/record.json'
+        records = []
+        for path in self.root.glob(pattern):
+            with open(path) as f:
+                records.append(json.load(f))
+        return sorted(records, key=lambda r: r['created'])
+
+    def find_by_artifact(self, sha256, skip=()):
+        """Return the newest record that produced an artifact with this hash."""
+        for record in reversed(self.records()):
+            if record['key'] in skip:
+                continue
+            if any(a['sha256'] == sha256 for a in record['artifacts'].values()):
+                return record
+        return None
+
+    def lineage(self, path):
+        """Walk records upstream from an artifact file, newest first."""
+        chain = []
+        record = self.find_by_artifact(hash_file(path))
+        while record is not None:
+            chain.append(record)
+            upstream = record['inputs'].get('source_sha256')
+            # A stage can pass its input through unchanged, so skip records already visited
+            seen = {r['key'] for r in chain}
+            record = self.find_by_artifact(upstream, skip=seen) if upstream else None
+        return chain
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the model registry')
+    parser.add_argument('--registry', type=str, default=DEFAULT_REGISTRY_DIR,
+                       help='Registry directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('list', help='List build records')
+    p.add_argument('--stage', type=str, default=None, help='Only show one stage')
+    p = subparsers.add_parser('show', help='Show one record')
+    p.add_argument('key', help='Key or key prefix')
+    p = subparsers.add_parser('lineage', help='Show the records that produced an artifact')
+    p.add_argument('path', help='Artifact file')
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.registry)
+
+    if args.command == 'list':
+        records = registry.records(args.stage)
+        print(f"\n📚 {len(records)} records in {args.registry}")
+        for record in records:
+            names = ', '.join(record['artifacts'])
+            print(f"   {record['created'][:19]}  {record['stage']:8} {record['key'][:12]}  {names}")
+    elif args.command == 'show':
+        matches = [r for r in registry.records() if r['key'].startswith(args.key)]
+        if not matches:
+            print(f"❌ No record matching {args.key}")
+        for record in matches:
+            print(json.dumps(record, indent=2))
+    else:
+        chain = registry.lineage(args.path)
+        if not chain:
+            print(f"❌ {args.path} is not in the registry")
+        for record in chain:
+            print(f"\n{record['stage']} {record['key'][:12]} ({record['created'][:19]})")
+            print(json.dumps(record['inputs'], indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Multi-Item Classification
+=========================
+Classifies photos of a bin that hold several items. The MobileNetV2
+backbone runs once on a larger input (e.g. 448x448 for a 2x2 grid). Each
+region is then classified from the shared feature map: the 7x7-cell
+window a 224px crop would produce is average-pooled and fed through the
+classification head. The network is not re-run for every crop.
+
+Windows form a grid (--stride-cells 7) or overlap (smaller strides).
+Neighbouring windows with the same label are merged into one item. The
+output is the number of items and the share of the photo for each class.
+
+--benchmark builds composite photos from validation images (adjacent
+tiles always differ in class). It checks per-region accuracy, item
+counts and area shares against the ground truth, and times the shared
+backbone against running the model on every crop.
+
+Usage:
+    python multi_item.py photo.jpg [--grid 2] [--stride-cells 7] [--min-confidence 0.5]
+    python multi_item.py --benchmark [--composites 50] [--grid 3] [--save-composites dataset_composites]
+"""
+
+import json
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from collections import deque
+from PIL import Image
+
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from train_model import BEST_MODEL_PATH, IMG_SIZE, resize_model
+from inference import DEFAULT_LABELS_PATH, load_labels, preprocess_image
+from cascade import load_validation_images
+
+# MobileNetV2 downsamples by 32, so a 224px crop is 7x7 feature cells
+FEATURE_STRIDE = 32
+WINDOW_CELLS = IMG_SIZE // FEATURE_STRIDE
+
+class RegionClassifier:
+    """Classifies a grid of regions of an (input_size, input_size) image in one pass.
+
+    The backbone runs at input_size with the trained weights. Each
+    WINDOW_CELLS x WINDOW_CELLS window of its feature map is average-pooled
+    (the global pooling a 224px crop would get), and the pooled vectors go
+    through the dense head together.
+    """
+
+    def __init__(self, model, input_size, stride_cells=WINDOW_CELLS):
+        resized = resize_model(model, input_size)
+        base_index = next(i for i, layer in enumerate(resized.layers) if isinstance(layer, keras.Model))
+
+        inputs = keras.Input((input_size, input_size, 3))
+        x = inputs
+        for layer in resized.layers[:base_index]:
+            # Augmentation layers are no-ops at inference; keep only the rescaling
+            if isinstance(layer, layers.Rescaling):
+                x = layer(x)
+        x = resized.layers[base_index](x)
+        x = layers.AveragePooling2D(pool_size=WINDOW_CELLS, strides=stride_cells)(x)
+        self.features = keras.Model(inputs, x, name='waste_classifier_region_features')
+        # Everything after GlobalAveragePooling2D
+        self.head = resized.layers[base_index + 2:]
+        self.input_size = input_size
+
+    @tf.function(reduce_retracing=True)
+    def _predict(self, images):
+        pooled = self.features(images, training=False)
+        shape = tf.shape(pooled)
+        x = tf.reshape(pooled, (-1, pooled.shape[-1]))
+        for layer in self.head:
+            x = layer(x, training=False)
+        return tf.reshape(x, (shape[0], shape[1], shape[2], -1))
+
+    def predict_on_batch(self, images):
+        """Region scores shaped (N, rows, cols, classes)."""
+        return self._predict(tf.convert_to_tensor(images, dtype=tf.float32)).numpy()
+
+def window_origins(input_size, stride_cells=WINDOW_CELLS):
+    """Pixel offsets of the windows along one axis, matching the pooled grid."""
+    cells = input_size // FEATURE_STRIDE
+    return [i * stride_cells * FEATURE_STRIDE for i in range((cells - WINDOW_CELLS) // stride_cells + 1)]
+
+def crop_windows(images, stride_cells=WINDOW_CELLS):
+    """Cut every IMG_SIZE window out of (N, S, S, 3) images: (N * rows * cols, IMG_SIZE, IMG_SIZE, 3)."""
+    origins = window_origins(images.shape[1], stride_cells)
+    return np.stack([
+        image[y:y + IMG_SIZE, x:x + IMG_SIZE]
+        for image in images for y in origins for x in origins
+    ])
+
+def count_items(label_grid):
+    """Connected regions (4-neighbour) of equal labels per class; -1 cells are ignored."""
+    rows, cols = label_grid.shape
+    seen = np.zeros_like(label_grid, dtype=bool)
+    counts = {}
+    for i in range(rows):
+        for j in range(cols):
+            label = label_grid[i, j]
+            if label < 0 or seen[i, j]:
+                continue
+            counts[int(label)] = counts.get(int(label), 0) + 1
+            queue = deque([(i, j)])
+            seen[i, j] = True
+            while queue:
+                y, x = queue.popleft()
+                for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                    if 0 <= ny < rows and 0 <= nx < cols and not seen[ny, nx] and label_grid[ny, nx] == label:
+                        seen[ny, nx] = True
+                        queue.append((ny, nx))
+    return counts
+
+def summarize(region_scores, labels, min_confidence=0.0):
+    """Per-class item counts and area shares from one (rows, cols, classes) score grid."""
+    label_grid = np.argmax(region_scores, axis=-1)
+    label_grid[np.max(region_scores, axis=-1) < min_confidence] = -1
+    counts = count_items(label_grid)
+    return {
+        'counts': {labels[c]: counts.get(c, 0) for c in range(len(labels))},
+        'area_share': {labels[c]: float(np.mean(label_grid == c)) for c in range(len(labels))},
+        'uncertain_share': float(np.mean(label_grid == -1)),
+        'grid': [[labels[c] if c >= 0 else None for c in row] for row in label_grid]
+    }
+
+def make_composites(images, labels, num_classes, count, grid=2, seed=0):
+    """Tile validation images into grid x grid composites; adjacent tiles differ in class.
+
+    Returns (composites (count, grid*IMG_SIZE, grid*IMG_SIZE, 3), tile label grids (count, grid, grid)).
+    """
+    rng = np.random.default_rng(seed)
+    by_class = [np.where(labels == c)[0] for c in range(num_classes)]
+    available = [c for c in range(num_classes) if len(by_class[c])]
+    if len(available) < 3:
+        raise SystemExit("❌ Composites need validation images from at least 3 classes")
+
+    composites, truths = [], []
+    for _ in range(count):
+        truth = np.zeros((grid, grid), dtype=int)
+        canvas = np.zeros((grid * IMG_SIZE, grid * IMG_SIZE, 3), dtype=np.float32)
+        for i in range(grid):
+            for j in range(grid):
+                neighbours = {truth[i - 1, j] if i else -1, truth[i, j - 1] if j else -1}
+                truth[i, j] = rng.choice([c for c in available if c not in neighbours])
+                index = rng.choice(by_class[truth[i, j]])
+                canvas[i * IMG_SIZE:(i + 1) * IMG_SIZE, j * IMG_SIZE:(j + 1) * IMG_SIZE] = images[index]
+        composites.append(canvas)
+        truths.append(truth)
+    return np.stack(composites), np.stack(truths)
+
+def window_truth(truth, input_size, stride_cells):
+    """Ground-truth tile label under the centre of every window."""
+    centres = [origin + IMG_SIZE // 2 for origin in window_origins(input_size, stride_cells)]
+    return truth[np.ix_([c // IMG_SIZE for c in centres], [c // IMG_SIZE for c in centres])]
+
+def timed(function, repeats=3):
+    """Run function once to warm up, then return (result, best-of-repeats seconds)."""
+    result = function()
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def benchmark(model, labels, dataset_dir, count=50, grid=2, stride_cells=WINDOW_CELLS,
+              batch_size=8, save_dir=None):
+    input_size = grid * IMG_SIZE
+    print(f"\n📂 Building {count} {grid}x{grid} composites from the validation split of {dataset_dir}")
+    images, image_labels = load_validation_images(dataset_dir, labels, IMG_SIZE)
+    composites, truths = make_composites(images, image_labels, len(labels), count, grid)
+    if save_dir:
+        save_composites(composites, truths, labels, save_dir)
+
+    region_model = RegionClassifier(model, input_size, stride_cells)
+    crops = crop_windows(composites, stride_cells)
+    origins = len(window_origins(input_size, stride_cells))
+    print(f"   {origins}x{origins} windows per photo, {len(crops)} crops in total")
+
+    def shared():
+        return np.concatenate([region_model.predict_on_batch(composites[i:i + batch_size])
+                               for i in range(0, len(composites), batch_size)])
+
+    def naive():
+        crop_batch = batch_size * origins * origins
+        return np.concatenate([model.predict_on_batch(crops[i:i + crop_batch])
+                               for i in range(0, len(crops), crop_batch)])
+
+    shared_scores, shared_s = timed(shared)
+    naive_scores, naive_s = timed(naive)
+    naive_scores = naive_scores.reshape(shared_scores.shape)
+
+    window_labels = np.stack([window_truth(t, input_size, stride_cells) for t in truths])
+    results = {}
+    for name, scores in (('shared', shared_scores), ('per-crop', naive_scores)):
+        predicted = np.argmax(scores, axis=-1)
+        count_errors, share_errors, exact = [], [], 0
+        for photo_scores, truth in zip(scores, truths):
+            summary = summarize(photo_scores, labels)
+            true_counts = count_items(truth)
+            errors = [abs(summary['counts'][labels[c]] - true_counts.get(c, 0)) for c in range(len(labels))]
+            count_errors.append(sum(errors))
+            exact += int(sum(errors) == 0)
+            share_errors.append(sum(abs(summary['area_share'][labels[c]] - np.mean(truth == c))
+                                    for c in range(len(labels))))
+        results[name] = {
+            'region_accuracy': float(np.mean(predicted == window_labels)),
+            'exact_counts': exact / len(truths),
+            'count_error': float(np.mean(count_errors)),
+            'area_share_l1': float(np.mean(share_errors))
+        }
+    agreement = float(np.mean(np.argmax(shared_scores, -1) == np.argmax(naive_scores, -1)))
+
+    print(f"\n🧩 Multi-item results ({count} photos, {input_size}px, stride {stride_cells} cells):")
+    print(f"   {'Method':10} {'Region acc':>10} {'Exact counts':>13} {'Count err':>10} {'Area L1':>8} {'ms/photo':>9}")
+    for name, seconds in (('shared', shared_s), ('per-crop', naive_s)):
+        r = results[name]
+        print(f"   {name:10} {r['region_accuracy']:>10.4f} {r['exact_counts']:>13.1%} "
+              f"{r['count_error']:>10.2f} {r['area_share_l1']:>8.3f} {seconds * 1000 / count:>9.1f}")
+    print(f"   Speed-up: {naive_s / shared_s:.2f}x   Region label agreement: {agreement:.1%}")
+    return results
+
+def save_composites(composites, truths, labels, output_dir):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index = {}
+    for i, (composite, truth) in enumerate(zip(composites, truths)):
+        name = f'composite_{i:04d}.jpg'
+        Image.fromarray(np.round(composite * 255).astype(np.uint8)).save(output_dir / name, quality=95)
+        index[name] = [[labels[c] for c in row] for row in truth]
+    with open(output_dir / 'labels.json', 'w') as f:
+        json.dump(index, f, indent=1)
+    print(f"   Composites saved to: {output_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Count and locate several waste items in one photo')
+    parser.add_argument('images', nargs='*', help='Photos to analyse')
+    parser.add_argument('--model', type=str, default=BEST_MODEL_PATH, help='Trained Keras model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--grid', type=int, default=2, help='Photo size in 224px tiles per side')
+    parser.add_argument('--stride-cells', type=int, default=WINDOW_CELLS,
+                       help=f'Window stride in feature cells ({WINDOW_CELLS} = grid, smaller = overlapping)')
+    parser.add_argument('--min-confidence', type=float, default=0.0,
+                       help='Regions below this confidence are left unlabelled')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Check accuracy and speed-up on synthetic composites')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--composites', type=int, default=50, help='Composite photos to build')
+    parser.add_argument('--save-composites', type=str, default=None, help='Also write the composites here')
+
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    model = keras.models.load_model(args.model)
+
+    if args.benchmark:
+        benchmark(model, labels, args.dataset, args.composites, args.grid, args.stride_cells,
+                  save_dir=args.save_composites)
+        return
+    if not args.images:
+        parser.error('give photos to analyse, or --benchmark')
+
+    input_size = args.grid * IMG_SIZE
+    region_model = RegionClassifier(model, input_size, args.stride_cells)
+    batch = np.stack([preprocess_image(path, input_size) for path in args.images])
+    for path, scores in zip(args.images, region_model.predict_on_batch(batch)):
+        summary = summarize(scores, labels, args.min_confidence)
+        items = ', '.join(f"{count} {label}" for label, count in summary['counts'].items() if count)
+        print(f"\n📷 {Path(path).name}: {items or 'no confident items'}")
+        for label, share in summary['area_share'].items():
+            if share:
+                print(f"   {label:12} {share:6.1%} of photo")
+        for row in summary['grid']:
+            print("   " + " ".join(f"{label or '-':>10}" for label in row))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Multi-Resolution Model Export
+=============================
+Exports a family of TFLite models at several input sizes (128/160/192/224
+by default) from one trained model, so low-end phones can use a smaller,
+faster model while flagship devices keep full resolution.
+
+MobileNetV2 and the classification head are resolution independent, so
+each variant starts from the trained weights and is briefly fine-tuned at
+its own input size. Every variant is converted, then evaluated and timed
+as a TFLite model on validation images preprocessed exactly as serving
+does, so large JPEGs are decoded at each size's reduced scale. Variants
+and conversions go through the model registry, so re-running with an
+unchanged model only re-measures.
+
+Backbone features are not cached between the fine-tuning runs: the top
+MobileNetV2 layers are trainable, the training images are augmented, and
+each variant sees its own input size, so no two runs share activations.
+Each variant's fine-tune pays for a full forward and backward pass over
+the training set.
+
+Writes models/variants/variants.json listing each variant's size,
+validation accuracy and measured latency.
+
+Usage:
+    python multi_resolution.py [--model models/waste_classifier_best.keras] [--sizes 128 160 192 224]
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from tensorflow import keras
+from tensorflow.keras.callbacks import EarlyStopping
+
+from train_model import (
+    BEST_MODEL_PATH,
+    CLASSES,
+    LABELS_PATH,
+    create_data_generators,
+    resize_model
+)
+from convert_to_tflite import convert_to_tflite
+from dataset_manifest import build_manifest, load_manifest, manifest_hash, split_manifest
+from inference import TFLiteClassifier, preprocess_image
+from model_registry import ModelRegistry
+from prediction_cache import hash_file
+
+DEFAULT_SIZES = [128, 160, 192, 224]
+DEFAULT_VARIANTS_DIR = 'models/variants'
+
+def fine_tune_variant(model, dataset_dir, manifest, img_size, epochs, batch_size, learning_rate):
+    """Adapt a variant to its input size; returns the model with the best weights."""
+    train_gen, val_gen = create_data_generators(
+        dataset_dir,
+        batch_size,
+        manifest=manifest,
+        img_size=img_size
+    )
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    model.fit(
+        train_gen,
+        epochs=epochs,
+        validation_data=val_gen,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True, verbose=1)],
+        verbose=1
+    )
+    return model
+
+def load_validation_arrays(dataset_dir, manifest, sizes, workers=8):
+    """Preprocess each validation image at every size, as serving would.
+
+    Each size gets its own decode so large JPEGs are drafted to that
+    size's reduced scale, exactly like preprocess_image() in serving.
+    Returns ({size: uint8 (N, size, size, 3) array}, labels).
+    """
+    _, val_files = split_manifest(manifest)
+
+    def decode(relative):
+        path = Path(dataset_dir) / relative
+        return [np.round(preprocess_image(path, size) * 255).astype(np.uint8) for size in sizes]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        decoded = list(executor.map(decode, val_files))
+
+    arrays = {size: np.stack([d[i] for d in decoded]) for i, size in enumerate(sizes)}
+    labels = np.array([CLASSES.index(manifest['files'][f]['class']) for f in val_files])
+    return arrays, labels
+
+def evaluate_tflite(model_path, images, labels, batch_size=32, num_threads=None):
+    """Validation accuracy of a TFLite model on preprocessed uint8 images."""
+    classifier = TFLiteClassifier(model_path, num_threads=num_threads)
+    correct = 0
+    for start in range(0, len(images), batch_size):
+        batch = images[start:start + batch_size].astype(np.float32) / 255.0
+        scores = classifier.predict_batch(batch)
+        correct += int(np.sum(np.argmax(scores, axis=1) == labels[start:start + batch_size]))
+    return correct / len(images)
+
+def measure_latency(model_path, image, runs=50, num_threads=None):
+    """Single-image latency percentiles in ms."""
+    classifier = TFLiteClassifier(model_path, num_threads=num_threads)
+    batch = image[np.newaxis].astype(np.float32) / 255.0
+    for _ in range(5):
+        classifier.predict_batch(batch)
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        classifier.predict_batch(batch)
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50': round(float(np.percentile(times, 50)), 3),
+        'p90': round(float(np.percentile(times, 90)), 3)
+    }
+
+def export_variants(
+    model_path=BEST_MODEL_PATH,
+    sizes=DEFAULT_SIZES,
+    dataset_dir='dataset',
+    output_dir=DEFAULT_VARIANTS_DIR,
+    epochs=3,
+    batch_size=32,
+    learning_rate=1e-5,
+    latency_runs=50,
+    num_threads=None,
+    force=False
+):
+    """Train, convert and measure one model per input size and write the manifest."""
+
+    print("\n" + "="*60)
+    print("📐 MULTI-RESOLUTION EXPORT")
+    print("="*60)
+
+    if not os.path.exists(model_path):
+        print(f"❌ Model not found: {model_path}")
+        print("Please run train_model.py first.")
+        return None
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sizes = sorted(set(sizes))
+
+    registry = ModelRegistry()
+    source_sha256 = hash_file(model_path)
+    manifest = build_manifest(dataset_dir, CLASSES, previous=load_manifest())
+    source = None
+
+    variants = []
+    for img_size in sizes:
+        print(f"\n{'─'*60}\n📐 {img_size}x{img_size}\n{'─'*60}")
+        keras_path = output_dir / f'waste_classifier_{img_size}.keras'
+        tflite_path = output_dir / f'waste_classifier_{img_size}.tflite'
+
+        inputs = {
+            'source_sha256': source_sha256,
+            'dataset_sha256': manifest_hash(manifest),
+            'img_size': img_size,
+            'hyperparameters': {
+                'epochs': epochs,
+                'batch_size': batch_size,
+                'learning_rate': learning_rate
+            }
+        }
+        key, record = registry.lookup('variant', inputs)
+        if record is not None and not force:
+            registry.restore(record, 'model', keras_path)
+            print(f"♻️  Reused cached variant {key[:12]}")
+        else:
+            if source is None:
+                source = keras.models.load_model(model_path)
+            source_size = int(source.input_shape[1])
+
+            if img_size == source_size:
+                # The source model already runs at this size
+                shutil.copy2(model_path, keras_path)
+            else:
+                model = resize_model(source, img_size)
+                if epochs > 0:
+                    print(f"🚀 Fine-tuning at {img_size}px for up to {epochs} epochs...")
+                    model = fine_tune_variant(model, dataset_dir, manifest, img_size,
+                                              epochs, batch_size, learning_rate)
+                model.save(keras_path)
+            registry.store('variant', key, inputs, {'model': keras_path})
+
+        convert_to_tflite(
+            model_path=str(keras_path),
+            output_path=str(tflite_path),
+            labels_path=LABELS_PATH,
+            force=force
+        )
+        variants.append((img_size, tflite_path))
+
+    print("\n📊 Measuring variants...")
+    images, labels = load_validation_arrays(dataset_dir, manifest, sizes)
+
+    entries = []
+    for img_size, tflite_path in variants:
+        entry = {
+            'img_size': img_size,
+            'model': tflite_path.name,
+            'metadata': tflite_path.name.replace('.tflite', '_metadata.json'),
+            'sha256': hash_file(tflite_path),
+            'size_mb': round(tflite_path.stat().st_size / (1024 * 1024), 2),
+            'val_accuracy': round(evaluate_tflite(tflite_path, images[img_size], labels,
+                                                  num_threads=num_threads), 4),
+            'latency_ms': measure_latency(tflite_path, images[img_size][0],
+                                          runs=latency_runs, num_threads=num_threads)
+        }
+        entries.append(entry)
+
+    variants_manifest = {
+        'created': datetime.now().isoformat(),
+        'source_model': str(model_path),
+        'source_sha256': source_sha256,
+        'labels_sha256': hash_file(LABELS_PATH),
+        'validation_images': int(len(labels)),
+        'num_threads': num_threads,
+        'variants': entries
+    }
+    manifest_path = output_dir / 'variants.json'
+    with open(manifest_path, 'w') as f:
+        json.dump(variants_manifest, f, indent=2)
+
+    print(f"\n{'Size':>6} {'MB':>7} {'Val acc':>8} {'p50 ms':>8} {'p90 ms':>8}")
+    for entry in entries:
+        print(f"{entry['img_size']:>6} {entry['size_mb']:>7.2f} {entry['val_accuracy']:>8.4f} "
+              f"{entry['latency_ms']['p50']:>8.2f} {entry['latency_ms']['p90']:>8.2f}")
+    print(f"\n✅ Variant manifest saved to: {manifest_path}")
+
+    return variants_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the classifier at several input sizes')
+    parser.add_argument('--model', type=str, default=BEST_MODEL_PATH,
+                       help='Trained Keras model to derive the variants from')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help='Input sizes to export')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--output-dir', type=str, default=DEFAULT_VARIANTS_DIR,
+                       help='Directory for the variants and variants.json')
+    parser.add_argument('--epochs', type=int, default=3,
+                       help='Fine-tuning epochs per resized variant (0 = copy weights only)')
+    parser.add_argument('--batch_size', type=int, default=32, help='Batch size')
+    parser.add_argument('--learning-rate', type=float, default=1e-5,
+                       help='Fine-tuning learning rate')
+    parser.add_argument('--latency-runs', type=int, default=50,
+                       help='Timed single-image runs per variant')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='Interpreter threads for evaluation and latency')
+    parser.add_argument('--force', action='store_true',
+                       help='Rebuild variants even if they are cached in the registry')
+
+    args = parser.parse_args()
+
+    export_variants(
+        model_path=args.model,
+        sizes=args.sizes,
+        dataset_dir=args.dataset,
+        output_dir=args.output_dir,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        latency_runs=args.latency_runs,
+        num_threads=args.threads,
+        force=args.force
+    )
+
+if __name__ == '__main__':
+    main()
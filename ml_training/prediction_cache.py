@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Prediction Cache
+==================================
+Caches class scores keyed by (image content hash, model artifact hash,
+preprocessing version). A bounded in-memory LRU sits in front of a
+persistent SQLite store. The database is shared by every model that
+serve.py and classify.py run (full, cascade, TTA, ONNX), so opening it
+never deletes anything: entries of another model or preprocessing
+version are simply never served. Old entries are removed only on an
+explicit --prune (entries of a retired preprocessing version, or older
+than --max-age-days) or --clear.
+
+Usage:
+    python prediction_cache.py --stats [--cache models/prediction_cache.sqlite]
+    python prediction_cache.py --prune [--max-age-days 30]
+    python prediction_cache.py --clear
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from inference import DEFAULT_MODEL_PATH, PREPROCESSING_VERSION
+
+DEFAULT_CACHE_PATH = 'models/prediction_cache.sqlite'
+DEFAULT_MAX_AGE_DAYS = 30
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PredictionCache:
+    """Two-tier (memory LRU + SQLite) cache of per-image class scores.
+
+    Safe to share between threads. Pass db_path=None for a memory-only
+    cache.
+    """
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, db_path=DEFAULT_CACHE_PATH,
+                 capacity=10000, preprocessing_version=PREPROCESSING_VERSION, model_hash=None):
+        self.model_hash = model_hash or hash_file(model_path)
+        self.preprocessing_version = preprocessing_version
+        self.capacity = capacity
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.pruned = 0
+
+        self.db = None
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS predictions (
+                    image_hash TEXT NOT NULL,
+                    model_hash TEXT NOT NULL,
+                    preprocessing_version INTEGER NOT NULL,
+                    scores BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (image_hash, model_hash, preprocessing_version)
+                )
+            """)
+
+    def prune(self, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """Delete entries of another preprocessing version or older than max_age_days.
+
+        Entries of other models are kept unless they are too old, since
+        other servers and tools share the database. Returns the number of
+        deleted entries.
+        """
+        if self.db is None:
+            return 0
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else 0
+        with self.lock:
+            with self.db:
+                cursor = self.db.execute(
+                    'DELETE FROM predictions WHERE preprocessing_version != ? OR created < ?',
+                    (self.preprocessing_version, cutoff)
+                )
+            self.pruned += cursor.rowcount
+        return cursor.rowcount
+
+    def _remember(self, image_hash, scores):
+        self.memory[image_hash] = scores
+        self.memory.move_to_end(image_hash)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, image_hash):
+        """Return cached scores for an image hash, or None on a miss."""
+        with self.lock:
+            scores = self.memory.get(image_hash)
+            if scores is not None:
+                self.memory.move_to_end(image_hash)
+                self.memory_hits += 1
+                return scores
+
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT scores FROM predictions '
+                    'WHERE image_hash = ? AND model_hash = ? AND preprocessing_version = ?',
+                    (image_hash, self.model_hash, self.preprocessing_version)
+                ).fetchone()
+                if row is not None:
+                    scores = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(image_hash, scores)
+                    self.disk_hits += 1
+                    return scores
+
+            self.misses += 1
+            return None
+
+    def put(self, image_hash, scores):
+        """Store the scores for one image."""
+        self.put_many([(image_hash, scores)])
+
+    def put_many(self, items):
+        """Store (image_hash, scores) pairs in one transaction."""
+        rows = []
+        now = time.time()
+        with self.lock:
+            for image_hash, scores in items:
+                scores = np.asarray(scores, dtype=np.float32)
+                self._remember(image_hash, scores)
+                rows.append((image_hash, self.model_hash, self.preprocessing_version,
+                             scores.tobytes(), now))
+
+            if self.db is not None and rows:
+                with self.db:
+                    self.db.executemany(
+                        'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)', rows
+                    )
+
+    def disk_size(self):
+        if self.db is None:
+            return 0
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                with self.db:
+                    self.db.execute('DELETE FROM predictions')
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            'model_hash': self.model_hash[:12],
+            'lookups': lookups,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'memory_size': len(self.memory),
+            'memory_capacity': self.capacity,
+            'disk_size': self.disk_size(),
+            'evictions': self.evictions,
+            'pruned': self.pruned
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+def print_stats(stats):
+    print(f"   Model hash:   {stats['model_hash']}")
+    print(f"   Lookups:      {stats['lookups']} "
+          f"(memory hits {stats['memory_hits']}, disk hits {stats['disk_hits']}, misses {stats['misses']})")
+    print(f"   Hit rate:     {stats['hit_rate'] * 100:.1f}%")
+    print(f"   Memory tier:  {stats['memory_size']}/{stats['memory_capacity']} "
+          f"({stats['evictions']} evictions)")
+    print(f"   Disk tier:    {stats['disk_size']} entries, all models "
+          f"({stats['pruned']} pruned)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or clear the prediction cache')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_PATH,
+                       help='Path to the cache database')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH,
+                       help='TFLite model the cache belongs to')
+    parser.add_argument('--stats', action='store_true', help='Show cache statistics')
+    parser.add_argument('--prune', action='store_true',
+                       help='Remove entries of an old preprocessing version or older than --max-age-days')
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS,
+                       help='Age limit for --prune')
+    parser.add_argument('--clear', action='store_true', help='Remove all cached entries')
+
+    args = parser.parse_args()
+
+    cache = PredictionCache(args.model, args.cache)
+    if args.clear:
+        cache.clear()
+        print(f"🧹 Cleared cache: {args.cache}")
+    elif args.prune:
+        removed = cache.prune(args.max_age_days)
+        print(f"🧹 Pruned {removed} entries from: {args.cache}")
+    print(f"\n📦 Prediction cache: {args.cache}")
+    print_stats(cache.stats())
+    cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Dataset Preparation
+===================
+Writes a normalized, pre-resized copy of the dataset so training does
+not fully decode and downscale every source image on every epoch.
+
+Each image is decoded once (JPEGs with reduced-size DCT decoding when the
+source is much larger than needed), rotated according to its EXIF
+orientation, converted to RGB (CMYK, greyscale, palette) and saved as a
+baseline JPEG whose shorter side is just above the training size. Several
+training sizes can be written from the same decode, each level resized
+from the previous one.
+
+Files that cannot be decoded are copied to a quarantine directory and
+listed in a report instead of crashing training partway through an
+epoch. Re-running only processes images that are new or changed.
+
+Layout:
+    dataset_prepared/<size>/<class>/<image>.jpg   (see assign_output_names)
+    dataset_prepared/quarantine/<class>/<original file>
+    dataset_prepared/prepare_report.csv
+
+Usage:
+    python prepare_dataset.py [--dataset dataset] [--output dataset_prepared] [--sizes 224]
+    python train_model.py --dataset dataset_prepared/224
+"""
+
+import csv
+import sys
+import json
+import math
+import hashlib
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+
+from inference import IMAGE_EXTENSIONS
+
+DEFAULT_OUTPUT_DIR = 'dataset_prepared'
+STATE_FILE = 'prepare_state.json'
+REPORT_FILE = 'prepare_report.csv'
+JPEG_QUALITY = 95
+
+def short_side_for(size):
+    """Shorter side to store for a training size (256 for 224)."""
+    return math.ceil(size * 8 / 7)
+
+def output_name(relative):
+    """Default output name (`<class>/<name>.jpg`) for a source image.
+
+    Only `.jpg` sources keep their plain stem; any other suffix (`.jpeg`
+    included) is kept in the name, so `foo.jpeg` becomes `foo_jpeg.jpg`.
+    """
+    class_name, name = relative.split('/', 1)
+    path = Path(name)
+    if path.suffix.lower() != '.jpg':
+        name = f"{path.stem}_{path.suffix[1:].lower()}"
+    else:
+        name = path.stem
+    return f"{class_name}/{name}.jpg"
+
+def assign_output_names(relatives):
+    """Map each source to a unique output name.
+
+    Sources whose default names collide (`foo.jpg` and `foo.JPG`, or
+    `foo.png` and a source named `foo_png.jpg`) all get a short hash of
+    their source path appended instead. Names are compared
+    case-insensitively so the layout also works on case-insensitive
+    filesystems. Raises ValueError if names still collide.
+    """
+    groups = {}
+    for relative in relatives:
+        groups.setdefault(output_name(relative).lower(), []).append(relative)
+
+    names = {}
+    for group in groups.values():
+        for relative in group:
+            name = output_name(relative)
+            if len(group) > 1:
+                digest = hashlib.sha256(relative.encode()).hexdigest()[:8]
+                name = f"{name[:-len('.jpg')]}_{digest}.jpg"
+            names[relative] = name
+
+    seen = {}
+    for relative, name in names.items():
+        other = seen.setdefault(name.lower(), relative)
+        if other != relative:
+            raise ValueError(f"{other} and {relative} both map to {name}; rename one of them")
+    return names
+
+def open_reduced(path, short_side):
+    """Open an image, using reduced-size JPEG decoding when it is much larger.
+
+    draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale, never going below
+    the requested size, so the full-resolution image is never materialised.
+    """
+    image = Image.open(path)
+    if image.format == 'JPEG':
+        width, height = image.size
+        scale = short_side / min(width, height)
+        image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+    image.load()
+    return image
+
+def normalize_image(image):
+    """Apply EXIF orientation and convert to RGB."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+def resize_short_side(image, short_side):
+    width, height = image.size
+    scale = short_side / min(width, height)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+def prepare_image(task):
+    """Decode one source image and write every pyramid level.
+
+    Returns (relative, status, detail); status is 'ok', 'small'
+    (smaller than the largest level, stored as is) or 'quarantined'.
+    """
+    source, relative, outputs = task
+    short_sides = sorted(outputs, reverse=True)
+    try:
+        image = normalize_image(open_reduced(source, short_sides[0]))
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        return relative, 'quarantined', f"{type(e).__name__}: {e}"
+
+    width, height = image.size
+    for short_side in short_sides:
+        image = resize_short_side(image, short_side)
+        destination = Path(outputs[short_side])
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        image.save(destination, 'JPEG', quality=JPEG_QUALITY, progressive=False, optimize=False)
+
+    if min(width, height) < short_sides[0]:
+        return relative, 'small', f"decoded {width}x{height}, below {short_sides[0]}px"
+    return relative, 'ok', f"decoded {width}x{height}"
+
+def prepare_dataset(dataset_dir='dataset', output_dir=DEFAULT_OUTPUT_DIR, sizes=(224,), workers=None):
+    """Prepare new or changed images and return a {status: count} summary."""
+    dataset_dir, output_dir = Path(dataset_dir), Path(output_dir)
+    levels = {short_side_for(size): output_dir / str(size) for size in sizes}
+
+    state_path = output_dir / STATE_FILE
+    state = {}
+    if state_path.exists():
+        with open(state_path) as f:
+            state = json.load(f)
+    if state.get('levels') != sorted(levels):
+        state = {}
+    known = state.get('files', {})
+
+    print("\n" + "="*60)
+    print("🧹 PREPARING DATASET")
+    print("="*60)
+    print(f"   Source: {dataset_dir}")
+    print(f"   Levels: " + ', '.join(f"{size}px (shorter side {short_side_for(size)})" for size in sizes))
+
+    sources = {
+        f"{class_dir.name}/{path.name}": path
+        for class_dir in sorted(p for p in dataset_dir.iterdir() if p.is_dir())
+        for path in sorted(class_dir.iterdir())
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    }
+    names = assign_output_names(sources)
+
+    def remove_outputs(name):
+        for level_dir in levels.values():
+            (level_dir / name).unlink(missing_ok=True)
+
+    tasks, files = [], {}
+    for relative, path in sources.items():
+        stat = path.stat()
+        name = names[relative]
+        outputs = {short_side: str(level_dir / name) for short_side, level_dir in levels.items()}
+        entry = known.get(relative)
+        files[relative] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'output': name}
+        previous_name = entry.get('output', output_name(relative)) if entry else name
+        if previous_name != name:
+            # Renamed to resolve a new collision; the old output is stale
+            remove_outputs(previous_name)
+        elif (entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+                and (entry['status'] == 'quarantined' or all(Path(o).exists() for o in outputs.values()))):
+            files[relative].update(status=entry['status'], detail=entry['detail'])
+            continue
+        tasks.append((str(path), relative, outputs))
+
+    # Drop outputs whose source was removed
+    for relative in set(known) - set(files):
+        remove_outputs(known[relative].get('output', output_name(relative)))
+
+    print(f"\n🔄 Processing {len(tasks)} new or changed images ({len(files) - len(tasks)} up to date)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for relative, status, detail in executor.map(prepare_image, tasks, chunksize=16):
+            files[relative].update(status=status, detail=detail)
+            if status == 'quarantined':
+                quarantine = output_dir / 'quarantine' / relative
+                quarantine.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(dataset_dir / relative, quarantine)
+                remove_outputs(files[relative]['output'])
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(state_path, 'w') as f:
+        json.dump({'levels': sorted(levels), 'files': files}, f, indent=1)
+
+    flagged = [(r, e) for r, e in sorted(files.items()) if e['status'] != 'ok']
+    report_path = output_dir / REPORT_FILE
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'status', 'detail'])
+        for relative, entry in flagged:
+            writer.writerow([relative, entry['status'], entry['detail']])
+
+    summary = {}
+    for entry in files.values():
+        summary[entry['status']] = summary.get(entry['status'], 0) + 1
+
+    print(f"\n✅ Prepared {summary.get('ok', 0) + summary.get('small', 0)} images")
+    if summary.get('small'):
+        print(f"   ⚠️  {summary['small']} images are smaller than the target size (kept as is)")
+    if summary.get('quarantined'):
+        print(f"   ❌ {summary['quarantined']} unreadable images quarantined in {output_dir / 'quarantine'}")
+    print(f"   Report: {report_path}")
+    for size in sizes:
+        print(f"   Train with: python train_model.py --dataset {output_dir / str(size)}")
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a normalized, pre-resized copy of the dataset')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Source dataset directory')
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT_DIR, help='Output directory')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[224],
+                       help='Training sizes to prepare (one level per size)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+
+    args = parser.parse_args()
+
+    try:
+        prepare_dataset(args.dataset, args.output, args.sizes, args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
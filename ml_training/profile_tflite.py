@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+TFLite Model Profiler
+=====================
+Lists every op in a converted model with its type, the kernel that runs
+it (XNNPACK delegate, built-in kernel or Flex/TF fallback), its tensor
+shapes and sizes, and attributes latency per op and per original Keras
+layer.
+
+Flags:
+    - Flex ops (SELECT_TF_OPS fallbacks, slow and need the Flex delegate)
+    - float compute in a quantized (int8) model
+    - float16 weights that are dequantized to float32 at load time
+    - intermediate tensors above --max-intermediate-mb
+
+The Python interpreter has no per-op timer, so per-op latency is measured
+with TFLite's `benchmark_model` tool when it is on the PATH (or passed
+with --benchmark-binary). Otherwise the measured whole-model latency is
+split across ops in proportion to their multiply-accumulate count and
+the report marks those numbers as estimates.
+
+Writes a CSV and a click-to-sort HTML table to attach to a release.
+
+Usage:
+    python profile_tflite.py models/waste_classifier.tflite [--output-dir models/profile]
+"""
+
+import csv
+import sys
+import html
+import time
+import shutil
+import argparse
+import subprocess
+import numpy as np
+from pathlib import Path
+from collections import Counter, defaultdict
+
+from inference import DEFAULT_MODEL_PATH, get_interpreter_class
+
+DEFAULT_OUTPUT_DIR = 'models/profile'
+ELEMENTWISE_COST = 1
+
+def load_interpreter(model_path, delegates=True):
+    """Interpreter with or without the default (XNNPACK) delegate, allocated."""
+    Interpreter = get_interpreter_class()
+    kwargs = {}
+    if not delegates:
+        OpResolverType = sys.modules[Interpreter.__module__].OpResolverType
+        kwargs['experimental_op_resolver_type'] = OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    interpreter = Interpreter(model_path=str(model_path), **kwargs)
+    interpreter.allocate_tensors()
+    return interpreter
+
+COMPUTE_NAMES = ('convolution', 'depthwise', 'MatMul', 'BiasAdd')
+
+def layer_name(tensor_name):
+    """Best-effort Keras layer name from a TFLite tensor name.
+
+    'sequential_1/mobilenetv2_1.00_224_1/block_11_project_1/convolution1'
+    becomes 'block_11_project'. Fused ops (conv + batch norm + activation)
+    list several names separated by ';'; the one naming the convolution or
+    matmul is used.
+    """
+    names = [n for n in tensor_name.split(';') if '/' in n] or [tensor_name]
+    name = next((n for n in names if n.split('/')[-1].startswith(COMPUTE_NAMES)), names[0])
+    parts = name.split('/')
+    if len(parts) < 2:
+        return parts[0]
+    name = parts[-2]
+    base, _, suffix = name.rpartition('_')
+    return base if suffix.isdigit() and base else name
+
+def delegated_ops(ops):
+    """Indices of ops folded into a DELEGATE node.
+
+    Walks back from each delegate node's outputs through the producing ops
+    until reaching the delegate node's inputs.
+    """
+    producers = {}
+    for op in ops:
+        if op['op_name'] != 'DELEGATE':
+            for tensor in op['outputs']:
+                producers[int(tensor)] = op
+
+    delegated = set()
+    for node in (op for op in ops if op['op_name'] == 'DELEGATE'):
+        boundary = {int(t) for t in node['inputs']}
+        stack = [int(t) for t in node['outputs']]
+        while stack:
+            tensor = stack.pop()
+            op = producers.get(tensor)
+            if tensor in boundary or op is None or op['index'] in delegated:
+                continue
+            delegated.add(op['index'])
+            stack.extend(int(t) for t in op['inputs'] if t >= 0)
+    return delegated
+
+def op_macs(op_name, inputs, outputs):
+    """Approximate multiply-accumulates for one op from its tensor shapes."""
+    out_elements = int(np.prod(outputs[0]['shape'])) if outputs else 0
+    if op_name == 'CONV_2D' and len(inputs) > 1:
+        _, kh, kw, cin = inputs[1]['shape']
+        return out_elements * int(kh) * int(kw) * int(cin)
+    if op_name == 'DEPTHWISE_CONV_2D' and len(inputs) > 1:
+        _, kh, kw, _ = inputs[1]['shape']
+        return out_elements * int(kh) * int(kw)
+    if op_name == 'FULLY_CONNECTED' and len(inputs) > 1:
+        return out_elements * int(inputs[1]['shape'][-1])
+    return out_elements * ELEMENTWISE_COST
+
+def measure_latency(model_path, delegates=True, runs=50):
+    """Median whole-model invoke latency in ms."""
+    interpreter = load_interpreter(model_path, delegates)
+    details = interpreter.get_input_details()[0]
+    interpreter.set_tensor(details['index'], np.random.rand(*details['shape']).astype(details['dtype']))
+    for _ in range(5):
+        interpreter.invoke()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        interpreter.invoke()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+def run_benchmark_tool(binary, model_path, threads=1):
+    """Per-op average ms from benchmark_model --enable_op_profiling, keyed by op name.
+
+    Returns None if the tool fails or its output cannot be parsed.
+    """
+    command = [binary, f'--graph={model_path}', '--enable_op_profiling=true',
+               f'--num_threads={threads}', '--use_xnnpack=false']
+    try:
+        output = subprocess.run(command, capture_output=True, text=True, timeout=600).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+    timings, in_table = {}, False
+    for line in output.splitlines():
+        if 'Run Order' in line:
+            in_table = True
+            continue
+        if in_table:
+            if not line.strip() or line.startswith('='):
+                if timings:
+                    break
+                continue
+            fields = [f for f in line.split('\t') if f.strip()] or line.split()
+            if fields[0].strip().startswith('[node type]'):
+                continue
+            try:
+                timings[fields[-1].strip().strip('[]')] = float(fields[2])
+            except (ValueError, IndexError):
+                continue
+    return timings or None
+
+def analyze(model_path, max_intermediate_mb=2.0, benchmark_binary=None, threads=1):
+    """Return (rows, summary) describing every op in the model."""
+    interpreter = load_interpreter(model_path)
+    tensors = {t['index']: t for t in interpreter.get_tensor_details()}
+    ops = interpreter._get_ops_details()
+    delegated = delegated_ops(ops)
+
+    quantized = any(t['dtype'] == np.int8 for t in tensors.values())
+    constants = set()
+    for op in ops:
+        if op['op_name'] == 'DEQUANTIZE':
+            constants.update(int(t) for t in op['outputs'])
+
+    def describe(index):
+        tensor = tensors[int(index)]
+        nbytes = int(np.prod(tensor['shape'])) * np.dtype(tensor['dtype']).itemsize
+        return {'name': tensor['name'], 'shape': [int(d) for d in tensor['shape']],
+                'dtype': np.dtype(tensor['dtype']).name, 'bytes': nbytes}
+
+    rows = []
+    for op in ops:
+        if op['op_name'] == 'DELEGATE':
+            continue
+        inputs = [describe(t) for t in op['inputs'] if t >= 0]
+        outputs = [describe(t) for t in op['outputs']]
+        name = op['op_name']
+
+        if name.startswith('Flex'):
+            kernel = 'Flex (TF fallback)'
+        elif op['index'] in delegated:
+            kernel = 'XNNPACK'
+        else:
+            kernel = 'builtin'
+
+        flags = []
+        if name.startswith('Flex'):
+            flags.append('flex-op')
+        if quantized and name not in ('QUANTIZE', 'DEQUANTIZE') and \
+                any(o['dtype'] == 'float32' for o in outputs):
+            flags.append('float-fallback')
+        if name == 'DEQUANTIZE' and inputs and inputs[0]['dtype'] == 'float16':
+            flags.append('fp16-weights')
+        activations = [o for t, o in zip(op['outputs'], outputs) if int(t) not in constants]
+        if any(o['bytes'] > max_intermediate_mb * 1024 * 1024 for o in activations):
+            flags.append('large-intermediate')
+
+        rows.append({
+            'index': op['index'],
+            'op': name,
+            'kernel': kernel,
+            'layer': layer_name(outputs[0]['name']) if outputs else '',
+            'output_name': outputs[0]['name'] if outputs else '',
+            'input_shapes': ' '.join('x'.join(map(str, i['shape'])) for i in inputs),
+            'output_shape': ' '.join('x'.join(map(str, o['shape'])) for o in outputs),
+            'output_dtype': outputs[0]['dtype'] if outputs else '',
+            'output_kb': round(sum(o['bytes'] for o in outputs) / 1024, 1),
+            'macs': op_macs(name, inputs, outputs),
+            'flags': ' '.join(flags)
+        })
+
+    latency = {
+        'delegated_ms': measure_latency(model_path, delegates=True),
+        'reference_ms': measure_latency(model_path, delegates=False)
+    }
+
+    timings = None
+    binary = benchmark_binary or shutil.which('benchmark_model')
+    if binary:
+        timings = run_benchmark_tool(binary, model_path, threads)
+    # Weight dequantization runs once at load, not per invoke
+    runtime_rows = [r for r in rows if 'fp16-weights' not in r['flags']]
+    total_macs = sum(r['macs'] for r in runtime_rows) or 1
+    for row in rows:
+        if timings and row['output_name'] in timings:
+            row['ms'], row['ms_source'] = timings[row['output_name']], 'measured'
+        elif 'fp16-weights' in row['flags']:
+            row['ms'], row['ms_source'] = 0.0, 'load-time'
+        else:
+            row['ms'] = round(latency['reference_ms'] * row['macs'] / total_macs, 4)
+            row['ms_source'] = 'estimated'
+
+    summary = {
+        'model': str(model_path),
+        'ops': len(rows),
+        'op_types': dict(Counter(r['op'] for r in rows).most_common()),
+        'flex_ops': sum('flex-op' in r['flags'] for r in rows),
+        'float_fallbacks': sum('float-fallback' in r['flags'] for r in rows),
+        'fp16_weights': sum('fp16-weights' in r['flags'] for r in rows),
+        'large_intermediates': sum('large-intermediate' in r['flags'] for r in rows),
+        'delegated_ops': sum(r['kernel'] == 'XNNPACK' for r in rows),
+        'quantized': quantized,
+        'timing': 'measured' if timings else 'estimated from MACs',
+        **latency
+    }
+    return rows, summary
+
+def layer_totals(rows):
+    """Sum ms and MACs per Keras layer, slowest first."""
+    totals = defaultdict(lambda: {'ms': 0.0, 'macs': 0, 'ops': 0})
+    for row in rows:
+        entry = totals[row['layer']]
+        entry['ms'] += row['ms']
+        entry['macs'] += row['macs']
+        entry['ops'] += 1
+    return sorted(totals.items(), key=lambda kv: -kv[1]['ms'])
+
+COLUMNS = ['index', 'op', 'kernel', 'layer', 'input_shapes', 'output_shape', 'output_dtype',
+           'output_kb', 'macs', 'ms', 'ms_source', 'flags']
+
+SORT_SCRIPT = """
+<script>
+document.querySelectorAll('th').forEach(function (th) {
+  th.addEventListener('click', function () {
+    var table = th.closest('table'), body = table.tBodies[0];
+    var col = Array.prototype.indexOf.call(th.parentNode.children, th);
+    var asc = th.dataset.asc !== 'true'; th.dataset.asc = asc;
+    Array.from(body.rows).sort(function (a, b) {
+      var x = a.cells[col].textContent, y = b.cells[col].textContent;
+      var nx = parseFloat(x), ny = parseFloat(y);
+      var r = (!isNaN(nx) && !isNaN(ny)) ? nx - ny : x.localeCompare(y);
+      return asc ? r : -r;
+    }).forEach(function (row) { body.appendChild(row); });
+  });
+});
+</script>
+"""
+
+def html_table(columns, rows):
+    head = ''.join(f'<th>{html.escape(c)}</th>' for c in columns)
+    body = ''.join(
+        '<tr>' + ''.join(f'<td>{html.escape(str(row[c]))}</td>' for c in columns) + '</tr>'
+        for row in rows
+    )
+    return f'<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+def write_reports(rows, summary, output_dir):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(summary['model']).stem
+
+    csv_path = output_dir / f'{stem}_ops.csv'
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    layers = [{'layer': name, 'ops': t['ops'], 'macs': t['macs'], 'ms': round(t['ms'], 4)}
+              for name, t in layer_totals(rows)]
+    summary_rows = [{'key': k, 'value': v} for k, v in summary.items()]
+    html_path = output_dir / f'{stem}_profile.html'
+    with open(html_path, 'w') as f:
+        f.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>TFLite profile: {html.escape(stem)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; font-size: 0.85em; }}
+th, td {{ border: 1px solid #ccc; padding: 3px 8px; text-align: left; }}
+th {{ background: #f0f0f0; cursor: pointer; }}
+</style></head><body>
+<h1>TFLite profile: {html.escape(stem)}</h1>
+<p>Click a column header to sort. Per-op ms are {html.escape(summary['timing'])}.</p>
+<h2>Summary</h2>{html_table(['key', 'value'], summary_rows)}
+<h2>Per Keras layer</h2>{html_table(['layer', 'ops', 'macs', 'ms'], layers)}
+<h2>Per op</h2>{html_table(COLUMNS, rows)}
+{SORT_SCRIPT}</body></html>
+""")
+    return csv_path, html_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-op profile and Flex-op check for a TFLite model')
+    parser.add_argument('model', nargs='?', default=DEFAULT_MODEL_PATH, help='TFLite model')
+    parser.add_argument('--output-dir', type=str, default=DEFAULT_OUTPUT_DIR,
+                       help='Where to write the CSV and HTML reports')
+    parser.add_argument('--max-intermediate-mb', type=float, default=2.0,
+                       help='Flag activation tensors larger than this')
+    parser.add_argument('--benchmark-binary', type=str, default=None,
+                       help='Path to TFLite benchmark_model for measured per-op timings')
+    parser.add_argument('--threads', type=int, default=1, help='Threads for benchmark_model')
+    parser.add_argument('--top', type=int, default=10, help='Slowest layers to print')
+
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"❌ Model not found: {args.model}")
+        return
+
+    print(f"\n🔬 Profiling: {args.model}")
+    rows, summary = analyze(args.model, args.max_intermediate_mb, args.benchmark_binary, args.threads)
+
+    print(f"   Ops: {summary['ops']} ({summary['delegated_ops']} run by XNNPACK)")
+    print("   " + ', '.join(f"{op} {n}" for op, n in summary['op_types'].items()))
+    print(f"   Latency: {summary['delegated_ms']:.2f} ms with XNNPACK, "
+          f"{summary['reference_ms']:.2f} ms with reference kernels")
+
+    status = "❌" if summary['flex_ops'] else "✅"
+    print(f"\n{status} Flex ops: {summary['flex_ops']}")
+    for row in (r for r in rows if 'flex-op' in r['flags']):
+        print(f"      {row['op']} ({row['layer']})")
+    if summary['quantized']:
+        status = "⚠️ " if summary['float_fallbacks'] else "✅"
+        print(f"{status} Float ops in quantized model: {summary['float_fallbacks']}")
+    if summary['fp16_weights']:
+        print(f"ℹ️  {summary['fp16_weights']} float16 weight tensors are dequantized to float32 "
+              f"at load (compute runs in float32)")
+    status = "⚠️ " if summary['large_intermediates'] else "✅"
+    print(f"{status} Intermediates over {args.max_intermediate_mb} MB: {summary['large_intermediates']}")
+
+    print(f"\n⏱️  Slowest layers ({summary['timing']}):")
+    for name, totals in layer_totals(rows)[:args.top]:
+        print(f"   {name:40} {totals['ms']:8.3f} ms  {totals['macs'] / 1e6:8.1f} M MACs")
+
+    csv_path, html_path = write_reports(rows, summary, args.output_dir)
+    print(f"\n✅ Reports saved to: {csv_path}, {html_path}")
+
+if __name__ == '__main__':
+    main()
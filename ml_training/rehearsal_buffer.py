@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Rehearsal Buffer
+================
+A compact, class-stratified reservoir sample of images the model has
+already been trained on. Incremental fine-tuning mixes it with the newly
+added images so the model does not forget the older data.
+
+Each class keeps its own reservoir (Algorithm R), so every previously
+seen image of a class has the same chance of being in the buffer and
+rare classes are not crowded out by large ones. The random generator's
+state is saved with the buffer, so replacement choices continue one
+stream across incremental runs instead of repeating the same sequence.
+"""
+
+import json
+import random
+from pathlib import Path
+
+DEFAULT_BUFFER_PATH = 'models/rehearsal_buffer.json'
+
+class RehearsalBuffer:
+    """Per-class reservoir sample of dataset-relative image paths."""
+
+    def __init__(self, capacity_per_class=200, seed=0):
+        self.capacity_per_class = capacity_per_class
+        self.seen = {}
+        self.items = {}
+        self.rng = random.Random(seed)
+
+    def add(self, relative, class_name):
+        """Offer one image to the reservoir of its class."""
+        reservoir = self.items.setdefault(class_name, [])
+        seen = self.seen.get(class_name, 0) + 1
+        self.seen[class_name] = seen
+
+        if len(reservoir) < self.capacity_per_class:
+            reservoir.append(relative)
+        else:
+            slot = self.rng.randrange(seen)
+            if slot < self.capacity_per_class:
+                reservoir[slot] = relative
+
+    def extend(self, relatives, manifest):
+        for relative in relatives:
+            self.add(relative, manifest['files'][relative]['class'])
+
+    def prune(self, manifest):
+        """Drop entries whose files were removed from or changed in the dataset.
+
+        Dropped images leave the population the reservoir samples from, so
+        they are also taken off the class's seen count.
+        """
+        for class_name, reservoir in self.items.items():
+            kept = [
+                r for r in reservoir
+                if r in manifest['files'] and manifest['files'][r]['class'] == class_name
+            ]
+            dropped = len(reservoir) - len(kept)
+            self.items[class_name] = kept
+            self.seen[class_name] = max(self.seen.get(class_name, 0) - dropped, len(kept))
+
+    def sample(self, exclude=()):
+        exclude = set(exclude)
+        return sorted(r for reservoir in self.items.values() for r in reservoir if r not in exclude)
+
+    def __len__(self):
+        return sum(len(reservoir) for reservoir in self.items.values())
+
+    def save(self, path=DEFAULT_BUFFER_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'capacity_per_class': self.capacity_per_class,
+                'seen': self.seen,
+                'items': self.items,
+                'rng_state': self.rng.getstate()
+            }, f, indent=1)
+
+    @classmethod
+    def load(cls, path=DEFAULT_BUFFER_PATH, capacity_per_class=None):
+        """Load a saved buffer, or return None if there is none."""
+        if not Path(path).exists():
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        buffer = cls(capacity_per_class or state['capacity_per_class'])
+        buffer.seen = state['seen']
+        buffer.items = state['items']
+        if 'rng_state' in state:
+            # JSON turns the state's tuples into lists
+            version, internal, gauss_next = state['rng_state']
+            buffer.rng.setstate((version, tuple(internal), gauss_next))
+        # Subsample reservoirs if the capacity was lowered
+        for class_name, reservoir in buffer.items.items():
+            if len(reservoir) > buffer.capacity_per_class:
+                buffer.items[class_name] = buffer.rng.sample(reservoir, buffer.capacity_per_class)
+        return buffer
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Training Report Renderer
+========================
+Renders training plots and evaluation reports from the raw metrics that
+train_model.py saves after each run. Runs headless (Agg backend) and does
+not import TensorFlow, so reports can be rendered in a background process
+while training exits, or regenerated later for old runs.
+
+Usage:
+    python report.py models/runs/20260112-105226/metrics.npz
+    python report.py --all [--runs-dir models/runs]
+    python report.py --time-to 0.85 models/runs/A/metrics.npz models/runs/B/metrics.npz
+"""
+
+import sys
+import base64
+import argparse
+import html
+import numpy as np
+from datetime import datetime
+from pathlib import Path
+
+RUNS_DIR = 'models/runs'
+METRICS_FILE = 'metrics.npz'
+HISTORY_PREFIX = 'history_'
+
+def get_pyplot():
+    """Import pyplot on the headless Agg backend.
+
+    Plotting libraries are imported lazily so that training can import
+    save_run_metrics() without pulling in matplotlib.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def save_run_metrics(run_dir, history, y_true, y_pred, probabilities, classes, **extra):
+    """Save raw training metrics and predictions as a compact .npz file.
+
+    `history` is the Keras History.history dict. Extra keyword arguments
+    are stored as-is (e.g. filenames, epochs). Only NumPy is needed here,
+    so the training process never touches the plotting stack.
+    """
+    run_dir = Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    arrays = {
+        f'{HISTORY_PREFIX}{key}': np.asarray(values, dtype=np.float32)
+        for key, values in history.items()
+    }
+    arrays['y_true'] = np.asarray(y_true, dtype=np.int16)
+    arrays['y_pred'] = np.asarray(y_pred, dtype=np.int16)
+    arrays['probabilities'] = np.asarray(probabilities, dtype=np.float16)
+    arrays['classes'] = np.asarray(classes)
+    arrays['created'] = np.asarray(datetime.now().isoformat())
+    for key, value in extra.items():
+        arrays[key] = np.asarray(value)
+
+    metrics_path = run_dir / METRICS_FILE
+    np.savez_compressed(metrics_path, **arrays)
+    return metrics_path
+
+def load_run_metrics(metrics_path):
+    """Load a metrics.npz file into (history, arrays) dicts."""
+    with np.load(metrics_path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+
+    history = {
+        key[len(HISTORY_PREFIX):]: arrays.pop(key).tolist()
+        for key in list(arrays)
+        if key.startswith(HISTORY_PREFIX)
+    }
+    return history, arrays
+
+def time_to_accuracy(history, target):
+    """First (epoch, elapsed seconds) at which val accuracy reached target, or None.
+
+    Needs the 'elapsed_s' entries that train_model.py's EpochTimer adds.
+    """
+    for epoch, (accuracy, elapsed) in enumerate(zip(history.get('val_accuracy', []),
+                                                     history.get('elapsed_s', [])), 1):
+        if accuracy >= target:
+            return epoch, elapsed
+    return None
+
+def compare_time_to_accuracy(metrics_paths, target):
+    """Print total training time and time to a target val accuracy for several runs."""
+    print(f"\n⏱️  Training time to {target:.2f} val accuracy:")
+    print(f"   {'Run':20} {'Schedule':24} {'LR':9} {'Epochs':>6} {'Total s':>8} {'To target s':>12} {'Best val':>9}")
+    for metrics_path in metrics_paths:
+        history, arrays = load_run_metrics(metrics_path)
+        elapsed = history.get('elapsed_s', [])
+        reached = time_to_accuracy(history, target)
+        print(f"   {Path(metrics_path).parent.name:20} {str(arrays.get('schedule', '-')):24} "
+              f"{str(arrays.get('lr_schedule', '-')):9} "
+              f"{len(history.get('loss', [])):>6} "
+              f"{f'{elapsed[-1]:.0f}' if elapsed else '-':>8} "
+              f"{f'{reached[1]:.0f} (ep {reached[0]})' if reached else '-':>12} "
+              f"{max(history.get('val_accuracy', [float('nan')])):>9.4f}")
+
+def plot_training_history(history, save_path='models/training_history.png'):
+    """Plot and save training history."""
+    plt = get_pyplot()
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Accuracy plot
+    axes[0].plot(history['accuracy'], label='Training')
+    axes[0].plot(history['val_accuracy'], label='Validation')
+    axes[0].set_title('Model Accuracy')
+    axes[0].set_xlabel('Epoch')
+    axes[0].set_ylabel('Accuracy')
+    axes[0].legend()
+    axes[0].grid(True)
+
+    # Loss plot
+    axes[1].plot(history['loss'], label='Training')
+    axes[1].plot(history['val_loss'], label='Validation')
+    axes[1].set_title('Model Loss')
+    axes[1].set_xlabel('Epoch')
+    axes[1].set_ylabel('Loss')
+    axes[1].legend()
+    axes[1].grid(True)
+
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=150)
+    print(f"📊 Training history saved to: {save_path}")
+    plt.close(fig)
+
+def plot_confusion_matrix(y_true, y_pred, classes, save_path='models/confusion_matrix.png'):
+    """Plot and save confusion matrix."""
+    import seaborn as sns
+    from sklearn.metrics import confusion_matrix
+
+    plt = get_pyplot()
+    cm = confusion_matrix(y_true, y_pred, labels=range(len(classes)))
+
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(
+        cm,
+        annot=True,
+        fmt='d',
+        cmap='Blues',
+        xticklabels=classes,
+        yticklabels=classes
+    )
+    plt.title('Confusion Matrix')
+    plt.xlabel('Predicted')
+    plt.ylabel('True')
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=150)
+    print(f"📊 Confusion matrix saved to: {save_path}")
+    plt.close()
+
+def write_html_report(output_dir, title, created, summary, report_text, images):
+    """Write a self-contained HTML report with the plots embedded inline."""
+    sections = []
+    for caption, image_path in images:
+        encoded = base64.b64encode(Path(image_path).read_bytes()).decode('ascii')
+        sections.append(
+            f'<h2>{html.escape(caption)}</h2>\n'
+            f'<img src="data:image/png;base64,{encoded}" alt="{html.escape(caption)}">'
+        )
+
+    summary_rows = '\n'.join(
+        f'<tr><th>{html.escape(key)}</th><td>{html.escape(str(value))}</td></tr>'
+        for key, value in summary.items()
+    )
+
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; color: #222; }}
+table {{ border-collapse: collapse; }}
+th, td {{ text-align: left; padding: 4px 12px; border-bottom: 1px solid #ddd; }}
+img {{ max-width: 100%; }}
+pre {{ background: #f5f5f5; padding: 1em; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(title)}</h1>
+<p>Run created: {html.escape(created)}</p>
+<table>
+{summary_rows}
+</table>
+<h2>Classification Report</h2>
+<pre>{html.escape(report_text)}</pre>
+{chr(10).join(sections)}
+</body>
+</html>
+"""
+    report_path = Path(output_dir) / 'report.html'
+    report_path.write_text(page)
+    print(f"📄 HTML report saved to: {report_path}")
+    return report_path
+
+def render_report(metrics_path, output_dir=None):
+    """Render all plots and the HTML report for one training run."""
+    from sklearn.metrics import classification_report
+
+    metrics_path = Path(metrics_path)
+    output_dir = Path(output_dir) if output_dir else metrics_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n📂 Rendering report for: {metrics_path}")
+    history, arrays = load_run_metrics(metrics_path)
+    classes = [str(c) for c in arrays['classes']]
+    y_true = arrays['y_true']
+    y_pred = arrays['y_pred']
+
+    report_text = classification_report(
+        y_true,
+        y_pred,
+        labels=range(len(classes)),
+        target_names=classes,
+        zero_division=0
+    )
+    print("\n📋 Classification Report:")
+    print(report_text)
+    (output_dir / 'classification_report.txt').write_text(report_text)
+
+    images = []
+    if history:
+        history_path = output_dir / 'training_history.png'
+        plot_training_history(history, save_path=history_path)
+        images.append(('Training History', history_path))
+
+    cm_path = output_dir / 'confusion_matrix.png'
+    plot_confusion_matrix(y_true, y_pred, classes, save_path=cm_path)
+    images.append(('Confusion Matrix', cm_path))
+
+    summary = {
+        'Classes': ', '.join(classes),
+        'Validation samples': len(y_true),
+        'Validation accuracy': f"{np.mean(y_true == y_pred):.4f}",
+    }
+    if history:
+        summary['Epochs'] = len(history.get('loss', []))
+        if 'val_accuracy' in history:
+            summary['Best val accuracy'] = f"{max(history['val_accuracy']):.4f}"
+        if 'elapsed_s' in history:
+            summary['Training time'] = f"{history['elapsed_s'][-1]:.0f}s"
+    if 'schedule' in arrays:
+        summary['Resolution schedule'] = str(arrays['schedule'])
+    if 'lr_schedule' in arrays:
+        summary['Learning-rate schedule'] = f"{arrays['lr_schedule']} (max {float(arrays['max_lr']):.2e})"
+    if 'target_accuracy' in arrays:
+        target = float(arrays['target_accuracy'])
+        reached = time_to_accuracy(history, target)
+        summary[f'Time to {target:.2f} val accuracy'] = \
+            f"{reached[1]:.0f}s (epoch {reached[0]})" if reached else 'not reached'
+
+    return write_html_report(
+        output_dir,
+        title=f'Waste Classifier Training Report ({metrics_path.parent.name})',
+        created=str(arrays.get('created', '')),
+        summary=summary,
+        report_text=report_text,
+        images=images
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Render training reports from saved metrics')
+    parser.add_argument('metrics', nargs='*',
+                       help='Path(s) to metrics.npz files')
+    parser.add_argument('--all', action='store_true',
+                       help='Render reports for every run in --runs-dir')
+    parser.add_argument('--runs-dir', type=str, default=RUNS_DIR,
+                       help='Directory holding per-run metrics')
+    parser.add_argument('--output-dir', type=str, default=None,
+                       help='Output directory (default: next to metrics file; '
+                            'one <run_id> subdirectory per run when rendering several)')
+    parser.add_argument('--time-to', type=float, default=None,
+                       help='Compare training time to this val accuracy instead of rendering reports')
+
+    args = parser.parse_args()
+
+    metrics_paths = [Path(p) for p in args.metrics]
+    if args.all:
+        metrics_paths += sorted(Path(args.runs_dir).glob(f'*/{METRICS_FILE}'))
+
+    if not metrics_paths:
+        print("❌ No metrics files given. Pass a metrics.npz path or --all.")
+        sys.exit(1)
+
+    if args.time_to is not None:
+        compare_time_to_accuracy(metrics_paths, args.time_to)
+        return
+
+    for metrics_path in metrics_paths:
+        output_dir = args.output_dir
+        if output_dir and len(metrics_paths) > 1:
+            # One subdirectory per run so reports don't overwrite each other
+            output_dir = Path(output_dir) / metrics_path.parent.name
+        render_report(metrics_path, output_dir=output_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Inference Runtimes
+==================
+One predict_batch() interface over the CPU runtimes the classifier can be
+exported to:
+
+    keras   .keras file or SavedModel directory, run by TensorFlow
+    tflite  .tflite file, TFLiteClassifier (XNNPACK delegate)
+    onnx    .onnx file, ONNX Runtime (CPUExecutionProvider)
+
+Every runtime takes batches from inference.preprocess_image(). Runtime
+packages are imported only when that runtime is loaded, so the TFLite
+path still does not need TensorFlow. Export the other formats with
+convert_to_tflite.py --saved-model / --onnx.
+
+The benchmark runs each runtime in its own subprocess on the validation
+split. It reports batch-1 latency, batched throughput, peak RSS, accuracy
+and top-1 agreement with the first runtime.
+
+Usage:
+    python convert_to_tflite.py --saved-model --onnx
+    python runtimes.py [--runtimes keras tflite onnx] [--dataset dataset] [--batch-size 32]
+    python serve.py --runtime onnx
+"""
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from pathlib import Path
+
+from inference import DEFAULT_MODEL_PATH, DEFAULT_LABELS_PATH, TFLiteClassifier, load_labels
+from prediction_cache import hash_file
+
+DEFAULT_ONNX_PATH = 'models/waste_classifier.onnx'
+RUNTIME_MODEL_PATHS = {
+    'keras': 'models/waste_classifier_best.keras',
+    'tflite': DEFAULT_MODEL_PATH,
+    'onnx': DEFAULT_ONNX_PATH
+}
+
+def hash_model(path):
+    """sha256 of a model file, or of every file in a SavedModel directory."""
+    path = Path(path)
+    if not path.is_dir():
+        return hash_file(path)
+    digest = hashlib.sha256()
+    for file in sorted(p for p in path.rglob('*') if p.is_file()):
+        digest.update(str(file.relative_to(path)).encode())
+        digest.update(hash_file(file).encode())
+    return digest.hexdigest()
+
+class KerasRuntime:
+    """Runs a .keras model, or a SavedModel exported with a `serve` endpoint."""
+
+    def __init__(self, model_path=RUNTIME_MODEL_PATHS['keras'], num_threads=None):
+        import tensorflow as tf
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                pass  # TensorFlow already initialized its thread pools
+
+        self.model_path = str(model_path)
+        if Path(model_path).is_dir():
+            # Keep the loaded object alive; `serve` only references its variables
+            self.model = tf.saved_model.load(self.model_path)
+            self._predict = self.model.serve
+            self.input_size = int(self._predict.input_signature[0].shape[1])
+        else:
+            self.model = tf.keras.models.load_model(self.model_path, compile=False)
+            self._predict = tf.function(lambda batch: self.model(batch, training=False), reduce_retracing=True)
+            self.input_size = int(self.model.input_shape[1])
+        self.model_hash = hash_model(model_path)
+        self.embedding_details = None
+
+    def predict_batch(self, batch):
+        return np.asarray(self._predict(np.asarray(batch, dtype=np.float32)))
+
+    def predict(self, image):
+        return self.predict_batch(image[np.newaxis])[0]
+
+class ONNXRuntime:
+    """Runs an ONNX export on ONNX Runtime's CPU execution provider."""
+
+    def __init__(self, model_path=DEFAULT_ONNX_PATH, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The onnx runtime needs ONNX Runtime: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model_path = str(model_path)
+        self.session = ort.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = int(model_input.shape[1])
+        self.model_hash = hash_file(model_path)
+        self.embedding_details = None
+
+    def predict_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+    def predict(self, image):
+        return self.predict_batch(image[np.newaxis])[0]
+
+RUNTIMES = {
+    'keras': KerasRuntime,
+    'tflite': TFLiteClassifier,
+    'onnx': ONNXRuntime
+}
+
+def load_runtime(runtime='tflite', model_path=None, num_threads=None):
+    """Load a model on the named runtime; model_path defaults to that runtime's export."""
+    return RUNTIMES[runtime](model_path or RUNTIME_MODEL_PATHS[runtime], num_threads=num_threads)
+
+def worker(runtime, model_path, data_path, scores_path, batch_size, latency_images, num_threads):
+    """Benchmark one runtime in this process on the saved validation images."""
+    from batch_tuner import peak_rss_mb
+
+    start = time.perf_counter()
+    model = load_runtime(runtime, model_path, num_threads)
+    load_s = time.perf_counter() - start
+
+    images = np.load(data_path)['images']
+    model.predict(images[0])
+    latencies = []
+    for image in images[:latency_images]:
+        tick = time.perf_counter()
+        model.predict(image)
+        latencies.append((time.perf_counter() - tick) * 1000)
+
+    tick = time.perf_counter()
+    scores = np.concatenate([
+        model.predict_batch(images[i:i + batch_size]) for i in range(0, len(images), batch_size)
+    ])
+    throughput = len(images) / (time.perf_counter() - tick)
+    np.save(scores_path, scores)
+
+    return {
+        'runtime': runtime,
+        'model': model.model_path,
+        'load_s': round(load_s, 3),
+        'latency_ms': round(float(np.mean(latencies)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'images_per_sec': round(throughput, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+def benchmark(runtimes, model_paths, images, labels, batch_size=32, latency_images=100, num_threads=None):
+    """Run every runtime in a subprocess; return per-runtime results with accuracy and agreement."""
+    results, reference = [], None
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(tmp) / 'validation.npz'
+        np.savez(data_path, images=images)
+        for runtime in runtimes:
+            scores_path = Path(tmp) / f'{runtime}.npy'
+            command = [sys.executable, str(Path(__file__).resolve()), '--worker', runtime,
+                       '--data', str(data_path), '--scores', str(scores_path),
+                       '--batch-size', str(batch_size), '--latency-images', str(latency_images)]
+            if model_paths.get(runtime):
+                command += ['--model', model_paths[runtime]]
+            if num_threads:
+                command += ['--threads', str(num_threads)]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                error = (process.stderr.strip().splitlines() or ['failed'])[-1]
+                results.append({'runtime': runtime, 'error': error})
+                continue
+
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            scores = np.load(scores_path)
+            predicted = np.argmax(scores, axis=1)
+            result['accuracy'] = float(np.mean(predicted == labels))
+            if reference is None:
+                reference = (runtime, predicted, scores)
+            result['agreement'] = float(np.mean(predicted == reference[1]))
+            result['max_score_diff'] = float(np.max(np.abs(scores - reference[2])))
+            results.append(result)
+    return results, reference[0] if reference else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare inference runtimes on the validation split')
+    parser.add_argument('--runtimes', nargs='+', default=list(RUNTIMES), choices=list(RUNTIMES),
+                       help='Runtimes to compare; the first is the parity reference')
+    parser.add_argument('--keras-model', type=str, default=None, help='.keras file or SavedModel directory')
+    parser.add_argument('--tflite-model', type=str, default=None, help='TFLite model')
+    parser.add_argument('--onnx-model', type=str, default=None, help='ONNX model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size for throughput')
+    parser.add_argument('--latency-images', type=int, default=100, help='Images timed one at a time')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads per runtime')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON')
+    parser.add_argument('--worker', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--model', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--data', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--scores', type=str, default=None, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.model, args.data, args.scores,
+                                args.batch_size, args.latency_images, args.threads)))
+        return
+
+    from cascade import load_validation_images
+
+    labels_list = load_labels(args.labels)
+    model_paths = {'keras': args.keras_model, 'tflite': args.tflite_model, 'onnx': args.onnx_model}
+    input_size = TFLiteClassifier(args.tflite_model or DEFAULT_MODEL_PATH).input_size
+
+    print(f"\n📂 Loading validation split from: {args.dataset}")
+    images, labels = load_validation_images(args.dataset, labels_list, input_size)
+    print(f"   {len(images)} images at {input_size}px")
+
+    results, reference = benchmark(args.runtimes, model_paths, images, labels,
+                                   args.batch_size, args.latency_images, args.threads)
+
+    print(f"\n⚖️  Runtimes (batch {args.batch_size} throughput, parity vs {reference}):")
+    print(f"   {'Runtime':8} {'Load s':>7} {'Latency ms':>11} {'p95 ms':>7} {'Images/s':>9} "
+          f"{'Peak RSS MB':>12} {'Accuracy':>9} {'Agreement':>10} {'Max diff':>9}")
+    for result in results:
+        if 'error' in result:
+            print(f"   {result['runtime']:8} ❌ {result['error']}")
+            continue
+        print(f"   {result['runtime']:8} {result['load_s']:>7.2f} {result['latency_ms']:>11.2f} "
+              f"{result['p95_ms']:>7.2f} {result['images_per_sec']:>9.1f} {result['peak_rss_mb']:>12.0f} "
+              f"{result['accuracy']:>9.4f} {result['agreement']:>10.1%} {result['max_score_diff']:>9.1e}")
+
+    working = [r for r in results if 'error' not in r]
+    if working:
+        fastest = max(working, key=lambda r: r['images_per_sec'])
+        print(f"\n🏁 Highest throughput: {fastest['runtime']} ({fastest['images_per_sec']:.1f} images/s)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'reference': reference, 'results': results}, f, indent=2)
+        print(f"✅ Results saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
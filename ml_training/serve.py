@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Waste Classifier Inference Server
+=================================
+Asyncio HTTP server around the TFLite model with dynamic micro-batching.
+Concurrent requests are collected into batches of up to --max-batch-size
+images, waiting at most --max-wait-ms for a batch to fill, and run on a
+pool of interpreters.
+
+Endpoints:
+    POST /classify            raw image bytes in the body → JSON prediction
+    POST /classify/accurate   same, scored with test-time augmentation (--tta-views views)
+    GET  /metrics    latency histograms, batch sizes, queue depth and cache stats (JSON)
+    GET  /drift      input drift scores against the training reference (--drift-reference)
+    GET  /health     liveness check
+
+Usage:
+    python serve.py [--port 8080] [--max-batch-size 8] [--max-wait-ms 5] [--workers 2]
+    python serve.py --cascade models/cascade_thresholds.json
+    python serve.py --runtime onnx [--model models/waste_classifier.onnx]
+    python serve.py --model models/waste_classifier_embedding.tflite --drift-reference models/drift_reference.npz
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from inference import (
+    DEFAULT_MODEL_PATH,
+    DEFAULT_LABELS_PATH,
+    load_labels,
+    preprocess_image
+)
+from prediction_cache import DEFAULT_CACHE_PATH, PredictionCache, hash_bytes
+from cascade import CascadeClassifier
+from runtimes import RUNTIME_MODEL_PATHS, RUNTIMES, load_runtime
+from tta import MAX_VIEWS, combine, make_views
+from drift import DEFAULT_WINDOW, DriftMonitor
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+
+class BadRequest(Exception):
+    """Raised for client errors such as undecodable images."""
+
+class Histogram:
+    """Fixed-bucket histogram with approximate percentiles."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = np.searchsorted(self.bounds, value)
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, q):
+        """Return the bucket upper bound containing the q-th percentile."""
+        if self.total == 0:
+            return 0.0
+        target = q / 100 * self.total
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        labels = [str(b) for b in self.bounds] + ['+Inf']
+        return {
+            'count': self.total,
+            'mean': self.sum / self.total if self.total else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+class MicroBatcher:
+    """Collects single-image requests into batches for an interpreter pool.
+
+    With a drift monitor, every batch is also sketched for drift scoring
+    (only the images submitted with track=True).
+    """
+
+    def __init__(self, model_path, max_batch_size=8, max_wait_ms=5.0, workers=2, num_threads=None,
+                 cascade_path=None, runtime='tflite', drift_monitor=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=workers * 2)
+        self.queue = asyncio.Queue()
+        self.pool = asyncio.Queue()
+        if cascade_path:
+            classifiers = [CascadeClassifier.from_file(cascade_path, num_threads) for _ in range(workers)]
+        else:
+            classifiers = [load_runtime(runtime, model_path, num_threads) for _ in range(workers)]
+        for classifier in classifiers:
+            self.pool.put_nowait(classifier)
+        self.classifiers = classifiers
+        self.input_size = classifiers[0].input_size
+        self.model_hash = getattr(classifiers[0], 'model_hash', None)
+        self.drift_monitor = drift_monitor
+
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS_MS)
+        self.inference = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def preprocess(self, data):
+        """Decode an encoded image off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, preprocess_image, data, self.input_size)
+
+    async def submit(self, image, track=True):
+        """Queue one preprocessed image and wait for its scores.
+
+        track=False keeps the image out of drift monitoring (e.g. augmented views).
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future, time.perf_counter(), track))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free interpreter first so batches keep filling while all are busy
+            classifier = await self.pool.get()
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Drain anything already queued without waiting
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            loop.create_task(self._run_batch(classifier, batch))
+
+    async def _run_batch(self, classifier, batch):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        for _, _, enqueued, _ in batch:
+            self.queue_wait.observe((start - enqueued) * 1000)
+
+        try:
+            images = np.stack([image for image, _, _, _ in batch])
+            if self.drift_monitor:
+                track = [tracked for _, _, _, tracked in batch]
+                scores = await loop.run_in_executor(
+                    self.executor, self.drift_monitor.predict_batch, classifier, images, track
+                )
+            else:
+                scores = await loop.run_in_executor(self.executor, classifier.predict_batch, images)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.pool.put_nowait(classifier)
+
+        self.inference.observe((time.perf_counter() - start) * 1000)
+        self.batch_sizes.observe(len(batch))
+        for (_, future, _, _), row in zip(batch, scores):
+            if not future.done():
+                future.set_result(row)
+
+    def metrics(self):
+        metrics = {
+            'queue_depth': self.queue.qsize(),
+            'idle_interpreters': self.pool.qsize(),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'latency_ms': self.latency.to_dict(),
+            'queue_wait_ms': self.queue_wait.to_dict(),
+            'inference_ms': self.inference.to_dict(),
+            'batch_size': self.batch_sizes.to_dict()
+        }
+        if isinstance(self.classifiers[0], CascadeClassifier):
+            images = sum(c.total for c in self.classifiers)
+            escalated = sum(c.escalated for c in self.classifiers)
+            metrics['cascade'] = {
+                'images': images,
+                'escalated': escalated,
+                'escalation_rate': escalated / images if images else 0.0
+            }
+        return metrics
+
+class InferenceServer:
+    """Minimal HTTP/1.1 front end (keep-alive aware) for a MicroBatcher."""
+
+    def __init__(self, batcher, labels, cache=None, tta_views=4):
+        self.batcher = batcher
+        self.labels = labels
+        self.cache = cache
+        self.tta_views = tta_views
+        # SQLite work stays off the event loop; one thread keeps it serialized
+        self.cache_executor = ThreadPoolExecutor(max_workers=1) if cache else None
+
+    async def classify(self, body, accurate=False):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        use_cache = self.cache and not accurate
+        image_hash = hash_bytes(body) if use_cache else None
+        scores = None
+        if use_cache:
+            scores = await loop.run_in_executor(self.cache_executor, self.cache.get, image_hash)
+
+        if scores is None:
+            try:
+                image = await self.batcher.preprocess(body)
+            except OSError as e:
+                raise BadRequest(f'cannot decode image: {e}')
+            if accurate:
+                # The views are queued together, so they share one batched invoke
+                views = make_views(image[np.newaxis], self.tta_views)
+                view_scores = await asyncio.gather(*(self.batcher.submit(view, track=False) for view in views))
+                scores = combine(np.stack(view_scores)[:, np.newaxis])[0]
+            else:
+                scores = await self.batcher.submit(image)
+            if use_cache:
+                # Not awaited: the response doesn't wait for the disk commit
+                loop.run_in_executor(self.cache_executor, self.cache.put, image_hash, scores)
+        self.batcher.latency.observe((time.perf_counter() - start) * 1000)
+
+        best = int(np.argmax(scores))
+        return {
+            'label': self.labels[best],
+            'confidence': float(scores[best]),
+            'scores': {label: float(s) for label, s in zip(self.labels, scores)}
+        }
+
+    async def route(self, method, path, body):
+        if method == 'POST' and path in ('/classify', '/classify/accurate'):
+            if not body:
+                return 400, {'error': 'empty body'}
+            try:
+                return 200, await self.classify(body, accurate=path == '/classify/accurate')
+            except BadRequest as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': str(e)}
+        if method == 'GET' and path == '/metrics':
+            metrics = self.batcher.metrics()
+            if self.cache:
+                metrics['cache'] = await asyncio.get_running_loop().run_in_executor(
+                    self.cache_executor, self.cache.stats
+                )
+            return 200, metrics
+        if method == 'GET' and path == '/drift':
+            if not self.batcher.drift_monitor:
+                return 404, {'error': 'drift monitoring is disabled; start with --drift-reference'}
+            return 200, self.batcher.drift_monitor.report()
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        return 404, {'error': 'not found'}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': 'body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.route(method, path, body)
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                data = json.dumps(payload).encode()
+                reason = HTTP_REASONS[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def start_server(
+    model_path=DEFAULT_MODEL_PATH,
+    labels_path=DEFAULT_LABELS_PATH,
+    host='127.0.0.1',
+    port=8080,
+    max_batch_size=8,
+    max_wait_ms=5.0,
+    workers=2,
+    num_threads=None,
+    cache_path=None,
+    cascade_path=None,
+    runtime='tflite',
+    tta_views=4,
+    drift_reference=None,
+    drift_window=DEFAULT_WINDOW
+):
+    """Start the server on the running event loop and return (server, batcher).
+
+    Pass cache_path to enable the prediction cache and cascade_path to
+    serve the small/full model cascade instead of model_path. `runtime`
+    selects the inference runtime (see runtimes.py) for model_path.
+    drift_reference enables drift monitoring over windows of drift_window
+    images.
+    """
+    batcher = MicroBatcher(
+        model_path,
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        workers=workers,
+        num_threads=num_threads,
+        cascade_path=cascade_path,
+        runtime=runtime,
+        drift_monitor=DriftMonitor(drift_reference, drift_window) if drift_reference else None
+    )
+    batcher.start()
+    cache = PredictionCache(model_path, cache_path, model_hash=batcher.model_hash) if cache_path else None
+    app = InferenceServer(batcher, load_labels(labels_path), cache, tta_views)
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    return server, batcher
+
+async def serve_forever(args):
+    server, _ = await start_server(
+        model_path=args.model,
+        labels_path=args.labels,
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        workers=args.workers,
+        num_threads=args.threads,
+        cache_path=None if args.no_cache else args.cache,
+        cascade_path=args.cascade,
+        runtime=args.runtime,
+        tta_views=args.tta_views,
+        drift_reference=args.drift_reference,
+        drift_window=args.drift_window
+    )
+    print(f"🚀 Serving {args.cascade or args.model} ({args.runtime}) on http://{args.host}:{args.port}")
+    print(f"   Max batch size: {args.max_batch_size}")
+    print(f"   Max wait:       {args.max_wait_ms} ms")
+    print(f"   Interpreters:   {args.workers}")
+    print(f"   Cache:          {'disabled' if args.no_cache else args.cache}")
+    print(f"   Drift monitor:  {args.drift_reference or 'disabled'}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the TFLite waste classifier over HTTP')
+    parser.add_argument('--model', type=str, default=None,
+                       help='Model for --runtime (default: models/waste_classifier.tflite for tflite)')
+    parser.add_argument('--runtime', type=str, default='tflite', choices=list(RUNTIMES),
+                       help='Inference runtime (compare them with runtimes.py)')
+    parser.add_argument('--tta-views', type=int, default=4, choices=range(1, MAX_VIEWS + 1),
+                       help='Augmented views per image for POST /classify/accurate')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH,
+                       help='Path to labels file')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8080, help='Port')
+    parser.add_argument('--max-batch-size', type=int, default=8,
+                       help='Maximum images per batched invoke')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                       help='Maximum time to wait for a batch to fill')
+    parser.add_argument('--workers', type=int, default=2,
+                       help='Number of interpreters in the pool')
+    parser.add_argument('--threads', type=int, default=None,
+                       help='Threads per interpreter')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_PATH,
+                       help='Prediction cache database')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Disable the prediction cache')
+    parser.add_argument('--cascade', type=str, default=None,
+                       help='Cascade thresholds file (small model first, full model on low confidence)')
+    parser.add_argument('--drift-reference', type=str, default=None,
+                       help='Drift reference profile (models/drift_reference.npz) to score traffic against')
+    parser.add_argument('--drift-window', type=int, default=DEFAULT_WINDOW,
+                       help='Images per drift scoring window')
+
+    args = parser.parse_args()
+    args.model = args.model or RUNTIME_MODEL_PATHS[args.runtime]
+
+    try:
+        asyncio.run(serve_forever(args))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+
+if __name__ == '__main__':
+    main()
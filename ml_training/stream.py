@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Stream Classification
+=====================
+Classifies a video file or an image sequence (a directory of frames or an
+animated GIF) frame by frame, as a sorting-line camera would deliver it.
+
+Consecutive camera frames are mostly identical, so each frame is first
+compared with the last classified frame on a small greyscale thumbnail.
+Unchanged frames reuse the previous prediction; changed frames are
+collected into batches for the interpreter. Per-frame predictions are
+then smoothed over time (exponential moving average of the scores, or a
+majority vote over the last few labels) so the reported class does not
+flicker.
+
+--compare also classifies every frame one at a time and reports effective
+FPS and CPU usage of both modes.
+
+Usage:
+    python stream.py clip.mp4 [--diff-threshold 0.02] [--smoothing ema] [--output stream.csv] [--compare]
+    python stream.py frames/ --compare
+
+Video files need OpenCV (pip install opencv-python); frame directories and
+GIFs only need Pillow.
+"""
+
+import csv
+import time
+import argparse
+import numpy as np
+from pathlib import Path
+from collections import Counter, deque
+from PIL import Image, ImageSequence
+
+from inference import (
+    DEFAULT_MODEL_PATH,
+    DEFAULT_LABELS_PATH,
+    TFLiteClassifier,
+    list_images,
+    load_labels,
+    preprocess_image
+)
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+DIFF_SIZE = 32
+
+def iter_frames(source):
+    """Yield RGB PIL frames from a video file, a GIF or a directory of images."""
+    source = Path(source)
+    if source.is_dir():
+        for path in list_images([source]):
+            with Image.open(path) as image:
+                yield image.convert('RGB')
+    elif source.suffix.lower() in VIDEO_EXTENSIONS:
+        try:
+            import cv2
+        except ImportError:
+            raise SystemExit("❌ Reading video files needs OpenCV: pip install opencv-python")
+        capture = cv2.VideoCapture(str(source))
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        finally:
+            capture.release()
+    else:
+        with Image.open(source) as image:
+            for frame in ImageSequence.Iterator(image):
+                yield frame.convert('RGB')
+
+class FrameDiffer:
+    """Decides whether a frame changed enough to be classified again.
+
+    Frames are compared on a DIFF_SIZE x DIFF_SIZE greyscale thumbnail
+    against the last frame that was classified (not the previous frame),
+    so slow drift still triggers a new classification eventually.
+    """
+
+    def __init__(self, threshold=0.02, max_skip=30):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.reference = None
+        self.skipped = 0
+
+    def changed(self, frame):
+        thumbnail = np.asarray(
+            frame.convert('L').resize((DIFF_SIZE, DIFF_SIZE), Image.BILINEAR), dtype=np.float32
+        ) / 255.0
+        if (self.reference is None or self.skipped >= self.max_skip
+                or np.mean(np.abs(thumbnail - self.reference)) > self.threshold):
+            self.reference = thumbnail
+            self.skipped = 0
+            return True
+        self.skipped += 1
+        return False
+
+class TemporalSmoother:
+    """EMA over class scores, or majority vote over the last `window` labels."""
+
+    def __init__(self, mode='ema', alpha=0.3, window=5):
+        self.mode = mode
+        self.alpha = alpha
+        self.ema = None
+        self.votes = deque(maxlen=window)
+
+    def update(self, scores):
+        """Add one frame's scores; return (label index, confidence) after smoothing."""
+        if self.mode == 'none':
+            best = int(np.argmax(scores))
+            return best, float(scores[best])
+
+        if self.mode == 'ema':
+            self.ema = scores.copy() if self.ema is None else \
+                self.alpha * scores + (1 - self.alpha) * self.ema
+            best = int(np.argmax(self.ema))
+            return best, float(self.ema[best])
+
+        self.votes.append(int(np.argmax(scores)))
+        best, count = Counter(self.votes).most_common(1)[0]
+        return best, count / len(self.votes)
+
+def classify_stream(frames, classifier, differ=None, smoother=None, batch_size=8,
+                    max_pending=30, max_wait_ms=100.0):
+    """Classify frames in order; yields (index, classified, raw scores, label, confidence).
+
+    Changed frames are buffered until `batch_size` of them are pending and
+    then run as one batch; unchanged frames take the scores of the last
+    changed frame before them. So that a live feed with few changes does
+    not hold results back, pending frames are also flushed once
+    `max_pending` frames are waiting for output or the oldest has waited
+    `max_wait_ms` (checked as each frame arrives).
+    """
+    smoother = smoother or TemporalSmoother('none')
+    pending, batch, last_scores = [], [], None
+    oldest = None
+
+    def flush():
+        nonlocal last_scores
+        scores = classifier.predict_batch(np.stack(batch)) if batch else []
+        results = iter(scores)
+        for index, classified in pending:
+            if classified:
+                last_scores = next(results)
+            label, confidence = smoother.update(last_scores)
+            yield index, classified, last_scores, label, confidence
+        pending.clear()
+        batch.clear()
+
+    for index, frame in enumerate(frames):
+        classified = differ is None or differ.changed(frame)
+        if classified:
+            batch.append(preprocess_image(frame, classifier.input_size))
+        if not pending:
+            oldest = time.perf_counter()
+        pending.append((index, classified))
+        if (len(batch) >= batch_size or len(pending) >= max_pending
+                or (time.perf_counter() - oldest) * 1000 >= max_wait_ms):
+            yield from flush()
+    yield from flush()
+
+def run_stream(source, classifier, **kwargs):
+    """Run classify_stream over a source and return (results, wall seconds, CPU seconds)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = list(classify_stream(iter_frames(source), classifier, **kwargs))
+    return results, time.perf_counter() - wall, time.process_time() - cpu
+
+def print_run(name, results, wall, cpu):
+    classified = sum(1 for r in results if r[1])
+    print(f"   {name:14} {len(results) / wall:8.1f} FPS   CPU {cpu / wall:6.1%} "
+          f"({cpu * 1000 / len(results):.2f} ms/frame)   classified {classified}/{len(results)} frames")
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify a video or frame sequence with frame skipping')
+    parser.add_argument('source', help='Video file, GIF or directory of frames')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH, help='Path to TFLite model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--diff-threshold', type=float, default=0.02,
+                       help='Mean absolute thumbnail difference that counts as a changed frame')
+    parser.add_argument('--max-skip', type=int, default=30,
+                       help='Reclassify at least every N frames even if nothing changed')
+    parser.add_argument('--batch-size', type=int, default=8, help='Changed frames per invoke')
+    parser.add_argument('--max-pending', type=int, default=30,
+                       help='Flush a partial batch once this many frames are waiting for output')
+    parser.add_argument('--max-wait-ms', type=float, default=100.0,
+                       help='Flush a partial batch once the oldest waiting frame is this old')
+    parser.add_argument('--smoothing', type=str, default='ema', choices=['ema', 'majority', 'none'],
+                       help='Temporal smoothing of per-frame predictions')
+    parser.add_argument('--alpha', type=float, default=0.3, help='EMA weight of the newest frame')
+    parser.add_argument('--window', type=int, default=5, help='Majority vote window (frames)')
+    parser.add_argument('--threads', type=int, default=None, help='Interpreter threads')
+    parser.add_argument('--output', type=str, default=None, help='Write per-frame predictions to CSV')
+    parser.add_argument('--compare', action='store_true',
+                       help='Also classify every frame individually and compare FPS and CPU')
+
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels)
+    classifier = TFLiteClassifier(args.model, num_threads=args.threads)
+
+    print(f"\n🎞️  Classifying stream: {args.source}")
+    results, wall, cpu = run_stream(
+        args.source,
+        classifier,
+        differ=FrameDiffer(args.diff_threshold, args.max_skip),
+        smoother=TemporalSmoother(args.smoothing, args.alpha, args.window),
+        batch_size=args.batch_size,
+        max_pending=args.max_pending,
+        max_wait_ms=args.max_wait_ms
+    )
+    if not results:
+        print("❌ No frames found.")
+        return
+
+    if args.compare:
+        baseline, base_wall, base_cpu = run_stream(args.source, classifier, batch_size=1)
+        agreement = np.mean([r[3] == b[3] for r, b in zip(results, baseline)])
+        print(f"\n📊 {len(results)} frames:")
+        print_run('every frame', baseline, base_wall, base_cpu)
+        print_run('stream mode', results, wall, cpu)
+        print(f"   Speed-up: {base_wall / wall:.2f}x   "
+              f"Label agreement with every-frame: {agreement:.1%}")
+    else:
+        print_run('stream mode', results, wall, cpu)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'classified', 'raw_label', 'raw_confidence', 'label', 'confidence'])
+            for index, classified, scores, label, confidence in results:
+                raw = int(np.argmax(scores))
+                writer.writerow([index, int(classified), labels[raw], f"{scores[raw]:.4f}",
+                                 labels[label], f"{confidence:.4f}"])
+        print(f"\n✅ Per-frame predictions saved to: {args.output}")
+
+    changes = [r for i, r in enumerate(results) if i == 0 or r[3] != results[i - 1][3]]
+    print("\n🏷️  Smoothed label timeline:")
+    for index, _, _, label, confidence in changes[:20]:
+        print(f"   frame {index:6}: {labels[label]} ({confidence:.2f})")
+    if len(changes) > 20:
+        print(f"   ... {len(changes) - 20} more changes")
+
+if __name__ == '__main__':
+    main()
@@ -13,13 +13,21 @@ Categories:
 
 Usage:
     python train_model.py [--epochs 50] [--batch_size 32]
+    python train_model.py --continue-from models/waste_classifier_best.keras [--epochs 10]
+    python train_model.py --batch_size 128 --accumulation-steps 4
+    python train_model.py --batch_size 128 --memory-budget-mb 6000
+    python train_model.py --progressive 128:8,160:8,192:8,224:26 [--target-accuracy 0.85]
+    python train_model.py --lr-schedule onecycle [--max-lr 0.001] [--target-accuracy 0.85]
 """
 
 import os
 import sys
+import math
+import time
 import argparse
+import subprocess
 import numpy as np
-import matplotlib.pyplot as plt
+import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
@@ -35,17 +43,33 @@ from tensorflow.keras.callbacks import (
     ReduceLROnPlateau,
     TensorBoard
 )
-from sklearn.metrics import classification_report, confusion_matrix
-import seaborn as sns
+
+from report import save_run_metrics, time_to_accuracy, RUNS_DIR
+from drift import DEFAULT_REFERENCE_PATH, profile_keras_model
+from lr_schedule import SCHEDULES, ScheduledLearningRate, lr_range_test, save_range_test
+from dataset_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    build_manifest,
+    diff_manifests,
+    load_manifest,
+    manifest_hash,
+    save_manifest,
+    split_manifest
+)
+from model_registry import ModelRegistry
+from prediction_cache import hash_file
+from rehearsal_buffer import DEFAULT_BUFFER_PATH, RehearsalBuffer
 
 # Constants
 IMG_SIZE = 224
 CLASSES = ['organic', 'recyclable', 'hazardous', 'ewaste', 'general']
 NUM_CLASSES = len(CLASSES)
+BEST_MODEL_PATH = 'models/waste_classifier_best.keras'
+LABELS_PATH = 'models/waste_labels.txt'
 
-def create_dataset_structure():
+def create_dataset_structure(dataset_dir='dataset'):
     """Create dataset directory structure if it doesn't exist."""
-    dataset_dir = Path('dataset')
+    dataset_dir = Path(dataset_dir)
     
     for class_name in CLASSES:
         class_dir = dataset_dir / class_name
@@ -109,14 +133,14 @@ def count_images(dataset_dir):
     
     return counts, total
 
-def create_model(num_classes, fine_tune_layers=50):
+def create_model(num_classes, fine_tune_layers=50, img_size=IMG_SIZE, weights='imagenet'):
     """Create MobileNetV2-based transfer learning model."""
     
     # Load pre-trained MobileNetV2
     base_model = MobileNetV2(
-        weights='imagenet',
+        weights=weights,
         include_top=False,
-        input_shape=(IMG_SIZE, IMG_SIZE, 3)
+        input_shape=(img_size, img_size, 3)
     )
     
     # Freeze base model layers (except last few for fine-tuning)
@@ -126,7 +150,7 @@ def create_model(num_classes, fine_tune_layers=50):
     # Create model
     model = keras.Sequential([
         # Input preprocessing
-        layers.Rescaling(1./255, input_shape=(IMG_SIZE, IMG_SIZE, 3)),
+        layers.Rescaling(1./255, input_shape=(img_size, img_size, 3)),
         
         # Data augmentation (only during training)
         layers.RandomFlip("horizontal"),
@@ -151,8 +175,104 @@ def create_model(num_classes, fine_tune_layers=50):
     
     return model
 
-def create_data_generators(dataset_dir, batch_size, validation_split=0.2):
-    """Create training and validation data generators."""
+def resize_model(model, img_size):
+    """Rebuild the model for another input size, keeping its trained weights.
+    
+    MobileNetV2 is fully convolutional up to GlobalAveragePooling2D, so
+    every weight has the same shape at any input size.
+    """
+    resized = create_model(NUM_CLASSES, img_size=img_size, weights=None)
+    resized.set_weights(model.get_weights())
+    return resized
+
+def parse_schedule(text, epochs):
+    """Parse a progressive-resizing schedule into [(img_size, epochs), ...].
+    
+    Accepts '128:8,160:8,224:34', or sizes only ('128,160,192,224'), in
+    which case each lower-resolution phase gets 15% of `epochs` and the
+    last phase gets the rest. The last size must be IMG_SIZE, the size
+    the model is exported at.
+    """
+    items = [item.strip() for item in text.split(',') if item.strip()]
+    if all(':' in item for item in items):
+        schedule = [tuple(int(v) for v in item.split(':')) for item in items]
+    else:
+        sizes = [int(item) for item in items]
+        early = max(1, int(epochs * 0.15))
+        schedule = [(size, early) for size in sizes[:-1]]
+        schedule.append((sizes[-1], max(1, epochs - early * len(schedule))))
+    
+    if schedule[-1][0] != IMG_SIZE:
+        raise SystemExit(f"❌ Progressive schedule must end at {IMG_SIZE}px, got {schedule[-1][0]}px")
+    return schedule
+
+def scaled_batch_size(batch_size, img_size):
+    """Batch size with the same pixels per batch as batch_size at IMG_SIZE."""
+    return max(batch_size, int(batch_size * (IMG_SIZE / img_size) ** 2))
+
+class EpochTimer(keras.callbacks.Callback):
+    """Adds cumulative wall time and the input size to each epoch's logs.
+    
+    Keeps counting across several fit() calls, so a progressive schedule
+    reports the time since its first phase started.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.start = None
+        self.img_size = IMG_SIZE
+    
+    def on_train_begin(self, logs=None):
+        if self.start is None:
+            self.start = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        if logs is not None:
+            logs['elapsed_s'] = time.perf_counter() - self.start
+            logs['img_size'] = self.img_size
+
+def make_optimizer(learning_rate, accumulation_steps=1):
+    """Adam, accumulating gradients over `accumulation_steps` micro-batches.
+    
+    With accumulation the weights are updated once per
+    accumulation_steps batches, using the averaged gradients, so the
+    effective batch size is batch_size x accumulation_steps.
+    """
+    if accumulation_steps <= 1:
+        return keras.optimizers.Adam(learning_rate=learning_rate)
+    try:
+        return keras.optimizers.Adam(
+            learning_rate=learning_rate,
+            gradient_accumulation_steps=accumulation_steps
+        )
+    except (TypeError, ValueError):
+        raise SystemExit("❌ Gradient accumulation needs Keras 3 (TensorFlow 2.16 or newer)")
+
+def create_data_generators(
+    dataset_dir,
+    batch_size,
+    validation_split=0.2,
+    manifest=None,
+    train_files=None,
+    img_size=IMG_SIZE
+):
+    """Create training and validation data generators.
+    
+    The train/validation split comes from the dataset manifest's content
+    hashes, so it stays stable as images are added. `train_files`
+    overrides the training subset (used by incremental fine-tuning).
+    """
+    if manifest is None:
+        manifest = build_manifest(dataset_dir, CLASSES)
+    train_split, val_files = split_manifest(manifest, validation_split)
+    if train_files is None:
+        train_files = train_split
+    
+    def to_frame(files):
+        return pd.DataFrame({
+            'filename': files,
+            'class': [manifest['files'][f]['class'] for f in files]
+        })
     
     # Data augmentation for training
     train_datagen = ImageDataGenerator(
@@ -163,35 +283,35 @@ def create_data_generators(dataset_dir, batch_size, validation_split=0.2):
         shear_range=0.2,
         zoom_range=0.2,
         horizontal_flip=True,
-        fill_mode='nearest',
-        validation_split=validation_split
+        fill_mode='nearest'
     )
     
     # Only rescaling for validation
-    val_datagen = ImageDataGenerator(
-        rescale=1./255,
-        validation_split=validation_split
-    )
+    val_datagen = ImageDataGenerator(rescale=1./255)
     
     print(f"\n📂 Loading images from: {dataset_dir}")
     
-    train_generator = train_datagen.flow_from_directory(
-        dataset_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
+    train_generator = train_datagen.flow_from_dataframe(
+        to_frame(train_files),
+        directory=str(dataset_dir),
+        x_col='filename',
+        y_col='class',
+        target_size=(img_size, img_size),
         batch_size=batch_size,
         class_mode='categorical',
         classes=CLASSES,
-        subset='training',
         shuffle=True
     )
     
-    val_generator = val_datagen.flow_from_directory(
-        dataset_dir,
-        target_size=(IMG_SIZE, IMG_SIZE),
+    val_generator = val_datagen.flow_from_dataframe(
+        to_frame(val_files),
+        directory=str(dataset_dir),
+        x_col='filename',
+        y_col='class',
+        target_size=(img_size, img_size),
         batch_size=batch_size,
         class_mode='categorical',
         classes=CLASSES,
-        subset='validation',
         shuffle=False
     )
     
@@ -200,63 +320,120 @@ def create_data_generators(dataset_dir, batch_size, validation_split=0.2):
     
     return train_generator, val_generator
 
-def plot_training_history(history, save_path='models/training_history.png'):
-    """Plot and save training history."""
-    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-    
-    # Accuracy plot
-    axes[0].plot(history.history['accuracy'], label='Training')
-    axes[0].plot(history.history['val_accuracy'], label='Validation')
-    axes[0].set_title('Model Accuracy')
-    axes[0].set_xlabel('Epoch')
-    axes[0].set_ylabel('Accuracy')
-    axes[0].legend()
-    axes[0].grid(True)
-    
-    # Loss plot
-    axes[1].plot(history.history['loss'], label='Training')
-    axes[1].plot(history.history['val_loss'], label='Validation')
-    axes[1].set_title('Model Loss')
-    axes[1].set_xlabel('Epoch')
-    axes[1].set_ylabel('Loss')
-    axes[1].legend()
-    axes[1].grid(True)
-    
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=150)
-    print(f"📊 Training history saved to: {save_path}")
-    plt.close()
+def launch_report(metrics_path, mode='background'):
+    """Render plots and the HTML report outside the training process.
+
+    'background' starts report.py in a detached process so training can
+    exit (and release TensorFlow memory) while the plots are drawn.
+    'later' only prints the command for rendering on demand.
+    """
+    command = [sys.executable, str(Path(__file__).with_name('report.py')), str(metrics_path)]
+    
+    if mode == 'background':
+        run_dir = Path(metrics_path).parent
+        with open(run_dir / 'report.log', 'w') as log_file:
+            subprocess.Popen(
+                command,
+                stdout=log_file,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        print(f"📊 Rendering report in background: {run_dir / 'report.html'}")
+    else:
+        print(f"📊 Render report later with:")
+        print(f"   python report.py {metrics_path}")
 
-def plot_confusion_matrix(y_true, y_pred, save_path='models/confusion_matrix.png'):
-    """Plot and save confusion matrix."""
-    cm = confusion_matrix(y_true, y_pred)
-    
-    plt.figure(figsize=(10, 8))
-    sns.heatmap(
-        cm, 
-        annot=True, 
-        fmt='d', 
-        cmap='Blues',
-        xticklabels=CLASSES,
-        yticklabels=CLASSES
+def evaluate_and_save(model, history, val_gen, run_id, report='background', extra=None):
+    """Evaluate on the validation set and save metrics, report, labels and drift reference.
+    
+    The validation pass also sketches the images for drift monitoring
+    (drift.py), from the same forward pass.
+    """
+    print("\n📊 Evaluating model...")
+    predictions, reference = profile_keras_model(model, val_gen)
+    y_pred = np.argmax(predictions, axis=1)
+    y_true = val_gen.classes
+    print(f"   Validation accuracy: {np.mean(y_pred == y_true):.4f}")
+    reference.save(DEFAULT_REFERENCE_PATH, source=BEST_MODEL_PATH, split='validation', run_id=run_id)
+    print(f"✅ Drift reference saved to: {DEFAULT_REFERENCE_PATH}")
+    
+    # Save raw metrics; plots and reports are rendered by report.py
+    metrics_path = save_run_metrics(
+        Path(RUNS_DIR) / run_id,
+        history.history,
+        y_true,
+        y_pred,
+        predictions,
+        CLASSES,
+        filenames=val_gen.filenames,
+        **(extra or {})
     )
-    plt.title('Confusion Matrix')
-    plt.xlabel('Predicted')
-    plt.ylabel('True')
-    plt.tight_layout()
-    plt.savefig(save_path, dpi=150)
-    print(f"📊 Confusion matrix saved to: {save_path}")
-    plt.close()
+    print(f"✅ Metrics saved to: {metrics_path}")
+    launch_report(metrics_path, mode=report)
+    save_labels()
+
+def save_labels(labels_path=LABELS_PATH):
+    """Write the class labels, one per line."""
+    with open(labels_path, 'w') as f:
+        for label in CLASSES:
+            f.write(f"{label}\n")
+    print(f"✅ Labels saved to: {labels_path}")
 
-def train(epochs=50, batch_size=32, dataset_dir='dataset'):
-    """Main training function."""
+def reuse_cached_model(registry, inputs, manifest, force=False):
+    """Restore the model built from identical inputs, if there is one."""
+    key, record = registry.lookup('train', inputs)
+    if record is None:
+        return key, False
+    if force:
+        print(f"\n🔁 Inputs match build {key[:12]}; retraining because of --force")
+        return key, False
+    
+    registry.restore(record, 'model', BEST_MODEL_PATH)
+    registry.restore(record, 'labels', LABELS_PATH)
+    save_manifest(manifest)
+    print(f"\n♻️  Inputs unchanged since build {key[:12]} ({record['created'][:19]})")
+    print(f"   Reused cached model: {BEST_MODEL_PATH}")
+    print("   Pass --force to retrain anyway.")
+    return key, True
+
+def train(
+    epochs=50,
+    batch_size=32,
+    dataset_dir='dataset',
+    report='background',
+    rehearsal_size=200,
+    force=False,
+    accumulation_steps=1,
+    progressive=None,
+    target_accuracy=None,
+    lr_schedule='plateau',
+    max_lr=None,
+    find_lr=False
+):
+    """Main training function.
+    
+    `batch_size` is the effective batch size; with accumulation_steps > 1
+    each step loads a micro-batch of batch_size / accumulation_steps.
+    
+    `progressive` is a schedule from parse_schedule(): the model is
+    trained at each lower resolution in turn (with proportionally larger
+    batches), then at IMG_SIZE with the usual callbacks.
+    
+    `lr_schedule` is 'plateau' (fixed learning rate halved by
+    ReduceLROnPlateau) or a per-step 'onecycle' / 'cosine' schedule
+    peaking at `max_lr`. Without max_lr (or with find_lr) a range test
+    picks it first.
+    """
+    schedule = progressive or [(IMG_SIZE, epochs)]
+    epochs = sum(phase_epochs for _, phase_epochs in schedule)
+    find_lr = find_lr or (lr_schedule != 'plateau' and max_lr is None)
     
     print("\n" + "="*60)
     print("🗑️  WASTE CLASSIFIER MODEL TRAINING")
     print("="*60)
     
     # Create dataset structure
-    dataset_path = create_dataset_structure()
+    dataset_path = create_dataset_structure(dataset_dir)
     
     # Count images
     counts, total = count_images(dataset_path)
@@ -281,25 +458,101 @@ def train(epochs=50, batch_size=32, dataset_dir='dataset'):
     models_dir.mkdir(exist_ok=True)
     
     # Create data generators
-    train_gen, val_gen = create_data_generators(dataset_path, batch_size)
+    manifest = build_manifest(dataset_path, CLASSES, previous=load_manifest())
+    
+    # Skip training if this dataset + config has already been built
+    registry = ModelRegistry()
+    build_inputs = {
+        'mode': 'full',
+        'dataset_sha256': manifest_hash(manifest),
+        'hyperparameters': {
+            'epochs': epochs,
+            'batch_size': batch_size,
+            'accumulation_steps': accumulation_steps,
+            'img_size': IMG_SIZE,
+            'schedule': schedule,
+            'classes': CLASSES,
+            'learning_rate': 'find' if find_lr else (max_lr or 0.0001),
+            'lr_schedule': lr_schedule,
+            'validation_split': 0.2
+        }
+    }
+    build_key, reused = reuse_cached_model(registry, build_inputs, manifest, force)
+    if reused:
+        return
+    
+    # Learning-rate range test on a throwaway model
+    learning_rate = max_lr or 0.0001
+    finder_s = 0.0
+    if find_lr:
+        finder_train, _ = create_data_generators(
+            dataset_path,
+            math.ceil(batch_size / accumulation_steps),
+            manifest=manifest
+        )
+        found = lr_range_test(create_model(NUM_CLASSES), finder_train)
+        save_range_test(found)
+        learning_rate, finder_s = found['suggested_lr'], found['elapsed_s']
+        keras.backend.clear_session()
+    scheduler = ScheduledLearningRate(lr_schedule, learning_rate, epochs) if lr_schedule != 'plateau' else None
+    
+    timer = EpochTimer()
+    warmup_history = {}
+    initial_epoch = 0
+    model = None
+    
+    # Progressive resizing: cheaper low-resolution phases before full size
+    for img_size, phase_epochs in schedule[:-1]:
+        phase_batch = scaled_batch_size(batch_size, img_size)
+        print(f"\n📐 Progressive phase: {img_size}px, {phase_epochs} epochs, batch {phase_batch}")
+        model = create_model(NUM_CLASSES, img_size=img_size) if model is None else resize_model(model, img_size)
+        model.compile(
+            optimizer=make_optimizer(learning_rate, accumulation_steps),
+            loss='categorical_crossentropy',
+            metrics=['accuracy']
+        )
+        phase_train, phase_val = create_data_generators(
+            dataset_path,
+            math.ceil(phase_batch / accumulation_steps),
+            manifest=manifest,
+            img_size=img_size
+        )
+        timer.img_size = img_size
+        phase = model.fit(
+            phase_train,
+            epochs=initial_epoch + phase_epochs,
+            initial_epoch=initial_epoch,
+            validation_data=phase_val,
+            callbacks=[timer] + ([scheduler] if scheduler else []),
+            verbose=1
+        )
+        for key, values in phase.history.items():
+            warmup_history.setdefault(key, []).extend(values)
+        initial_epoch += phase_epochs
+    
+    micro_batch = math.ceil(batch_size / accumulation_steps)
+    train_gen, val_gen = create_data_generators(dataset_path, micro_batch, manifest=manifest)
     
     # Create model
     print("\n🔧 Creating model...")
-    model = create_model(NUM_CLASSES)
+    model = create_model(NUM_CLASSES) if model is None else resize_model(model, IMG_SIZE)
+    timer.img_size = IMG_SIZE
     
     # Compile model
     model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=0.0001),
+        optimizer=make_optimizer(learning_rate, accumulation_steps),
         loss='categorical_crossentropy',
         metrics=['accuracy']
     )
     
     model.summary()
     
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    
     # Callbacks
     callbacks = [
         ModelCheckpoint(
-            'models/waste_classifier_best.keras',
+            BEST_MODEL_PATH,
             monitor='val_accuracy',
             save_best_only=True,
             mode='max',
@@ -311,59 +564,81 @@ def train(epochs=50, batch_size=32, dataset_dir='dataset'):
             restore_best_weights=True,
             verbose=1
         ),
-        ReduceLROnPlateau(
+        TensorBoard(
+            log_dir=f'logs/{run_id}',
+            histogram_freq=1
+        ),
+        timer
+    ]
+    if scheduler:
+        callbacks.append(scheduler)
+    else:
+        callbacks.append(ReduceLROnPlateau(
             monitor='val_loss',
             factor=0.5,
             patience=5,
             min_lr=1e-7,
             verbose=1
-        ),
-        TensorBoard(
-            log_dir=f'logs/{datetime.now().strftime("%Y%m%d-%H%M%S")}',
-            histogram_freq=1
-        )
-    ]
+        ))
     
     # Train
     print("\n🚀 Starting training...")
     print(f"   Epochs: {epochs}")
     print(f"   Batch size: {batch_size}")
+    if accumulation_steps > 1:
+        print(f"   Micro-batch: {micro_batch} x {accumulation_steps} accumulation steps")
+    if progressive:
+        print(f"   Schedule: {', '.join(f'{size}px x {n}' for size, n in schedule)}")
+    print(f"   Learning rate: {lr_schedule}, {'max ' if scheduler else ''}{learning_rate:.2e}")
     print(f"   Classes: {CLASSES}")
     
     history = model.fit(
         train_gen,
         epochs=epochs,
+        initial_epoch=initial_epoch,
         validation_data=val_gen,
         callbacks=callbacks,
         verbose=1
     )
     
+    # Prepend the low-resolution phases so the report covers the whole run
+    if warmup_history:
+        for key, values in history.history.items():
+            history.history[key] = warmup_history.get(key, [float('nan')] * initial_epoch) + list(values)
+    
+    print(f"\n⏱️  Training time: {history.history['elapsed_s'][-1]:.0f}s"
+          + (f" (+ {finder_s:.0f}s learning-rate range test)" if finder_s else ""))
+    if target_accuracy:
+        reached = time_to_accuracy(history.history, target_accuracy)
+        if reached:
+            print(f"   Reached {target_accuracy:.2f} val accuracy after {reached[1]:.0f}s (epoch {reached[0]})")
+        else:
+            print(f"   Did not reach {target_accuracy:.2f} val accuracy")
+    
     # Save final model
     model.save('models/waste_classifier_final.keras')
     print("\n✅ Model saved to: models/waste_classifier_final.keras")
     
-    # Plot training history
-    plot_training_history(history)
-    
-    # Evaluate on validation set
-    print("\n📊 Evaluating model...")
-    val_gen.reset()
-    predictions = model.predict(val_gen, verbose=1)
-    y_pred = np.argmax(predictions, axis=1)
-    y_true = val_gen.classes
-    
-    # Classification report
-    print("\n📋 Classification Report:")
-    print(classification_report(y_true, y_pred, target_names=CLASSES))
-    
-    # Confusion matrix
-    plot_confusion_matrix(y_true, y_pred)
-    
-    # Save labels
-    with open('models/waste_labels.txt', 'w') as f:
-        for label in CLASSES:
-            f.write(f"{label}\n")
-    print("✅ Labels saved to: models/waste_labels.txt")
+    extra = {
+        'schedule': ','.join(f'{size}:{n}' for size, n in schedule),
+        'lr_schedule': lr_schedule,
+        'max_lr': learning_rate,
+        'lr_finder_s': finder_s
+    }
+    if target_accuracy:
+        extra['target_accuracy'] = target_accuracy
+    evaluate_and_save(model, history, val_gen, run_id, report, extra)
+    registry.store('train', build_key, build_inputs, {
+        'model': BEST_MODEL_PATH,
+        'labels': LABELS_PATH
+    }, {'run_id': run_id})
+    
+    # Record the dataset this model was trained on for incremental runs
+    save_manifest(manifest)
+    buffer = RehearsalBuffer(rehearsal_size)
+    buffer.extend(split_manifest(manifest)[0], manifest)
+    buffer.save()
+    print(f"✅ Dataset manifest saved to: {DEFAULT_MANIFEST_PATH}")
     
     print("\n" + "="*60)
     print("✅ TRAINING COMPLETE!")
@@ -374,7 +649,159 @@ def train(epochs=50, batch_size=32, dataset_dir='dataset'):
     
     return model, history
 
-def create_synthetic_dataset(dataset_dir, samples_per_class=100):
+def train_incremental(
+    continue_from,
+    epochs=10,
+    batch_size=32,
+    dataset_dir='dataset',
+    report='background',
+    rehearsal_size=200,
+    learning_rate=1e-5,
+    force=False,
+    accumulation_steps=1
+):
+    """Fine-tune an existing model on images added since the last run.
+    
+    Trains on the new/changed training images plus a reservoir-sampled
+    rehearsal buffer of older ones, and stops early on the (full)
+    validation split.
+    """
+    
+    print("\n" + "="*60)
+    print("🔁 INCREMENTAL FINE-TUNING")
+    print("="*60)
+    
+    previous = load_manifest()
+    if previous is None:
+        print(f"❌ No dataset manifest found at {DEFAULT_MANIFEST_PATH}")
+        print("Run a full training first: python train_model.py")
+        return
+    
+    manifest = build_manifest(dataset_dir, CLASSES, previous=previous)
+    changed, removed = diff_manifests(previous, manifest)
+    train_split, val_split = split_manifest(manifest)
+    train_set = set(train_split)
+    new_train = [f for f in changed if f in train_set]
+    
+    print(f"\n📋 Since last run: {len(changed)} added/changed, {len(removed)} removed")
+    print(f"   New training images:   {len(new_train)}")
+    print(f"   New validation images: {len(changed) - len(new_train)}")
+    
+    if not new_train:
+        print("\n✅ No new training images; model is up to date.")
+        return
+    
+    registry = ModelRegistry()
+    build_inputs = {
+        'mode': 'incremental',
+        'dataset_sha256': manifest_hash(manifest),
+        'source_sha256': hash_file(continue_from),
+        'hyperparameters': {
+            'epochs': epochs,
+            'batch_size': batch_size,
+            'accumulation_steps': accumulation_steps,
+            'img_size': IMG_SIZE,
+            'classes': CLASSES,
+            'learning_rate': learning_rate,
+            'rehearsal_size': rehearsal_size
+        }
+    }
+    build_key, reused = reuse_cached_model(registry, build_inputs, manifest, force)
+    if reused:
+        return
+    
+    # Rehearsal buffer of older training images
+    buffer = RehearsalBuffer.load(capacity_per_class=rehearsal_size)
+    if buffer is None:
+        buffer = RehearsalBuffer(rehearsal_size)
+        buffer.extend([f for f in split_manifest(previous)[0] if f in train_set], manifest)
+    buffer.prune(manifest)
+    rehearsal = buffer.sample(exclude=changed)
+    print(f"   Rehearsal images:      {len(rehearsal)}")
+    
+    train_gen, val_gen = create_data_generators(
+        dataset_dir,
+        math.ceil(batch_size / accumulation_steps),
+        manifest=manifest,
+        train_files=new_train + rehearsal
+    )
+    
+    print(f"\n📂 Loading model: {continue_from}")
+    model = keras.models.load_model(continue_from)
+    model.compile(
+        optimizer=make_optimizer(learning_rate, accumulation_steps),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    # Only replace the best model if fine-tuning actually improves on it
+    _, baseline_accuracy = model.evaluate(val_gen, verbose=0)
+    print(f"   Baseline val accuracy: {baseline_accuracy:.4f}")
+    
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+    callbacks = [
+        ModelCheckpoint(
+            BEST_MODEL_PATH,
+            monitor='val_accuracy',
+            save_best_only=True,
+            mode='max',
+            initial_value_threshold=baseline_accuracy,
+            verbose=1
+        ),
+        EarlyStopping(
+            monitor='val_loss',
+            patience=3,
+            restore_best_weights=True,
+            verbose=1
+        ),
+        TensorBoard(log_dir=f'logs/{run_id}')
+    ]
+    
+    print("\n🚀 Starting fine-tuning...")
+    print(f"   Epochs: {epochs}")
+    print(f"   Learning rate: {learning_rate}")
+    
+    history = model.fit(
+        train_gen,
+        epochs=epochs,
+        validation_data=val_gen,
+        callbacks=callbacks,
+        verbose=1
+    )
+    
+    # The checkpoint only replaced BEST_MODEL_PATH if val accuracy beat the baseline
+    best_accuracy = max(history.history.get('val_accuracy', [0.0]))
+    if best_accuracy <= baseline_accuracy:
+        print(f"\n⚠️  Fine-tuning did not improve on the baseline "
+              f"({best_accuracy:.4f} <= {baseline_accuracy:.4f}); {BEST_MODEL_PATH} and "
+              f"models/waste_classifier_final.keras are unchanged.")
+        print("   Skipping the report, drift reference and registry entry. The dataset manifest")
+        print("   and rehearsal buffer are not updated, so the next run retries these images.")
+        return model, history
+    
+    model.save('models/waste_classifier_final.keras')
+    print("\n✅ Model saved to: models/waste_classifier_final.keras")
+    
+    # Report on the checkpointed model, which is what BEST_MODEL_PATH now holds
+    model = keras.models.load_model(BEST_MODEL_PATH)
+    evaluate_and_save(model, history, val_gen, run_id, report)
+    registry.store('train', build_key, build_inputs, {
+        'model': BEST_MODEL_PATH,
+        'labels': LABELS_PATH
+    }, {'run_id': run_id})
+    
+    save_manifest(manifest)
+    buffer.extend(new_train, manifest)
+    buffer.save()
+    print(f"✅ Dataset manifest and rehearsal buffer ({DEFAULT_BUFFER_PATH}) updated")
+    
+    print("\n" + "="*60)
+    print("✅ FINE-TUNING COMPLETE!")
+    print("="*60)
+    
+    return model, history
+
+def create_synthetic_dataset(dataset_dir, samples_per_class=100, img_size=IMG_SIZE):
     """Create synthetic dataset for testing (colored rectangles)."""
     from PIL import Image
     import random
@@ -396,13 +823,13 @@ def create_synthetic_dataset(dataset_dir, samples_per_class=100):
         
         for i in range(samples_per_class):
             # Create image with random noise and class colors
-            img = Image.new('RGB', (IMG_SIZE, IMG_SIZE))
+            img = Image.new('RGB', (img_size, img_size))
             pixels = img.load()
             
             base_color = random.choice(colors)
             
-            for x in range(IMG_SIZE):
-                for y in range(IMG_SIZE):
+            for x in range(img_size):
+                for y in range(img_size):
                     # Add noise
                     noise = random.randint(-30, 30)
                     r = max(0, min(255, base_color[0] + noise + random.randint(-20, 20)))
@@ -418,9 +845,35 @@ def create_synthetic_dataset(dataset_dir, samples_per_class=100):
 
 def main():
     parser = argparse.ArgumentParser(description='Train Waste Classifier Model')
-    parser.add_argument('--epochs', type=int, default=50, help='Number of training epochs')
-    parser.add_argument('--batch_size', type=int, default=32, help='Batch size')
+    parser.add_argument('--epochs', type=int, default=None,
+                       help='Number of training epochs (default: 50, or 10 with --continue-from)')
+    parser.add_argument('--batch_size', type=int, default=32,
+                       help='Effective batch size (split into micro-batches with accumulation)')
+    parser.add_argument('--accumulation-steps', type=int, default=1,
+                       help='Accumulate gradients over this many micro-batches per update')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                       help='Pick the micro-batch and accumulation steps that fit this peak RSS')
+    parser.add_argument('--progressive', type=str, default=None,
+                       help='Progressive resizing schedule, e.g. 128:8,160:8,192:8,224:26 or 128,160,192,224')
+    parser.add_argument('--target-accuracy', type=float, default=None,
+                       help='Report the training time needed to reach this val accuracy')
+    parser.add_argument('--lr-schedule', type=str, default='plateau', choices=SCHEDULES,
+                       help='Fixed LR with ReduceLROnPlateau, one-cycle, or cosine with warm-up')
+    parser.add_argument('--max-lr', type=float, default=None,
+                       help='Peak learning rate (default: found by a range test for onecycle/cosine)')
+    parser.add_argument('--find-lr', action='store_true',
+                       help='Run the learning-rate range test before training')
     parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--report', type=str, default='background', choices=['background', 'later'],
+                       help='Render plots/report in a background process or later on demand')
+    parser.add_argument('--continue-from', type=str, default=None,
+                       help='Fine-tune this model on images added since the last run')
+    parser.add_argument('--rehearsal-size', type=int, default=200,
+                       help='Rehearsal buffer images per class for incremental runs')
+    parser.add_argument('--learning-rate', type=float, default=1e-5,
+                       help='Learning rate for incremental runs')
+    parser.add_argument('--force', action='store_true',
+                       help='Train even if the registry has a model built from the same inputs')
     
     args = parser.parse_args()
     
@@ -428,10 +881,37 @@ def main():
     print(f"TensorFlow version: {tf.__version__}")
     print(f"GPU available: {len(tf.config.list_physical_devices('GPU')) > 0}")
     
+    if args.memory_budget_mb:
+        from batch_tuner import autotune
+        _, args.accumulation_steps = autotune(args.batch_size, args.memory_budget_mb, IMG_SIZE)
+    
+    if args.continue_from:
+        train_incremental(
+            args.continue_from,
+            epochs=args.epochs or 10,
+            batch_size=args.batch_size,
+            dataset_dir=args.dataset,
+            report=args.report,
+            rehearsal_size=args.rehearsal_size,
+            learning_rate=args.learning_rate,
+            force=args.force,
+            accumulation_steps=args.accumulation_steps
+        )
+        return
+    
     train(
-        epochs=args.epochs,
+        epochs=args.epochs or 50,
         batch_size=args.batch_size,
-        dataset_dir=args.dataset
+        dataset_dir=args.dataset,
+        report=args.report,
+        rehearsal_size=args.rehearsal_size,
+        force=args.force,
+        accumulation_steps=args.accumulation_steps,
+        progressive=parse_schedule(args.progressive, args.epochs or 50) if args.progressive else None,
+        target_accuracy=args.target_accuracy,
+        lr_schedule=args.lr_schedule,
+        max_lr=args.max_lr,
+        find_lr=args.find_lr
     )
 
 if __name__ == '__main__':
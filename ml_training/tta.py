@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test-Time Augmentation
+======================
+A higher-accuracy scoring mode for disputed labels: each image is scored
+as K views (flips and crops) and the views' predictions are combined.
+
+Views are cut from the already preprocessed image with NumPy indexing
+(no re-decoding), and all K views of a batch go through the interpreter
+in a single batched invoke. The adaptive mode runs the plain image first
+and only adds the extra views for images whose confidence is below a
+threshold.
+
+TTAClassifier has the same predict_batch() interface as TFLiteClassifier
+and can be used by classify.py (--tta). serve.py scores
+POST /classify/accurate with TTA.
+
+The command line evaluates every K (and adaptive thresholds) on the
+validation split and reports accuracy gain against added latency.
+
+Usage:
+    python tta.py [--views 1 2 4 8] [--thresholds 0.6 0.8] [--combine logits]
+    python classify.py dataset/ --tta 4 [--tta-threshold 0.8]
+"""
+
+import json
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+from inference import DEFAULT_MODEL_PATH, DEFAULT_LABELS_PATH, TFLiteClassifier, load_labels
+from cascade import load_validation_images, measure_latency
+from prediction_cache import hash_file
+
+CROP_FRACTION = 0.875
+
+def crop_resize(batch, top, left, fraction=CROP_FRACTION):
+    """Crop a (N, H, W, 3) batch and resize back to (H, W), nearest-neighbour.
+
+    `top` and `left` place the crop: 0 is the top/left edge, 0.5 the
+    centre, 1 the bottom/right edge.
+    """
+    height, width = batch.shape[1:3]
+    crop_h, crop_w = round(height * fraction), round(width * fraction)
+    y0, x0 = round((height - crop_h) * top), round((width - crop_w) * left)
+    rows = y0 + ((np.arange(height) + 0.5) * crop_h / height).astype(int)
+    cols = x0 + ((np.arange(width) + 0.5) * crop_w / width).astype(int)
+    return batch[:, rows][:, :, cols]
+
+def hflip(batch):
+    return batch[:, :, ::-1]
+
+# In order of usefulness; K views are the first K entries
+VIEWS = [
+    ('identity', lambda b: b),
+    ('hflip', hflip),
+    ('center', lambda b: crop_resize(b, 0.5, 0.5)),
+    ('center_hflip', lambda b: hflip(crop_resize(b, 0.5, 0.5))),
+    ('top_left', lambda b: crop_resize(b, 0.0, 0.0)),
+    ('bottom_right', lambda b: crop_resize(b, 1.0, 1.0)),
+    ('top_right', lambda b: crop_resize(b, 0.0, 1.0)),
+    ('bottom_left', lambda b: crop_resize(b, 1.0, 0.0))
+]
+MAX_VIEWS = len(VIEWS)
+
+def make_views(batch, k, start=0):
+    """Stack views start..k-1 of a batch into one (N * (k - start), H, W, 3) array, view-major."""
+    return np.concatenate([view(batch) for _, view in VIEWS[start:k]])
+
+def combine(scores, method='logits'):
+    """Combine (K, N, classes) view scores into (N, classes).
+
+    'logits' averages log-probabilities (the softmax inputs, up to a
+    per-view constant) and renormalizes; 'mean' averages probabilities.
+    """
+    if method == 'mean':
+        return scores.mean(axis=0)
+    logits = np.log(np.clip(scores, 1e-7, 1.0)).mean(axis=0)
+    logits -= logits.max(axis=1, keepdims=True)
+    probabilities = np.exp(logits)
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+class TTAClassifier:
+    """Scores each image as K augmented views in one batched invoke.
+
+    With `threshold`, only images whose plain prediction is less confident
+    than the threshold get the other K - 1 views. Not thread-safe; create
+    one per worker.
+    """
+
+    def __init__(self, classifier, k=4, threshold=None, method='logits'):
+        if not 1 <= k <= MAX_VIEWS:
+            raise ValueError(f"k must be between 1 and {MAX_VIEWS}")
+        self.classifier = classifier
+        self.k = k
+        self.threshold = threshold
+        self.method = method
+        self.input_size = classifier.input_size
+        self.embedding_details = None
+        self.model_path = classifier.model_path
+        self.total = 0
+        self.augmented = 0
+
+        config = json.dumps({'k': k, 'threshold': threshold, 'method': method}, sort_keys=True)
+        base_hash = getattr(classifier, 'model_hash', None) or hash_file(classifier.model_path)
+        self.model_hash = hashlib.sha256(f"{base_hash}:tta:{config}".encode()).hexdigest()
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        self.total += len(batch)
+        if self.k == 1:
+            return self.classifier.predict_batch(batch)
+
+        if self.threshold is None:
+            self.augmented += len(batch)
+            scores = self.classifier.predict_batch(make_views(batch, self.k))
+            return combine(scores.reshape(self.k, len(batch), -1), self.method)
+
+        scores = self.classifier.predict_batch(batch)
+        uncertain = np.max(scores, axis=1) < self.threshold
+        if uncertain.any():
+            count = int(uncertain.sum())
+            extra = self.classifier.predict_batch(make_views(batch[uncertain], self.k, start=1))
+            views = np.concatenate([scores[uncertain][np.newaxis], extra.reshape(self.k - 1, count, -1)])
+            scores[uncertain] = combine(views, self.method)
+            self.augmented += count
+        return scores
+
+    def predict(self, image):
+        return self.predict_batch(image[np.newaxis])[0]
+
+    def stats(self):
+        return {
+            'images': self.total,
+            'augmented': self.augmented,
+            'augmented_rate': self.augmented / self.total if self.total else 0.0
+        }
+
+def score_all_views(classifier, images, batch_size=8):
+    """Scores of every view for every image, shaped (MAX_VIEWS, N, classes)."""
+    chunks = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        chunks.append(classifier.predict_batch(make_views(chunk, MAX_VIEWS)).reshape(MAX_VIEWS, len(chunk), -1))
+    return np.concatenate(chunks, axis=1)
+
+def evaluate(view_scores, labels, k, threshold=None, method='logits'):
+    """Accuracy and share of augmented images for one setting, from precomputed view scores."""
+    if threshold is None:
+        scores = combine(view_scores[:k], method) if k > 1 else view_scores[0]
+        return float(np.mean(np.argmax(scores, axis=1) == labels)), 1.0 if k > 1 else 0.0
+    scores = view_scores[0].copy()
+    uncertain = np.max(scores, axis=1) < threshold
+    if uncertain.any():
+        scores[uncertain] = combine(view_scores[:k, uncertain], method)
+    return float(np.mean(np.argmax(scores, axis=1) == labels)), float(np.mean(uncertain))
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate test-time augmentation on the validation split')
+    parser.add_argument('--model', type=str, default=DEFAULT_MODEL_PATH, help='Path to TFLite model')
+    parser.add_argument('--labels', type=str, default=DEFAULT_LABELS_PATH, help='Path to labels file')
+    parser.add_argument('--dataset', type=str, default='dataset', help='Dataset directory')
+    parser.add_argument('--views', type=int, nargs='+', default=[1, 2, 4, 8],
+                       help=f'View counts K to evaluate (1-{MAX_VIEWS})')
+    parser.add_argument('--thresholds', type=float, nargs='*', default=[0.6, 0.8],
+                       help='Confidence thresholds for adaptive TTA (uses the largest K)')
+    parser.add_argument('--combine', type=str, default='logits', choices=['logits', 'mean'],
+                       help='Average log-probabilities or probabilities across views')
+    parser.add_argument('--latency-images', type=int, default=100,
+                       help='Images used to measure single-image latency')
+    parser.add_argument('--threads', type=int, default=None, help='Interpreter threads')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON')
+
+    args = parser.parse_args()
+
+    labels_list = load_labels(args.labels)
+    classifier = TFLiteClassifier(args.model, num_threads=args.threads)
+
+    print(f"\n📂 Loading validation split from: {args.dataset}")
+    images, labels = load_validation_images(args.dataset, labels_list, classifier.input_size)
+    print(f"   {len(images)} images")
+
+    view_scores = score_all_views(classifier, images)
+    largest = max(args.views)
+    settings = [(k, None) for k in sorted(set(args.views))] + [(largest, t) for t in args.thresholds]
+
+    results = []
+    for k, threshold in settings:
+        accuracy, augmented = evaluate(view_scores, labels, k, threshold, args.combine)
+        tta = TTAClassifier(classifier, k, threshold, args.combine)
+        results.append({
+            'views': k,
+            'threshold': threshold,
+            'accuracy': accuracy,
+            'augmented_rate': augmented,
+            'latency_ms': measure_latency(tta, images, args.latency_images)
+        })
+
+    base = next((r for r in results if r['views'] == 1 and r['threshold'] is None), results[0])
+    print(f"\n🔁 Test-time augmentation ({args.combine}), {len(images)} validation images:")
+    print(f"   {'Mode':22} {'Accuracy':>9} {'Gain':>8} {'Latency ms':>11} {'Added ms':>9} {'Augmented':>10}")
+    for r in results:
+        mode = f"K={r['views']}" + (f", adaptive < {r['threshold']:.2f}" if r['threshold'] is not None else '')
+        print(f"   {mode:22} {r['accuracy']:>9.4f} {r['accuracy'] - base['accuracy']:>+8.4f} "
+              f"{r['latency_ms']:>11.2f} {r['latency_ms'] - base['latency_ms']:>+9.2f} {r['augmented_rate']:>10.1%}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'model': args.model, 'combine': args.combine, 'results': results}, f, indent=2)
+        print(f"\n✅ Results saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,50 @@
 #!/usr/bin/env python3
 """
 Generate Smart Waste App icons
-Run: python3 tool/generate_icon.py
+Each icon is drawn once at SUPERSAMPLE x 1024px and downsampled (Lanczos)
+to every platform size: Android mipmaps and adaptive foregrounds, the iOS
+and macOS AppIcon sets, web/PWA icons and the Windows .ico. Icons are
+rendered in parallel processes, and outputs whose parameters (theme,
+size, drawing code) are unchanged since the last run are skipped; the
+hashes live in .dart_tool/icon_hashes.json.
+
+The default theme writes into the project; other themes write the same
+layout under build/icons/<theme>/.
+
+Run: python3 tool/generate_icon.py [--themes default dark] [--workers 4] [--force]
 Requirements: pip install Pillow
 """
 
 from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import hashlib
+import json
 import math
 import os
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HASHES_PATH = '.dart_tool/icon_hashes.json'
+MASTER_SIZE = 1024
+SUPERSAMPLE = 2
+
+THEMES = {
+    'default': {'background': '#4CAF50', 'foreground': 'white', 'accent': '#4CAF50'},
+    'dark': {'background': '#1B5E20', 'foreground': '#E8F5E9', 'accent': '#1B5E20'},
+}
+
+ANDROID_DENSITIES = {'mdpi': 1, 'hdpi': 1.5, 'xhdpi': 2, 'xxhdpi': 3, 'xxxhdpi': 4}
+# (points, scale) of every image in ios/Runner/Assets.xcassets/AppIcon.appiconset
+IOS_ICONS = [
+    (20, 1), (20, 2), (20, 3), (29, 1), (29, 2), (29, 3), (40, 1), (40, 2), (40, 3),
+    (50, 1), (50, 2), (57, 1), (57, 2), (60, 2), (60, 3), (72, 1), (72, 2),
+    (76, 1), (76, 2), (83.5, 2), (1024, 1)
+]
+MACOS_SIZES = [16, 32, 64, 128, 256, 512, 1024]
+WINDOWS_ICO_SIZES = [16, 24, 32, 48, 64, 128, 256]
 
 def draw_recycle_symbol(draw, center, radius, color, stroke_width):
     """Draw a recycle symbol with 3 curved arrows"""
@@ -15,25 +52,25 @@ def draw_recycle_symbol(draw, center, radius, color, stroke_width):
     for i in range(3):
         start_angle = i * 120 - 30
         end_angle = start_angle + 100
-        
+
         bbox = [
             center[0] - radius,
             center[1] - radius,
             center[0] + radius,
             center[1] + radius
         ]
-        
+
         draw.arc(bbox, start_angle, end_angle, fill=color, width=stroke_width)
-        
+
         # Draw arrowhead at end of each arc
         end_rad = math.radians(end_angle)
         arrow_x = center[0] + radius * math.cos(end_rad)
         arrow_y = center[1] + radius * math.sin(end_rad)
-        
+
         # Arrow triangle
         arrow_size = stroke_width * 2
         arrow_angle = end_rad + math.pi / 2
-        
+
         points = [
             (arrow_x, arrow_y),
             (arrow_x - arrow_size * math.cos(arrow_angle - math.pi / 5),
@@ -47,50 +84,30 @@ def create_leaf_icon(size=1024):
     """Create a simple leaf/eco icon for the waste app"""
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
+
     # Green background circle
     margin = size * 0.05
     draw.ellipse([margin, margin, size - margin, size - margin], fill='#4CAF50')
-    
+
     # Draw a stylized leaf
     center_x, center_y = size // 2, size // 2
     leaf_width = size * 0.35
     leaf_height = size * 0.5
-    
-    # Leaf body (ellipse rotated)
-    leaf_bbox = [
-        center_x - leaf_width,
-        center_y - leaf_height * 0.6,
-        center_x + leaf_width,
-        center_y + leaf_height * 0.6
+
+    # Leaf outline: r = 0.6w * (1 + 0.3 cos 2a), stretched 1.3x vertically
+    angles = [i / 100 * 2 * math.pi - math.pi / 2 for i in range(100)]
+    points = [
+        (center_x + leaf_width * 0.6 * (1 + 0.3 * math.cos(2 * a)) * math.cos(a),
+         center_y + leaf_width * 0.6 * (1 + 0.3 * math.cos(2 * a)) * math.sin(a) * 1.3)
+        for a in angles
     ]
-    
-    # Draw main leaf shape
-    points = []
-    for i in range(100):
-        t = i / 100 * 2 * math.pi
-        # Leaf shape equation
-        x = center_x + leaf_width * 0.8 * math.sin(t) * (1 if t < math.pi else -1)
-        # Make it pointed at top
-        if t < math.pi:
-            y = center_y - leaf_height * 0.5 * (1 - abs(math.sin(t)))
-        else:
-            y = center_y + leaf_height * 0.5 * (1 - abs(math.sin(t)))
-        
-        # Simpler leaf shape
-        angle = t - math.pi / 2
-        r = leaf_width * 0.6 * (1 + 0.3 * math.cos(2 * angle))
-        x = center_x + r * math.cos(angle)
-        y = center_y + r * math.sin(angle) * 1.3
-        points.append((x, y))
-    
     draw.polygon(points, fill='white')
-    
+
     # Leaf vein (center line)
     vein_start = (center_x, center_y - leaf_height * 0.4)
     vein_end = (center_x, center_y + leaf_height * 0.3)
     draw.line([vein_start, vein_end], fill='#4CAF50', width=int(size * 0.02))
-    
+
     # Small branch veins
     for i, offset in enumerate([-0.15, 0, 0.15]):
         y = center_y + leaf_height * offset
@@ -103,14 +120,14 @@ def create_leaf_icon(size=1024):
             (center_x + branch_len, y - branch_len * 0.3),
             (center_x, y),
         ], fill='#4CAF50', width=int(size * 0.015))
-    
+
     return img
 
 def create_recycle_icon(size=1024):
     """Create a recycle symbol icon"""
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
+
     # Green background with rounded corners (circle)
     margin = size * 0.02
     draw.rounded_rectangle(
@@ -118,63 +135,71 @@ def create_recycle_icon(size=1024):
         radius=size * 0.2,
         fill='#4CAF50'
     )
-    
+
     # Draw recycle symbol
     center = (size // 2, size // 2)
     radius = size * 0.32
     stroke_width = int(size * 0.06)
-    
+
     draw_recycle_symbol(draw, center, radius, 'white', stroke_width)
-    
+
     return img
 
-def create_simple_waste_icon(size=1024):
-    """Create a simple, modern waste management icon"""
+def create_simple_waste_icon(size=1024, background='#4CAF50', foreground='white', accent='#4CAF50',
+                             full_bleed=False):
+    """Create a simple, modern waste management icon
+
+    full_bleed fills the whole square, for platforms that apply their own
+    mask (iOS).
+    """
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
+
     # Green background with rounded corners
-    margin = int(size * 0.02)
-    corner_radius = int(size * 0.22)
-    draw.rounded_rectangle(
-        [margin, margin, size - margin, size - margin],
-        radius=corner_radius,
-        fill='#4CAF50'
-    )
-    
+    if full_bleed:
+        draw.rectangle([0, 0, size, size], fill=background)
+    else:
+        margin = int(size * 0.02)
+        corner_radius = int(size * 0.22)
+        draw.rounded_rectangle(
+            [margin, margin, size - margin, size - margin],
+            radius=corner_radius,
+            fill=background
+        )
+
     center_x, center_y = size // 2, size // 2
-    
+
     # Draw a stylized bin/container
     bin_width = size * 0.45
     bin_height = size * 0.5
     bin_top = center_y - bin_height * 0.35
     bin_bottom = center_y + bin_height * 0.45
-    
+
     # Bin body (trapezoid shape)
     top_width = bin_width * 0.9
     bottom_width = bin_width * 0.75
-    
+
     bin_points = [
         (center_x - top_width / 2, bin_top),
         (center_x + top_width / 2, bin_top),
         (center_x + bottom_width / 2, bin_bottom),
         (center_x - bottom_width / 2, bin_bottom),
     ]
-    draw.polygon(bin_points, fill='white')
-    
+    draw.polygon(bin_points, fill=foreground)
+
     # Bin lid
     lid_height = size * 0.08
     lid_top = bin_top - lid_height
     lid_width = top_width * 1.15
-    
+
     lid_points = [
         (center_x - lid_width / 2, lid_top),
         (center_x + lid_width / 2, lid_top),
         (center_x + top_width / 2 * 1.05, bin_top),
         (center_x - top_width / 2 * 1.05, bin_top),
     ]
-    draw.polygon(lid_points, fill='white')
-    
+    draw.polygon(lid_points, fill=foreground)
+
     # Lid handle
     handle_width = size * 0.12
     handle_height = size * 0.04
@@ -183,56 +208,60 @@ def create_simple_waste_icon(size=1024):
         [center_x - handle_width / 2, handle_top,
          center_x + handle_width / 2, lid_top],
         radius=int(size * 0.02),
-        fill='white'
+        fill=foreground
     )
-    
+
     # Recycle arrows on bin (smaller)
     arrow_center = (center_x, center_y + size * 0.08)
     arrow_radius = size * 0.13
     arrow_stroke = int(size * 0.025)
-    draw_recycle_symbol(draw, arrow_center, arrow_radius, '#4CAF50', arrow_stroke)
-    
+    draw_recycle_symbol(draw, arrow_center, arrow_radius, accent, arrow_stroke)
+
     return img
 
-def create_foreground_icon(size=1024):
-    """Create foreground icon for adaptive icons (transparent background)"""
-    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+def create_foreground_icon(size=1024, background='#4CAF50', foreground='white', accent='#4CAF50',
+                           filled=False):
+    """Create foreground icon for adaptive icons (transparent background)
+
+    filled paints the background colour behind it, for maskable web icons.
+    """
+    img = Image.new('RGBA', (size, size), background if filled else (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
+
     center_x, center_y = size // 2, size // 2
-    
+
     # Draw the same waste bin but sized for adaptive icon safe zone
     # Safe zone is typically 66% of the icon
     scale = 0.6
-    
+
     bin_width = size * 0.45 * scale
     bin_height = size * 0.5 * scale
     bin_top = center_y - bin_height * 0.35
     bin_bottom = center_y + bin_height * 0.45
-    
+
     top_width = bin_width * 0.9
     bottom_width = bin_width * 0.75
-    
+
     bin_points = [
         (center_x - top_width / 2, bin_top),
         (center_x + top_width / 2, bin_top),
         (center_x + bottom_width / 2, bin_bottom),
         (center_x - bottom_width / 2, bin_bottom),
     ]
-    draw.polygon(bin_points, fill='white')
-    
+    draw.polygon(bin_points, fill=foreground)
+
     lid_height = size * 0.08 * scale
     lid_top = bin_top - lid_height
     lid_width = top_width * 1.15
-    
+
     lid_points = [
         (center_x - lid_width / 2, lid_top),
         (center_x + lid_width / 2, lid_top),
         (center_x + top_width / 2 * 1.05, bin_top),
         (center_x - top_width / 2 * 1.05, bin_top),
     ]
-    draw.polygon(lid_points, fill='white')
-    
+    draw.polygon(lid_points, fill=foreground)
+
     handle_width = size * 0.12 * scale
     handle_height = size * 0.04 * scale
     handle_top = lid_top - handle_height
@@ -240,53 +269,194 @@ def create_foreground_icon(size=1024):
         [center_x - handle_width / 2, handle_top,
          center_x + handle_width / 2, lid_top],
         radius=int(size * 0.015),
-        fill='white'
+        fill=foreground
     )
-    
+
     # Small recycle symbol
     arrow_center = (center_x, center_y + size * 0.05)
     arrow_radius = size * 0.08
     arrow_stroke = int(size * 0.018)
-    
+
     # Draw simple arrows for recycle
     for i in range(3):
         start_angle = i * 120 - 30
         end_angle = start_angle + 100
-        
+
         bbox = [
             arrow_center[0] - arrow_radius,
             arrow_center[1] - arrow_radius,
             arrow_center[0] + arrow_radius,
             arrow_center[1] + arrow_radius
         ]
-        
-        draw.arc(bbox, start_angle, end_angle, fill='#4CAF50', width=arrow_stroke)
-    
+
+        draw.arc(bbox, start_angle, end_angle, fill=accent, width=arrow_stroke)
+
     return img
 
+# Master artwork kind -> (drawing function, extra arguments)
+MASTERS = {
+    'icon': (create_simple_waste_icon, {}),
+    'square': (create_simple_waste_icon, {'full_bleed': True}),
+    'foreground': (create_foreground_icon, {}),
+    'maskable': (create_foreground_icon, {'filled': True}),
+}
+
+def icon_targets():
+    """Every output as (platform, master kind, path relative to the project, pixel size)."""
+    targets = [
+        ('assets', 'icon', 'assets/icon/app_icon.png', 1024),
+        ('assets', 'foreground', 'assets/icon/app_icon_foreground.png', 1024),
+    ]
+    for density, scale in ANDROID_DENSITIES.items():
+        res = 'android/app/src/main/res'
+        targets.append(('android', 'icon', f'{res}/mipmap-{density}/ic_launcher.png', round(48 * scale)))
+        targets.append(('android', 'foreground', f'{res}/drawable-{density}/ic_launcher_foreground.png',
+                        round(108 * scale)))
+    for points, scale in IOS_ICONS:
+        targets.append(('ios', 'square',
+                        f'ios/Runner/Assets.xcassets/AppIcon.appiconset/Icon-App-{points:g}x{points:g}@{scale}x.png',
+                        round(points * scale)))
+    targets.append(('web', 'icon', 'web/favicon.png', 16))
+    for size in (192, 512):
+        targets.append(('web', 'icon', f'web/icons/Icon-{size}.png', size))
+        targets.append(('web', 'maskable', f'web/icons/Icon-maskable-{size}.png', size))
+    for size in MACOS_SIZES:
+        targets.append(('macos', 'icon', f'macos/Runner/Assets.xcassets/AppIcon.appiconset/app_icon_{size}.png', size))
+    targets.append(('windows', 'icon', 'windows/runner/resources/app_icon.ico', max(WINDOWS_ICO_SIZES)))
+    return targets
+
+def output_path(root, theme, relative):
+    return Path(root) / relative if theme == 'default' else Path(root) / 'build/icons' / theme / relative
+
+@lru_cache(maxsize=None)
+def source_hash():
+    """Hash of this script, so changes to the drawing code re-render everything."""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+def parameter_hash(theme, kind, relative, size):
+    params = {
+        'theme': THEMES[theme],
+        'kind': kind,
+        'path': relative,
+        'size': size,
+        'master_size': MASTER_SIZE,
+        'supersample': SUPERSAMPLE,
+        'source': source_hash(),
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+def file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+@lru_cache(maxsize=8)
+def render_master(kind, theme):
+    """Draw one artwork at SUPERSAMPLE x MASTER_SIZE and build its pyramid (cached per process).
+
+    Levels halve down to 32px with exact 2x2 box reduction, in premultiplied
+    alpha so transparent edges do not darken. Each output is resampled from
+    the smallest level still at least twice its size, so no resize touches
+    more pixels than it needs.
+    """
+    draw, extra = MASTERS[kind]
+    levels = [draw(MASTER_SIZE * SUPERSAMPLE, **THEMES[theme], **extra).convert('RGBa')]
+    while levels[-1].width >= 64:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+def downsample(levels, size):
+    source = next((level for level in reversed(levels) if level.width >= 2 * size), levels[0])
+    return source.resize((size, size), Image.LANCZOS).convert('RGBA')
+
+def save_icon(image, path, platform):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == '.ico':
+        image.save(path, format='ICO', sizes=[(s, s) for s in WINDOWS_ICO_SIZES])
+    elif platform == 'ios':
+        # App Store icons must not have an alpha channel
+        image.convert('RGB').save(path, 'PNG')
+    else:
+        image.save(path, 'PNG')
+
+def render_group(root, theme, kind, outputs):
+    """Render one master and write its (platform, relative path, size) outputs; return their file hashes."""
+    levels = render_master(kind, theme)
+    hashes = {}
+    for platform, relative, size in outputs:
+        path = output_path(root, theme, relative)
+        save_icon(downsample(levels, size), path, platform)
+        hashes[str(path.relative_to(root))] = file_hash(path)
+    return hashes
+
+def load_hashes(root):
+    path = Path(root) / HASHES_PATH
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_hashes(root, hashes):
+    path = Path(root) / HASHES_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(hashes, f, indent=1, sort_keys=True)
+
+def is_current(root, key, params, hashes):
+    """True if the output exists unmodified and was rendered with the same parameters."""
+    entry = hashes.get(key)
+    path = Path(root) / key
+    return bool(entry) and entry['params'] == params and path.exists() and file_hash(path) == entry['sha256']
+
+def generate_icons(root=PROJECT_ROOT, themes=('default',), workers=None, force=False):
+    """Render every stale icon in the theme matrix; return (rendered paths, unchanged count)."""
+    root = Path(root)
+    hashes = load_hashes(root)
+    groups, params_by_key, unchanged = {}, {}, 0
+    for theme in themes:
+        for platform, kind, relative, size in icon_targets():
+            key = str(output_path(root, theme, relative).relative_to(root))
+            params = parameter_hash(theme, kind, relative, size)
+            if not force and is_current(root, key, params, hashes):
+                unchanged += 1
+                continue
+            params_by_key[key] = params
+            # One task per (theme, master, platform) so large matrices spread over processes
+            groups.setdefault((theme, kind, platform), []).append((platform, relative, size))
+
+    tasks = [(str(root), theme, kind, outputs) for (theme, kind, _), outputs in groups.items()]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(render_group, *zip(*tasks)))
+    else:
+        results = [render_group(*task) for task in tasks]
+
+    rendered = []
+    for result in results:
+        for key, sha256 in result.items():
+            hashes[key] = {'params': params_by_key[key], 'sha256': sha256}
+            rendered.append(key)
+    save_hashes(root, hashes)
+    return rendered, unchanged
+
 def main():
-    # Ensure output directory exists
-    os.makedirs('assets/icon', exist_ok=True)
-    
+    parser = argparse.ArgumentParser(description='Render Smart Waste App icons for every platform')
+    parser.add_argument('--themes', nargs='+', default=['default'], choices=list(THEMES),
+                        help='Themes to render (non-default themes go to build/icons/<theme>/)')
+    parser.add_argument('--root', type=str, default=str(PROJECT_ROOT), help='Flutter project directory')
+    parser.add_argument('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-render icons even if unchanged')
+    args = parser.parse_args()
+
     print("Generating Smart Waste App icons...")
-    
-    # Create main app icon
-    icon = create_simple_waste_icon(1024)
-    icon.save('assets/icon/app_icon.png', 'PNG')
-    print("✓ Created: assets/icon/app_icon.png")
-    
-    # Create foreground for adaptive icons
-    foreground = create_foreground_icon(1024)
-    foreground.save('assets/icon/app_icon_foreground.png', 'PNG')
-    print("✓ Created: assets/icon/app_icon_foreground.png")
-    
-    print("")
-    print("Now run the following commands:")
-    print("  cd smart_waste_app")
-    print("  flutter pub get")
-    print("  dart run flutter_launcher_icons")
+    start = time.perf_counter()
+    rendered, unchanged = generate_icons(args.root, args.themes, args.workers, args.force)
+    for path in sorted(rendered):
+        print(f"✓ Created: {path}")
+
     print("")
-    print("This will generate icons for iOS and Android.")
+    print(f"{len(rendered)} icons rendered, {unchanged} unchanged ({time.perf_counter() - start:.2f}s)")
+    print("Android, iOS, web, macOS and Windows icons are written directly;")
+    print("flutter_launcher_icons is only needed to regenerate the adaptive icon XML.")
 
 if __name__ == '__main__':
     main()